@@ -0,0 +1,266 @@
+"""End to end benchmark of ``Downloader.get_data`` against a local mock booru
+
+Starts a mock booru (See ``benchmarks.mock_booru``) with synthetic posts and files, runs a downloader on a
+fresh folder and reports posts, pages, files and bytes received per second along with the peak memory
+(RSS) of the process. Results can be saved as JSON and compared against a previous run to spot regressions.
+
+Run from the project root::
+
+    python -m benchmarks.bench_downloader [--flavor danbooru] [--posts 2000] [--latency 0.02]
+        [--bandwidth 0] [--query bench] [--days 3650] [--ratings "s, q, e"] [--min-faves 0]
+        [--workers 4] [--runs 3] [--rerun] [--option stream_pages=False]
+        [--save results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+from benchmarks.mock_booru import MockBooru
+
+#: Metrics compared by ``--compare`` (True if higher is better)
+METRICS = {
+    "posts_per_s": True,
+    "pages_per_s": True,
+    "files_per_s": True,
+    "bytes_per_s": True,
+    "seconds": False,
+    "peak_rss_mib": False,
+}
+
+
+def peak_rss() -> typing.Optional[float]:
+    """Peak resident memory of this process in MiB (None if unknown, such as on Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (
+        peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+    )  # Bytes on macOS, KiB elsewhere
+
+
+def write_config(path: str, url: str, flavor: str, args: argparse.Namespace) -> None:
+    """Writes a config searching every post of the mock booru"""
+    api_type = "gelbooru" if flavor == "gelbooru" else "danbooru"
+    options = "\n".join(option.replace("=", " = ", 1) for option in args.option)
+    with open(path, "w") as file:
+        file.write(
+            f"[URI]\n"
+            f"mock = {url}, {api_type}\n"
+            f"[Default]\n"
+            f"days = 3650\n"
+            f"ratings = s, q, e\n"
+            f"min_score = 0\n"
+            f"min_faves = 0\n"
+            f"allowed_types = jpg, png, gif\n"
+            f"[Blacklist]\n"
+            f"tags = \n"
+            f"[Other]\n"
+            f"workers = {args.workers}\n"
+            f"{options}\n"
+            f"[Rate Limits]\n"
+            f"mock = {args.rate}, {args.rate}\n"
+            f"default = {args.rate}, {args.rate}\n"
+            f"[Benchmark]\n"
+            f"tags = {args.query}\n"
+            f"api_endpoints = mock\n"
+            f"days = {args.days}\n"
+            f"ratings = {args.ratings}\n"
+            f"min_score = 0\n"
+            f"min_faves = {args.min_faves}\n"
+            f"ignore_tags = \n"
+            f"allowed_types = jpg, png, gif\n"
+        )
+
+
+def run(booru: MockBooru, full: bool) -> dict:
+    """Runs a downloader in the current folder and measures it"""
+    from booru_dl.main import Downloader
+
+    before = booru.stats()
+    start = time.perf_counter()
+    downloader = Downloader("config.ini", full=full)
+    result = downloader.get_data()
+    downloader.executor.shutdown()
+    downloader.index.close()
+    seconds = time.perf_counter() - start
+    after = booru.stats()
+    served = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+    return {
+        "result": result,
+        "seconds": seconds,
+        "pages": served.get("pages", 0),
+        "not_modified": served.get("not_modified", 0),
+        "posts": served.get("posts", 0),
+        "files": served.get("files", 0),
+        "bytes": served.get("bytes_sent", 0),
+        "downloaded": downloader.progress["downloaded"],
+        "skipped": downloader.progress["skipped"],
+        "posts_per_s": served.get("posts", 0) / seconds,
+        "pages_per_s": served.get("pages", 0) / seconds,
+        "files_per_s": served.get("files", 0) / seconds,
+        "bytes_per_s": served.get("bytes_sent", 0) / seconds,
+        "peak_rss_mib": peak_rss(),
+    }
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """Prints the change of every metric against a saved baseline"""
+    for phase, result in results.items():
+        if phase not in baseline.get("results", {}):
+            continue
+        print(f"{phase} vs. baseline:")
+        for metric, higher_is_better in METRICS.items():
+            old, new = baseline["results"][phase].get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            better = change > 0 if higher_is_better else change < 0
+            print(
+                f"  {metric:<13} {old:14.2f} -> {new:14.2f} ({change:+6.1f}% {'better' if better else 'worse'})"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--flavor", default="danbooru", choices=["danbooru", "e621", "gelbooru"]
+    )
+    parser.add_argument(
+        "--posts", type=int, default=2000, help="Posts on the mock booru"
+    )
+    parser.add_argument("--tags", type=int, default=40, help="Tags per post")
+    parser.add_argument("--file-size", type=int, default=20000, help="Bytes per file")
+    parser.add_argument(
+        "--query",
+        default="bench",
+        help="Tags of the searched section, such as 'bench, broad_1, broad_2, broad_3, tag_7'",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="Seconds before each response"
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=int,
+        default=0,
+        help="Bytes/s per response (0 for unlimited)",
+    )
+    parser.add_argument(
+        "--days", type=int, default=3650, help="Days searched (A post a minute)"
+    )
+    parser.add_argument("--ratings", default="s, q, e", help="Ratings searched")
+    parser.add_argument(
+        "--min-faves", type=int, default=0, help="Favorites of posts searched"
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Downloader workers")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=1000,
+        help="Requests/s allowed by the rate limiter",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Runs on a fresh folder (Fastest is kept)"
+    )
+    parser.add_argument(
+        "--rerun",
+        action="store_true",
+        help="Also measure a full search of a finished folder",
+    )
+    parser.add_argument(
+        "--option", action="append", default=[], help="[Other] config option, key=value"
+    )
+    parser.add_argument("--save", help="Save results to this JSON file")
+    parser.add_argument(
+        "--compare", help="Compare results with a JSON file saved by --save"
+    )
+    parser.add_argument("--log", default="WARNING", help="Log level of the downloader")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log.upper(), format="%(levelname)s %(message)s")
+
+    results: typing.Dict[str, dict] = {}
+    cwd = os.getcwd()
+    with MockBooru(
+        args.flavor,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        posts=args.posts,
+        tags=args.tags,
+        file_size=args.file_size,
+    ) as booru:
+        for _ in range(args.runs):
+            folder = tempfile.mkdtemp(prefix="booru-dl-bench-")
+            try:
+                os.chdir(folder)
+                write_config("config.ini", booru.url, args.flavor, args)
+                cold = run(booru, full=False)
+                if (
+                    "cold" not in results
+                    or cold["seconds"] < results["cold"]["seconds"]
+                ):
+                    results["cold"] = cold
+                if args.rerun:
+                    rerun = run(booru, full=True)
+                    if (
+                        "rerun" not in results
+                        or rerun["seconds"] < results["rerun"]["seconds"]
+                    ):
+                        results["rerun"] = rerun
+            finally:
+                os.chdir(cwd)
+                shutil.rmtree(folder, ignore_errors=True)
+
+    for phase, result in results.items():
+        print(
+            f"{phase}: {result['seconds']:.2f}s - {result['posts']} posts / {result['pages']} pages "
+            f"({result['not_modified']} not modified) / {result['files']} files - "
+            f"{result['downloaded']} downloaded, {result['skipped']} already downloaded"
+        )
+        rss = (
+            f"{result['peak_rss_mib']:.1f} MiB"
+            if result["peak_rss_mib"] is not None
+            else "unknown"
+        )
+        print(
+            f"  {result['posts_per_s']:10.1f} posts/s {result['pages_per_s']:8.1f} pages/s "
+            f"{result['files_per_s']:8.1f} files/s {result['bytes_per_s'] / 1024 ** 2:8.2f} MiB/s "
+            f"- peak RSS {rss}"
+        )
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    if args.save:
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+            ).stdout.strip()
+        except OSError:
+            commit = ""
+        with open(args.save, "w") as file:
+            json.dump(
+                {
+                    "arguments": vars(args),
+                    "commit": commit,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "time": time.time(),
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+        print(f"Results saved to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Microbenchmark of section filtering
+
+Compares the per-post checks ``Downloader.get_posts`` used to run (Walking the post's tags against the
+blacklist and ``ignore_tags`` lists) with a compiled ``SectionFilter``.
+
+Run from the project root::
+
+    python -m benchmarks.bench_filters [--posts 2000] [--tags 120] [--blacklist 300] [--repeat 5]
+"""
+import argparse
+import random
+import time
+import timeit
+
+from booru_dl.library import config, filters
+from booru_dl.library.posts import Post
+
+
+def legacy_accepts(
+    section: config.Section, blacklist: list, start: float, post: Post
+) -> bool:
+    """Checks of ``get_posts`` before sections were compiled (Logging removed)"""
+    if post.ext not in section.allowed_types:
+        return False
+    if start - post.created_ts > section.days * 86400:
+        return False
+    if post.rating not in section.rating:
+        return False
+    if post.favs < section.min_faves:
+        return False
+    if post.score < section.min_score:
+        return False
+    for tag in post.tags.split():
+        if tag in blacklist:
+            if len(section.ignore_tags) > 0 and tag in section.ignore_tags:
+                continue
+            return False
+    return True
+
+
+def make_data(posts: int, tags: int, blacklist: int, seed: int = 0):
+    """Creates a section, blacklist and posts resembling a large search
+
+    Posts pass every cutoff so the tag checks (The expensive part) run for each of them.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"tag_{i}" for i in range(20000)]
+    blacklisted = rng.sample(vocabulary, blacklist)
+
+    section = config.Section()
+    section.name = "Benchmark"
+    section.days = 30
+    section.rating = ["s", "q"]
+    section.min_score = 0
+    section.min_faves = 0
+    section.tags = ["benchmark"]
+    section.ignore_tags = blacklisted[: max(blacklist // 10, 1)]
+    section.allowed_types = ["jpg", "png", "gif"]
+    section.api_endpoint = []
+
+    now = time.time()
+    data = [
+        Post(
+            post_id,
+            None,
+            "png",
+            f"https://booru.example/{post_id}.png",
+            " ".join(rng.sample(vocabulary, tags)),
+            10,
+            10,
+            "s",
+            now - rng.random() * 86400,
+            None,
+        )
+        for post_id in range(1, posts + 1)
+    ]
+    return section, blacklisted, now, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=2000, help="Posts per run")
+    parser.add_argument("--tags", type=int, default=120, help="Tags per post")
+    parser.add_argument("--blacklist", type=int, default=300, help="Blacklist size")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs (Best is kept)")
+    args = parser.parse_args()
+
+    section, blacklist, now, data = make_data(args.posts, args.tags, args.blacklist)
+    post_filter = filters.SectionFilter(section, blacklist, now=now)
+
+    legacy = [legacy_accepts(section, blacklist, now, post) for post in data]
+    compiled = [post_filter.accepts(post) for post in data]
+    assert legacy == compiled, "Compiled filter disagrees with the legacy checks"
+
+    legacy_time = min(
+        timeit.repeat(
+            lambda: [legacy_accepts(section, blacklist, now, post) for post in data],
+            number=1,
+            repeat=args.repeat,
+        )
+    )
+    compiled_time = min(
+        timeit.repeat(
+            lambda: [post_filter.accepts(post) for post in data],
+            number=1,
+            repeat=args.repeat,
+        )
+    )
+    print(
+        f"{args.posts} posts, {args.tags} tags each, {args.blacklist} blacklisted tags "
+        f"({sum(compiled)} accepted)"
+    )
+    print(f"legacy:   {legacy_time * 1e6 / args.posts:10.2f} us/post")
+    print(f"compiled: {compiled_time * 1e6 / args.posts:10.2f} us/post")
+    print(f"speedup:  {legacy_time / compiled_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Microbenchmark of post parsing
+
+Compares the per-post shape detection ``Downloader.get_posts`` used to run (``collect_post_id``,
+``collect_post_file``, ``collect_post_tags`` and friends) with the adapter chosen once per API, and the
+memory held by a page of raw JSON posts with the same page as ``Post`` records.
+
+Run from the project root::
+
+    python -m benchmarks.bench_posts [--posts 320] [--tags 60] [--repeat 5]
+"""
+import argparse
+import json
+import random
+import time
+import timeit
+import tracemalloc
+from datetime import datetime
+
+from booru_dl.library import posts
+from booru_dl.main import Downloader
+
+CATEGORIES = [
+    "general",
+    "species",
+    "character",
+    "copyright",
+    "artist",
+    "invalid",
+    "lore",
+    "meta",
+]
+
+
+def make_page(shape: str, count: int, tags: int, seed: int = 0) -> str:
+    """Creates the JSON text of a page of ``danbooru`` or ``e621`` style posts (Common fields only)"""
+    rng = random.Random(seed)
+    now = time.time()
+    page = []
+    for post_id in range(count, 0, -1):
+        md5 = f"{rng.getrandbits(128):032x}"
+        url = f"https://cdn.booru.example/{md5}.png"
+        created = datetime.fromtimestamp(now - post_id * 60).astimezone().isoformat()
+        post_tags = [f"tag_{rng.randrange(20000)}" for _ in range(tags)]
+        if shape == "e621":
+            page.append(
+                {
+                    "id": post_id,
+                    "created_at": created,
+                    "score": {"up": 20, "down": -2, "total": 18},
+                    "fav_count": 7,
+                    "rating": "s",
+                    "file": {"url": url, "ext": "png", "md5": md5, "size": 1000},
+                    "tags": {
+                        category: post_tags[i :: len(CATEGORIES)]
+                        for i, category in enumerate(CATEGORIES)
+                    },
+                    "preview": {"width": 150, "height": 150, "url": url},
+                    "sample": {"has": True, "width": 850, "height": 850, "url": url},
+                    "flags": {"pending": False, "flagged": False, "deleted": False},
+                    "relationships": {"parent_id": None, "children": []},
+                    "sources": [f"https://source.example/{post_id}"],
+                    "locked_tags": [],
+                    "pools": [],
+                    "updated_at": created,
+                    "uploader_id": 1,
+                    "description": "x" * 200,
+                }
+            )
+        else:
+            page.append(
+                {
+                    "id": post_id,
+                    "created_at": created,
+                    "score": 18,
+                    "fav_count": 7,
+                    "rating": "s",
+                    "md5": md5,
+                    "file_ext": "png",
+                    "file_url": url,
+                    "large_file_url": url,
+                    "preview_file_url": url,
+                    "file_size": 1000,
+                    "tag_string": " ".join(post_tags),
+                    "tag_string_general": " ".join(post_tags[4:]),
+                    "tag_string_character": " ".join(post_tags[:2]),
+                    "tag_string_copyright": post_tags[2],
+                    "tag_string_artist": post_tags[3],
+                    "tag_string_meta": "",
+                    "tag_count": tags,
+                    "image_width": 1000,
+                    "image_height": 1000,
+                    "up_score": 20,
+                    "down_score": -2,
+                    "updated_at": created,
+                    "uploader_id": 1,
+                    "parent_id": None,
+                    "has_children": False,
+                    "is_deleted": False,
+                    "pixiv_id": None,
+                    "source": "x" * 100,
+                }
+            )
+    return json.dumps({"posts": page} if shape == "e621" else page)
+
+
+def legacy_parse(downloader: Downloader, raw_posts: list) -> list:
+    """Per-post parsing of ``get_posts`` before adapters (Returns the same fields as ``Post``)"""
+    parsed = []
+    for post in raw_posts:
+        post_id = downloader.collect_post_id(post)
+        file_ext, file = downloader.collect_post_file(post, post_id)
+        tags = downloader.collect_post_tags(post, post_id)
+        if "score" in post and isinstance(post["score"], int):
+            score = post["score"]
+        else:
+            score = post["score"]["total"]
+        faves = post["fav_count"] if "fav_count" in post else 0
+        created = datetime.fromisoformat(post["created_at"]).timestamp()
+        parsed.append(
+            (post_id, file_ext, file, tags, score, faves, post["rating"], created)
+        )
+    return parsed
+
+
+def page_memory(text: str, adapter: posts.PostAdapter = None) -> int:
+    """Bytes held by a decoded page, or by its ``Post`` records once the raw page is released"""
+    tracemalloc.start()
+    data = json.loads(text)
+    if adapter is not None:
+        data = adapter.parse_page(adapter.unwrap(data))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del data
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=320, help="Posts per page")
+    parser.add_argument("--tags", type=int, default=60, help="Tags per post")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs (Best is kept)")
+    args = parser.parse_args()
+
+    downloader = Downloader.__new__(Downloader)  # Only the collect_* helpers are used
+    for shape in ("danbooru", "e621"):
+        text = make_page(shape, args.posts, args.tags)
+        data = json.loads(text)
+        raw_posts = posts.PostAdapter.unwrap(data)
+        adapter = posts.detect(
+            raw_posts[0], "danbooru", "posts" if shape == "e621" else None
+        )
+
+        legacy_time = min(
+            timeit.repeat(
+                lambda: legacy_parse(downloader, raw_posts),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        adapter_time = min(
+            timeit.repeat(
+                lambda: adapter.parse_page(raw_posts), number=1, repeat=args.repeat
+            )
+        )
+        raw_size = page_memory(text)
+        post_size = page_memory(text, adapter)
+
+        print(f"{shape}: {args.posts} posts, {args.tags} tags each")
+        print(f"  legacy:  {legacy_time * 1e6 / args.posts:8.2f} us/post")
+        print(f"  adapter: {adapter_time * 1e6 / args.posts:8.2f} us/post")
+        print(f"  speedup: {legacy_time / adapter_time:8.1f}x")
+        print(
+            f"  memory:  {raw_size / 1024:8.1f} KiB raw page -> {post_size / 1024:.1f} KiB of posts"
+        )
+
+
+if __name__ == "__main__":
+    main()
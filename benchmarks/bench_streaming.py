@@ -0,0 +1,90 @@
+"""Benchmark of decoding API pages at once vs. while they are received
+
+Measures the time and peak memory of turning one page into ``Post`` records with
+``streaming.loads`` (The whole body and every decoded field are held at once) and with ``streaming.PostStream``
+(Only the unread part of the body and a single raw post are held). The body is fed in 64 KiB chunks, the
+same way ``Downloader.request_page`` reads responses.
+
+Run from the project root::
+
+    python -m benchmarks.bench_streaming [--posts 320] [--tags 60] [--repeat 5]
+"""
+import argparse
+import json
+import timeit
+import tracemalloc
+
+from benchmarks.bench_posts import make_page
+from booru_dl.library import posts, streaming
+
+CHUNK_SIZE = 65536
+
+
+def chunked(body: bytes):
+    """Yields the body in chunks, as ``response.iter_content`` would"""
+    for start in range(0, len(body), CHUNK_SIZE):
+        yield body[start : start + CHUNK_SIZE]
+
+
+def parse_whole(
+    body: bytes, adapter: posts.PostAdapter, decode=streaming.loads
+) -> list:
+    """Reads the whole body, decodes it and parses the posts (``stream_pages = False``)"""
+    content = b"".join(chunked(body))
+    return adapter.parse_page(adapter.unwrap(decode(content)))
+
+
+def parse_stream(body: bytes, adapter: posts.PostAdapter) -> list:
+    """Parses posts while the body is read (``stream_pages = True``)"""
+    parsed = []
+    for raw in streaming.PostStream(chunked(body)):
+        post = adapter.parse(raw)
+        if post is not None:
+            parsed.append(post)
+    return parsed
+
+
+def peak_memory(function, *args) -> int:
+    """Peak bytes allocated while running a function"""
+    tracemalloc.start()
+    result = function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=320, help="Posts per page")
+    parser.add_argument("--tags", type=int, default=60, help="Tags per post")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs (Best is kept)")
+    args = parser.parse_args()
+
+    for shape in ("danbooru", "e621"):
+        body = make_page(shape, args.posts, args.tags).encode()
+        adapter = posts.ADAPTERS[shape]
+        modes = {"json.loads": (parse_whole, body, adapter, json.loads)}
+        if streaming.orjson is not None:
+            modes["orjson.loads"] = (parse_whole, body, adapter, streaming.orjson.loads)
+        modes["PostStream"] = (parse_stream, body, adapter)
+
+        expected = [post.id for post in parse_whole(body, adapter)]
+        print(
+            f"{shape}: {args.posts} posts, {args.tags} tags each ({len(body) / 1024:.0f} KiB page)"
+        )
+        for name, (function, *function_args) in modes.items():
+            assert [post.id for post in function(*function_args)] == expected
+            seconds = min(
+                timeit.repeat(
+                    lambda: function(*function_args), number=1, repeat=args.repeat
+                )
+            )
+            peak = peak_memory(function, *function_args)
+            print(
+                f"  {name:<13} {seconds * 1000:8.2f} ms/page  {peak / 1024:9.1f} KiB peak"
+            )
+
+
+if __name__ == "__main__":
+    main()
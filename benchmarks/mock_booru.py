@@ -0,0 +1,419 @@
+"""Local mock booru for offline benchmarks
+
+Serves synthetic posts and files the same way the supported APIs do:
+    * ``danbooru``: ``/posts.json`` returning a list of posts (``page=b<id>`` cursor, up to 200 posts)
+    * ``e621``: ``/posts.json`` returning ``{"posts": [...]}`` (``page=b<id>`` cursor, up to 320 posts)
+    * ``gelbooru``: ``/index.php?page=dapi&s=post&q=index&json=1`` returning ``{"@attributes", "post"}``
+      (``pid`` page number or ``id:<<id>`` tag, up to 1000 posts). Any other ``page`` is answered with ``404``.
+
+Searches support plain and ``-`` excluded tags, ``rating:``/``-rating:``, ``score:>=`` and ``id:>=`` (And
+``date:>=`` and ``favcount:>=`` except on gelbooru), other meta tags are ignored. Favorites of a post are half
+its score.
+Post counts of tags are served from ``/tags.json?search[name_matches]=<tag>`` (``index.php?page=dapi&s=tag``
+on gelbooru). Besides ``bench`` and random tags, posts have ``broad_1``/``broad_2``/``broad_3`` with a chance
+of 1/2, 1/4 and 1/8, for searches with tags of very different selectivity.
+Files are served from ``/data/<md5>.<ext>`` (With ``Range`` support). Pages carry an ``ETag`` and are
+answered with ``304`` when it matches. Every response waits ``latency`` seconds and is sent at most at
+``bandwidth`` bytes per second (Per connection). Counters of everything served are returned by ``/_stats``.
+
+The server runs in its own process (See ``MockBooru``) so it does not compete with the downloader for the GIL
+or count towards its memory.
+"""
+import hashlib
+import json
+import multiprocessing
+import random
+import threading
+import time
+import typing
+import urllib.request
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+#: Maximum posts per page of each flavor
+LIMITS = {"danbooru": 200, "e621": 320, "gelbooru": 1000}
+RATINGS = {"s": "safe", "q": "questionable", "e": "explicit"}
+CATEGORIES = [
+    "general",
+    "species",
+    "character",
+    "copyright",
+    "artist",
+    "invalid",
+    "lore",
+    "meta",
+]
+
+
+class Booru:
+    """Synthetic posts of a mock booru, each post pre-encoded as JSON
+
+    Args:
+        flavor (str): API to mimic (``danbooru``, ``e621`` or ``gelbooru``)
+        posts (int): Amount of posts, numbered from 1 (Newest last)
+        tags (int): Random tags per post besides ``bench``, which every post has, and the ``broad_`` tags
+        file_size (int): Bytes of every file
+        interval (float): Seconds between the creation of two posts
+        seed (int): Seed of the random tags, scores and ratings
+    """
+
+    def __init__(
+        self,
+        flavor: str = "danbooru",
+        posts: int = 2000,
+        tags: int = 40,
+        file_size: int = 20000,
+        interval: float = 60.0,
+        seed: int = 0,
+    ):
+        self.flavor = flavor
+        self.file_size = file_size
+        self.limit = LIMITS[flavor]
+        rng = random.Random(seed)
+        broad = random.Random(seed + 1)  # Separate, so the other values do not change
+        now = time.time()
+        vocabulary = [f"tag_{i}" for i in range(5000)]
+        self.ids: typing.List[int] = []  #: Post IDs, newest first
+        self.tags: typing.List[typing.FrozenSet[str]] = []
+        self.ratings: typing.List[str] = []
+        self.scores: typing.List[int] = []
+        self.created: typing.List[datetime] = []
+        self.encoded: typing.List[
+            str
+        ] = []  #: JSON of each post, without host in file URLs
+        self.files: typing.Set[str] = set()
+        self.counts: typing.Dict[str, int] = {}  #: Post count of every tag
+        for post_id in range(posts, 0, -1):
+            post_tags = ["bench"] + rng.sample(vocabulary, tags)
+            post_tags += [f"broad_{n}" for n in (1, 2, 3) if broad.random() < 0.5**n]
+            for tag in post_tags:
+                self.counts[tag] = self.counts.get(tag, 0) + 1
+            rating = rng.choice("sqe")
+            score = rng.randrange(-5, 100)
+            md5 = hashlib.md5(str(post_id).encode()).hexdigest()
+            ext = rng.choice(("png", "jpg", "gif"))
+            created = datetime.fromtimestamp(
+                now - (posts - post_id) * interval, timezone.utc
+            )
+            url = f"/data/{md5}.{ext}"
+            self.ids.append(post_id)
+            self.tags.append(frozenset(post_tags))
+            self.ratings.append(rating)
+            self.scores.append(score)
+            self.created.append(created)
+            self.files.add(url)
+            self.encoded.append(
+                json.dumps(
+                    self.post(post_id, post_tags, rating, score, md5, ext, created, url)
+                )
+            )
+
+    def post(self, post_id, tags, rating, score, md5, ext, created, url) -> dict:
+        """Creates a post in the flavor's shape (``url`` is completed with the host when served)"""
+        if self.flavor == "e621":
+            return {
+                "id": post_id,
+                "created_at": created.isoformat(),
+                "score": {"up": max(score, 0), "down": min(score, 0), "total": score},
+                "fav_count": score // 2,
+                "rating": rating,
+                "file": {"url": url, "ext": ext, "md5": md5, "size": self.file_size},
+                "tags": {
+                    c: tags[i :: len(CATEGORIES)] for i, c in enumerate(CATEGORIES)
+                },
+                "sources": [],
+                "description": "",
+            }
+        if self.flavor == "gelbooru":
+            return {
+                "id": post_id,
+                "created_at": created.strftime("%a %b %d %H:%M:%S %z %Y"),
+                "score": score,
+                "rating": RATINGS[rating],
+                "md5": md5,
+                "tags": " ".join(tags),
+                "file_url": url,
+                "source": "",
+            }
+        return {
+            "id": post_id,
+            "created_at": created.isoformat(),
+            "score": score,
+            "fav_count": score // 2,
+            "rating": rating,
+            "md5": md5,
+            "file_ext": ext,
+            "file_url": url,
+            "file_size": self.file_size,
+            "tag_string": " ".join(tags),
+            "source": "",
+        }
+
+    def search(
+        self, tags: str, before_id: int = None, offset: int = 0, limit: int = 100
+    ) -> typing.List[int]:
+        """Collects the indexes of the posts matching a search, newest first"""
+        include, exclude, ratings, min_score = set(), set(), None, None
+        after, min_faves, min_id = None, None, None
+        for tag in tags.split():
+            if tag.startswith("rating:"):
+                ratings = {rating[:1] for rating in tag[7:].split(",")}
+            elif tag.startswith("-rating:"):
+                ratings = set(RATINGS) - {tag[8:9]}
+            elif tag.startswith("score:>="):
+                min_score = int(tag[8:])
+            elif tag.startswith("id:<"):
+                cursor = int(tag[4:])
+                before_id = cursor if before_id is None else min(before_id, cursor)
+            elif tag.startswith("id:>="):
+                min_id = int(tag[5:])
+            elif tag.startswith("date:>=") and self.flavor != "gelbooru":
+                after = datetime.strptime(tag[7:], "%Y-%m-%d").replace(
+                    tzinfo=timezone.utc
+                )
+            elif tag.startswith("favcount:>=") and self.flavor != "gelbooru":
+                min_faves = int(tag[11:])
+            elif ":" in tag:
+                continue  # Other meta tags are not supported
+            elif tag.startswith("-"):
+                exclude.add(tag[1:])
+            else:
+                include.add(tag)
+        found = []
+        skipped = 0
+        for index, post_id in enumerate(self.ids):
+            if before_id is not None and post_id >= before_id:
+                continue
+            if min_id is not None and post_id < min_id:
+                break  # Posts are ordered newest first
+            post_tags = self.tags[index]
+            if (
+                include <= post_tags
+                and exclude.isdisjoint(post_tags)
+                and (ratings is None or self.ratings[index] in ratings)
+                and (min_score is None or self.scores[index] >= min_score)
+                and (after is None or self.created[index] >= after)
+                and (min_faves is None or self.scores[index] // 2 >= min_faves)
+            ):
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                found.append(index)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def tag(self, name: str) -> bytes:
+        """Encodes the post count of a tag in the flavor's layout"""
+        tags = (
+            [{"id": 1, "name": name, "post_count": self.counts[name]}]
+            if name in self.counts
+            else []
+        )
+        if self.flavor == "gelbooru":
+            for tag in tags:
+                tag["count"] = tag.pop("post_count")
+            return json.dumps(
+                {"@attributes": {"limit": 100, "count": len(tags)}, "tag": tags}
+            ).encode()
+        if self.flavor == "e621" and not tags:
+            return b'{"tags":[]}'
+        return json.dumps(tags).encode()
+
+    def page(self, indexes: typing.List[int], host: str) -> bytes:
+        """Encodes a page of posts in the flavor's layout"""
+        posts = ",".join(self.encoded[index] for index in indexes).replace(
+            '"/data/', f'"http://{host}/data/'
+        )
+        if self.flavor == "e621":
+            return f'{{"posts":[{posts}]}}'.encode()
+        if self.flavor == "gelbooru":
+            return f'{{"@attributes":{{"limit":{self.limit},"count":{len(indexes)}}},"post":[{posts}]}}'.encode()
+        return f"[{posts}]".encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Request handler of the mock booru (Keep-alive, as real boorus)"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body are written separately
+    booru: Booru
+    latency = 0.0
+    bandwidth = 0
+    stats: typing.Dict[str, int] = {}
+    stats_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def count(self, **values: int) -> None:
+        with self.stats_lock:
+            for key, value in values.items():
+                self.stats[key] = self.stats.get(key, 0) + value
+
+    def send(self, status: int, body: bytes = b"", headers: dict = None) -> None:
+        """Sends a response after the configured latency, at the configured bandwidth"""
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not self.bandwidth:
+            self.wfile.write(body)
+        else:
+            chunk_size = max(self.bandwidth // 20, 1024)
+            for start in range(0, len(body), chunk_size):
+                self.wfile.write(body[start : start + chunk_size])
+                time.sleep(len(body[start : start + chunk_size]) / self.bandwidth)
+        self.count(responses=1, bytes_sent=len(body))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == "/_stats":
+            with self.stats_lock:
+                body = json.dumps(self.stats).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if url.path.startswith("/data/"):
+            return self.send_file(url.path)
+
+        booru = self.booru
+        try:
+            limit = min(int(query.get("limit", 100)), booru.limit)
+            if booru.flavor == "gelbooru":
+                if url.path != "/index.php" or query.get("page") != "dapi":
+                    return self.send(404)
+                if query.get("s") == "tag":
+                    self.count(tags=1)
+                    return self.send(200, booru.tag(query.get("name", "")))
+                indexes = booru.search(
+                    query.get("tags", ""),
+                    offset=int(query.get("pid", 0)) * limit,
+                    limit=limit,
+                )
+            else:
+                if url.path == "/tags.json":
+                    self.count(tags=1)
+                    return self.send(
+                        200, booru.tag(query.get("search[name_matches]", ""))
+                    )
+                if url.path != "/posts.json":
+                    return self.send(404)
+                page = query.get("page", "1")
+                before_id = int(page[1:]) if page.startswith("b") else None
+                offset = 0 if before_id is not None else (int(page) - 1) * limit
+                indexes = booru.search(query.get("tags", ""), before_id, offset, limit)
+        except ValueError:
+            return self.send(422)
+        body = booru.page(indexes, self.headers.get("Host", "localhost"))
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.count(pages=1, not_modified=1)
+            return self.send(304, headers={"ETag": etag})
+        self.count(pages=1, posts=len(indexes))
+        self.send(200, body, {"Content-Type": "application/json", "ETag": etag})
+
+    def send_file(self, path: str) -> None:
+        if path not in self.booru.files:
+            return self.send(404)
+        body = (path.encode() * (self.booru.file_size // len(path) + 1))[
+            : self.booru.file_size
+        ]
+        headers = {"Content-Type": "application/octet-stream"}
+        status = 200
+        requested = self.headers.get("Range", "")
+        if requested.startswith("bytes="):
+            start = int(requested[6:].split("-")[0] or 0)
+            headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            body = body[start:]
+            status = 206
+        self.count(files=1)
+        self.send(status, body, headers)
+
+
+def serve(options: dict, ready: multiprocessing.Queue) -> None:
+    """Runs a mock booru until the process is terminated (Target of ``MockBooru``)"""
+    handler = type(
+        "BoundHandler",
+        (Handler,),
+        {
+            "booru": Booru(**options["booru"]),
+            "latency": options["latency"],
+            "bandwidth": options["bandwidth"],
+            "stats": {},
+        },
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+class MockBooru:
+    """Mock booru running in a separate process
+
+    Args:
+        flavor (str): API to mimic (``danbooru``, ``e621`` or ``gelbooru``)
+        latency (float): Seconds every response waits before it is sent
+        bandwidth (int): Bytes per second each response is sent at (0 for unlimited)
+        **booru: Passed through to ``Booru`` (``posts``, ``tags``, ``file_size``, ...)
+
+    Example:
+        ``with MockBooru("danbooru", latency=0.05) as booru: print(booru.url)``
+    """
+
+    def __init__(
+        self,
+        flavor: str = "danbooru",
+        latency: float = 0.0,
+        bandwidth: int = 0,
+        **booru,
+    ):
+        self.options = {
+            "booru": dict(booru, flavor=flavor),
+            "latency": latency,
+            "bandwidth": bandwidth,
+        }
+        self.process: typing.Optional[multiprocessing.Process] = None
+        self.url = ""
+
+    def start(self) -> str:
+        """Starts the server process
+
+        Returns:
+            str: URL of the mock booru (Such as http://127.0.0.1:8000)
+        """
+        ready: multiprocessing.Queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=serve, args=(self.options, ready), daemon=True
+        )
+        self.process.start()
+        self.url = f"http://127.0.0.1:{ready.get(timeout=120)}"
+        return self.url
+
+    def stats(self) -> typing.Dict[str, int]:
+        """Collects the counters of everything served (``pages``, ``posts``, ``files``, ``bytes_sent``, ...)"""
+        with urllib.request.urlopen(f"{self.url}/_stats") as response:
+            return json.loads(response.read())
+
+    def stop(self) -> None:
+        """Stops the server process"""
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def __enter__(self) -> "MockBooru":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -1,5 +1,23 @@
-from booru_dl.library.config import Config
-from booru_dl.main import Downloader
+"""Automatic Downloading of any booru!
 
-# Ignore: Used to prevent F401 from Flake8
-test_str = (Config, Downloader)
+``Config`` and ``Downloader`` are imported on first use, so importing the package (Such as for
+``python -m booru_dl --help``) does not load ``requests`` and the rest of the downloader.
+"""
+import importlib
+import typing
+
+if typing.TYPE_CHECKING:
+    from booru_dl.library.config import Config
+    from booru_dl.main import Downloader
+
+__all__ = ["Config", "Downloader"]
+
+_LAZY = {"Config": "booru_dl.library.config", "Downloader": "booru_dl.main"}
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name]), name)
+        globals()[name] = value  # Later lookups skip __getattr__
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
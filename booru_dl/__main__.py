@@ -0,0 +1,60 @@
+"""Command line entry point of booru-dl
+
+Run with ``python -m booru_dl [config.ini] [--full]`` or the ``booru-dl`` script installed with the package.
+Arguments are parsed before the downloader is imported, so ``--help`` returns immediately.
+"""
+import argparse
+import logging
+from typing import List, Optional
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Downloads every section of a config
+
+    Args:
+        argv (list): Command line arguments, defaults to ``sys.argv[1:]``
+
+    Returns:
+        int: Exit code, 0 if all sections were collected and 1 if any collection failed
+    """
+    parser = argparse.ArgumentParser(
+        prog="booru-dl", description="Automatic Downloading of any booru!"
+    )
+    parser.add_argument(
+        "config", nargs="?", default="config.ini", help="Config file to use"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Search all days of every section, ignoring where previous runs stopped",
+    )
+    parser.add_argument(
+        "--log-size",
+        type=float,
+        default=10,
+        help="MiB the log file is rotated at (0 overwrites it every run instead)",
+    )
+    parser.add_argument(
+        "--log-backups", type=int, default=5, help="Rotated log files to keep"
+    )
+    parser.add_argument(
+        "--compress-logs", action="store_true", help="Compress rotated log files"
+    )
+    args = parser.parse_args(argv)
+
+    from booru_dl.library import backend
+    from booru_dl.main import Downloader
+
+    backend.set_logger(
+        logging.getLogger(),
+        "booru-dl.log",
+        int(args.log_size * 1024 * 1024),
+        max(args.log_backups, 0),
+        args.compress_logs,
+    )
+    downloader = Downloader(args.config, full=args.full)
+    return downloader.get_data()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
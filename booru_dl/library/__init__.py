@@ -2,4 +2,4 @@
 List of all packages
 """
 
-__all__ = "backend, config"
+__all__ = "backend, cache, config, filters, index, metrics, pipeline, planner, posts, sharding, storage, streaming"
@@ -1,36 +1,65 @@
 """Backend for booru access via requests
 
 Primarily used to POST request the booru website, collect a Requests session, and setup logging for all files.
+
+Each [URI] of the config receives a ``Backend`` owning its own session (Connection pool, user-agent and
+authentication), shared by every worker requesting that booru.
 """
+import atexit
+import email.utils
+import gzip
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import shutil
+import threading
+import time
 import typing
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-import cloudscraper
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 
-# TODO refactor backend into its own class
-#  Allows for multiple backend sessions to be used in main file
-#    this change is necessary to support multiple uris
+from booru_dl.library.cache import CHUNK_SIZE, PageCache
+from booru_dl.library.metrics import Metrics
 
 # TODO add backend support for API endpoint determination per URI
 #   some boorus are different, would be nice to create modularized code
 #   to work with the majority of available boorus - TBD
 
-# TODO fix Downloader() class in main having its own version of request_uri for download_file()
-
 
-def get_session(useragent: str) -> requests.Session:
+def get_session(useragent: str, pool_size: int = 10) -> requests.Session:
     """Offers a Session for requests
 
+    Connections are kept alive and pooled per host (Up to ``pool_size`` connections each), and
+    responses are requested compressed with any encoding the installed urllib3 can decode.
+
     Args:
         useragent (str): Name to use for user-agent when requesting of booru website.
             Defaults to ``Booru DL (user unknown)`` if no user_name provided
+        pool_size (int): Amount of connections kept open per host (Should cover all concurrent requests)
 
     Returns:
         requests.Session: Requests Session object with correctly formatted user-agent
     """
     session = requests.Session()
-    session.headers.update({"User-Agent": useragent})
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(
+        {
+            "User-Agent": useragent,
+            "Accept-Encoding": urllib3.util.make_headers(accept_encoding=True)[
+                "accept-encoding"
+            ],
+            "Connection": "keep-alive",
+        }
+    )
     return session
 
 
@@ -116,12 +145,358 @@ def get_session(useragent: str) -> requests.Session:
 #     pass
 
 
+class TokenBucket:
+    """Token bucket limiting the request rate of a single host
+
+    Each request takes a token, tokens refill at ``rate`` per second up to ``burst`` tokens.
+    Requests made without a token available reserve the next one and sleep until it refills.
+
+    Args:
+        rate (float): Requests allowed per second
+        burst (int): Amount of requests allowed at once after the host was idle
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = self.rate = float(rate)
+        self.burst = max(int(burst), 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = (
+            0.0  #: Monotonic time until which the host asked us to wait
+        )
+        self.penalties = 0  #: Consecutive rate-limit responses from the host
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Takes a token from the bucket, sleeping until one is available
+
+        Returns:
+            float: Seconds spent waiting on the bucket
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + max(now - self.updated, 0) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            delay = max(-self.tokens / self.rate, 0) + max(self.blocked_until - now, 0)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def penalize(self, retry_after: typing.Optional[float]) -> float:
+        """Backs off after the host rejected a request for being too fast
+
+        Halves the request rate and blocks the bucket for ``retry_after`` seconds, or an
+        exponentially increasing delay if the host did not say how long to wait.
+
+        Args:
+            retry_after (float): Seconds requested by the host's ``Retry-After`` header if provided
+
+        Returns:
+            float: Seconds the bucket is blocked for
+        """
+        with self.lock:
+            self.penalties += 1
+            delay = (
+                retry_after
+                if retry_after is not None
+                else min(2 ** (self.penalties - 1), 60)
+            )
+            self.rate = max(self.rate / 2, self.max_rate / 16)
+            self.tokens = min(self.tokens, 0)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        return delay
+
+    def reward(self) -> None:
+        """Slowly restores the request rate after a successful request"""
+        with self.lock:
+            self.penalties = 0
+            if self.rate < self.max_rate:
+                self.rate = min(self.rate + self.max_rate / 20, self.max_rate)
+
+
+class RateLimiter:
+    """Collection of ``TokenBucket`` instances keyed by host
+
+    Hosts without a configured limit (such as a booru's file CDN) use the default rate and burst.
+
+    Args:
+        rate (float): Default requests per second for hosts not configured
+        burst (int): Default burst size for hosts not configured
+        metrics (Metrics): Records the wait of every request by host if provided
+    """
+
+    RETRY_CODES = (429, 503)  #: Status codes indicating the host wants us to slow down
+
+    def __init__(self, rate: float = 2.0, burst: int = 2, metrics: Metrics = None):
+        self.rate = rate
+        self.burst = burst
+        self.metrics = metrics
+        self.buckets: typing.Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def host(url: str) -> str:
+        """Collects the host name used to key a bucket from a URL"""
+        return urllib.parse.urlsplit(url).netloc.lower()
+
+    def configure(self, url: str, rate: float, burst: int) -> None:
+        """Sets the rate and burst size for the host of the given URL
+
+        Args:
+            url (str): Any URL on the host (Such as the booru's base URI)
+            rate (float): Requests allowed per second
+            burst (int): Amount of requests allowed at once
+        """
+        with self.lock:
+            self.buckets[self.host(url)] = TokenBucket(rate, burst)
+
+    def bucket(self, url: str) -> TokenBucket:
+        """Collects the bucket for the host of the given URL, creating a default one if needed"""
+        host = self.host(url)
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def acquire(self, url: str) -> float:
+        """Waits until a request to the URL's host is allowed
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = self.bucket(url).acquire()
+        if self.metrics is not None:
+            self.metrics.observe("rate_limit_wait_seconds", waited, host=self.host(url))
+        return waited
+
+    def update(self, url: str, response: requests.Response) -> bool:
+        """Updates the host's bucket using a response
+
+        Args:
+            url (str): URL that was requested
+            response (requests.Response): Response of the host
+
+        Returns:
+            bool: True if the host asked to slow down and the request should be retried
+        """
+        bucket = self.bucket(url)
+        if response.status_code in self.RETRY_CODES:
+            delay = bucket.penalize(parse_retry_after(response))
+            logging.warning(
+                f"Rate limited by {self.host(url)} [Status Code: {response.status_code}]"
+                f" - Waiting {delay:.2f}s and reducing request rate to {bucket.rate:.2f}/s"
+            )
+            return True
+        bucket.reward()
+        return False
+
+
+def parse_retry_after(response: requests.Response) -> typing.Optional[float]:
+    """Collects the seconds to wait from a ``Retry-After`` header
+
+    Args:
+        response (requests.Response): Response that may contain the header
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:  # HTTP-date format
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(date.timestamp() - time.time(), 0.0)
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter for requests that failed for a (likely) temporary reason
+
+    The delay before retry ``n`` (Starting at 0) is ``backoff * 2 ** n`` capped at ``backoff_max``, of which
+    a random ``jitter`` fraction is removed so workers failing at the same time do not retry at the same time.
+
+    Args:
+        retries (int): Amount of times a failed request is retried (0 disables retries)
+        backoff (float): Seconds waited before the first retry
+        backoff_max (float): Maximum seconds waited before any retry
+        jitter (float): Fraction of each delay that is randomized (0 for fixed delays, 1 for full jitter)
+    """
+
+    #: Status codes of temporary server problems (Rate limited requests also wait on the ``RateLimiter``)
+    RETRY_CODES = (429, 500, 502, 503, 504)
+    #: Exceptions of temporary connection problems
+    RETRY_ERRORS = (
+        requests.ConnectionError,
+        requests.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+    )
+
+    def __init__(
+        self,
+        retries: int = 3,
+        backoff: float = 1.0,
+        backoff_max: float = 60.0,
+        jitter: float = 0.5,
+    ):
+        self.retries = max(int(retries), 0)
+        self.backoff = max(float(backoff), 0.0)
+        self.backoff_max = max(float(backoff_max), self.backoff)
+        self.jitter = min(max(float(jitter), 0.0), 1.0)
+
+    def delay(self, attempt: int) -> float:
+        """Collects the seconds to wait before retrying a request
+
+        Args:
+            attempt (int): Amount of retries already made for the request
+
+        Returns:
+            float: Seconds to wait
+        """
+        delay = min(self.backoff * 2**attempt, self.backoff_max)
+        return delay * (1 - self.jitter * random.random())
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of requesting an API that failed too many times in a row"""
+
+
+class TagLimitError(requests.RequestException):
+    """Raised when a booru rejects a search for its tags (``422``), such as searching more tags than allowed"""
+
+
+class CircuitBreaker:
+    """Tracks the health of a single API, opening once it fails too many times in a row
+
+    While open, requests to the API are refused (See ``Backend``) so the run can continue with other APIs
+    instead of waiting on retries that keep failing. After ``cooldown`` seconds requests are allowed
+    again, a success closes the breaker while another failure opens it for a new cooldown.
+
+    Args:
+        threshold (int): Consecutive failed requests (After retries) that open the breaker
+        cooldown (float): Seconds the breaker stays open
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 300.0):
+        self.threshold = max(int(threshold), 1)
+        self.cooldown = float(cooldown)
+        self.failures = 0  #: Consecutive failed requests
+        self.opened_at: typing.Optional[
+            float
+        ] = None  #: Monotonic time the breaker opened
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests to the API are currently refused"""
+        with self.lock:
+            return (
+                self.opened_at is not None
+                and time.monotonic() - self.opened_at < self.cooldown
+            )
+
+    def success(self) -> None:
+        """Closes the breaker after a successful request"""
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self) -> bool:
+        """Counts a failed request, opening the breaker once ``threshold`` failures happened in a row
+
+        Returns:
+            bool: True if this failure opened the breaker
+        """
+        with self.lock:
+            self.failures += 1
+            if self.failures < self.threshold:
+                return False
+            opened = (
+                self.opened_at is None
+                or time.monotonic() - self.opened_at >= self.cooldown
+            )
+            if opened:
+                self.opened_at = time.monotonic()
+            return opened
+
+
+def throttled_get(
+    session: requests.Session,
+    url: str,
+    limiter: RateLimiter = None,
+    retry: RetryPolicy = None,
+    **kwargs,
+) -> requests.Response:
+    """GET requests a URL while complying with the host's rate limit
+
+    Connection errors and responses of temporary server problems (See ``RetryPolicy.RETRY_CODES``) are
+    retried with exponential backoff. Responses of ``429``/``503`` also slow down the host's bucket
+    (See ``RateLimiter.update``). The last response is returned if the host keeps failing.
+
+    Args:
+        session (requests.Session): Session to use in requesting website
+        url (str): URL to request data from
+        limiter (RateLimiter): Rate limiter to wait on, requests are not limited if not provided
+        retry (RetryPolicy): Retries and backoff to use, defaults to ``RetryPolicy()``
+        **kwargs: Passed through to ``session.get``
+
+    Returns:
+        requests.Response: Response of the host
+
+    Raises:
+        requests.RequestException: Connection failed on every attempt
+    """
+    retry = retry or RetryPolicy()
+    attempt = 0
+    while True:
+        if limiter:
+            limiter.acquire(url)
+        try:
+            result = session.get(url, **kwargs)
+        except retry.RETRY_ERRORS as e:
+            if attempt >= retry.retries:
+                raise
+            delay = retry.delay(attempt)
+            logging.warning(
+                f"Request for {url} failed ({type(e).__name__}) - "
+                f"Retrying in {delay:.2f}s [{attempt + 1}/{retry.retries}]"
+            )
+        else:
+            limited = limiter.update(url, result) if limiter else False
+            if attempt >= retry.retries or (
+                not limited and result.status_code not in retry.RETRY_CODES
+            ):
+                return result
+            result.close()
+            # Rate limited requests wait on the host's bucket instead
+            delay = 0.0 if limited else retry.delay(attempt)
+            if not limited:
+                delay = max(delay, parse_retry_after(result) or 0.0)
+                logging.warning(
+                    f"Request for {url} failed [Status Code: {result.status_code}] - "
+                    f"Retrying in {delay:.2f}s [{attempt + 1}/{retry.retries}]"
+                )
+        time.sleep(delay)
+        attempt += 1
+
+
 def request_uri(
     session: requests.Session,
     url: str,
     package: typing.Dict[str, object] = None,
     auth: typing.Tuple[str, str] = None,
     silent: bool = False,
+    limiter: RateLimiter = None,
+    retry: RetryPolicy = None,
+    stream: bool = False,
+    headers: typing.Dict[str, str] = None,
 ) -> requests.Response:
     """POST requests a given booru website for data
 
@@ -131,31 +506,225 @@ def request_uri(
         package (dict): Dictionary containing data to send to URL
         auth (tuple): Tuple containing api_key and user_name if provided
         silent (bool): Whether to provide log data silently (DEBUG level) or notify of errors (ERROR level)
+        limiter (RateLimiter): Rate limiter for the booru's host if requests should be limited
+        retry (RetryPolicy): Retries and backoff for temporary failures, see ``throttled_get``
+        stream (bool): Whether to leave the body unread so it can be decoded as it arrives
+        headers (dict): Extra request headers, such as conditional request headers (``304`` is then
+            accepted as success)
 
     Returns:
         object: Error code if failure or data if successful
+
+    Raises:
+        TagLimitError: The booru rejected the tags searched (Searches are planned again with less tags - See
+            ``Downloader.get_posts``)
+        requests.RequestException: The request failed
     """
     if package and auth:
-        result = session.get(url, params=package, auth=auth)
+        result = throttled_get(
+            session,
+            url,
+            limiter,
+            retry,
+            params=package,
+            auth=auth,
+            stream=stream,
+            headers=headers,
+        )
     elif package:
-        result = session.get(url, params=package)
+        result = throttled_get(
+            session, url, limiter, retry, params=package, stream=stream, headers=headers
+        )
     else:
-        result = session.get(url)
+        result = throttled_get(
+            session, url, limiter, retry, stream=stream, headers=headers
+        )
     # print(result.url)
 
-    if result.status_code == 200:
-        return result
-    elif result.status_code == 422:  # Invalid tagging request
-        # limit search to 2 tags if 422 is thrown [Locked/Bad request]
-        package["tags"] = " ".join(str(package["tags"]).split(" ")[:2])  # type: ignore
-        result = session.get(url, params=package)
+    if result.status_code == 200 or (headers and result.status_code == 304):
         return result
+    elif result.status_code == 422:  # Invalid tagging request [Locked/Bad request]
+        result.close()
+        tags = package.get("tags", "") if package else ""
+        logging.debug("Tags rejected for: %s", result.url)
+        raise TagLimitError(f"{result.status_code} - Tags rejected: {tags}")
     else:
         logging.error(f"Request for {url} failed. Error code {result.status_code}")
-        logging.debug(f"URL failure for: {result.url}")
+        logging.debug("URL failure for: %s", result.url)
         raise requests.RequestException(result.status_code)
 
 
+def closing_iter(response: requests.Response) -> typing.Iterator[bytes]:
+    """Yields the decoded body of a response in chunks, closing the response once read"""
+    try:
+        yield from response.iter_content(CHUNK_SIZE)
+    finally:
+        response.close()
+
+
+class Backend:
+    """Connection handling for a single [URI] entry of the config
+
+    Owns the session used for the booru's API and its files, so every worker requesting the booru reuses
+    the same pool of open connections instead of opening a new one per request.
+
+    Requests are retried on temporary failures and counted by the booru's circuit breaker. Once the
+    breaker opens, requests raise ``CircuitOpenError`` until its cooldown has passed.
+
+    Args:
+        nickname (str): [URI] nickname of the booru
+        uri (str): URL of the booru (Such as https://google.com)
+        api_type (str): Type of booru API (``danbooru``, ``gelbooru`` or ``None``)
+        user (str): User name for the booru, used in the user-agent and for authentication if provided
+        api_key (str): API key for the booru, used for authentication if provided with a user name
+        limiter (RateLimiter): Rate limiter shared by all backends
+        pool_size (int): Amount of connections kept open per host
+        retry (RetryPolicy): Retries and backoff for temporary failures
+        breaker (CircuitBreaker): Health of the booru, defaults to a new ``CircuitBreaker()``
+        cache (PageCache): Cache of API pages for ``request_page``, pages are not cached if not provided
+    """
+
+    def __init__(
+        self,
+        nickname: str,
+        uri: str,
+        api_type: str,
+        user: str = "",
+        api_key: str = "",
+        limiter: RateLimiter = None,
+        pool_size: int = 10,
+        retry: RetryPolicy = None,
+        breaker: CircuitBreaker = None,
+        cache: PageCache = None,
+    ):
+        self.nickname = nickname
+        self.uri = uri
+        self.api_type = api_type
+        self.limiter = limiter
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.cache = cache
+        self.useragent = (
+            f"Booru DL (user {user})" if user else "Booru DL (user unknown)"
+        )
+        self.auth = (user, api_key) if user and api_key else None
+        self.session = get_session(self.useragent, pool_size)
+
+    def check(self) -> None:
+        """Refuses to request the booru while its circuit breaker is open
+
+        Raises:
+            CircuitOpenError: The breaker is open
+        """
+        if self.breaker.is_open:
+            raise CircuitOpenError(
+                f"API {self.nickname} is unavailable after {self.breaker.failures} failed requests"
+            )
+
+    def failed(self) -> None:
+        """Counts a failed request against the booru's circuit breaker"""
+        if self.breaker.failure():
+            logging.error(
+                f"API {self.nickname} failed {self.breaker.failures} times in a row - "
+                f"Pausing requests for {self.breaker.cooldown:.0f}s"
+            )
+
+    def request_uri(
+        self,
+        url: str,
+        package: typing.Dict[str, object] = None,
+        stream: bool = False,
+        headers: typing.Dict[str, str] = None,
+    ) -> requests.Response:
+        """Requests an API page of the booru (Authenticated if possible), see ``request_uri``
+
+        Raises:
+            CircuitOpenError: The booru's circuit breaker is open
+            TagLimitError: The booru rejected the tags searched
+            requests.RequestException: The request failed after all retries
+        """
+        self.check()
+        try:
+            result = request_uri(
+                self.session,
+                url,
+                package,
+                auth=self.auth,
+                limiter=self.limiter,
+                retry=self.retry,
+                stream=stream,
+                headers=headers,
+            )
+        except TagLimitError:  # The booru answered, only the search is at fault
+            self.breaker.success()
+            raise
+        except requests.RequestException:
+            self.failed()
+            raise
+        self.breaker.success()
+        return result
+
+    def request_page(
+        self, url: str, package: typing.Dict[str, object] = None, stream: bool = False
+    ) -> typing.Iterator[bytes]:
+        """Requests an API page of the booru, using the page cache if provided
+
+        Pages in the cache are requested conditionally, a ``304 Not Modified`` response is answered with
+        the cached page. Other pages are stored in the cache while they are read (See ``cache.PageCache``).
+
+        Args:
+            url (str): URL of the API endpoint
+            package (dict): Search package of the page (See ``format_package``)
+            stream (bool): Whether the body is received while it is read (Otherwise before returning)
+
+        Returns:
+            iterator of bytes: Decoded chunks of the page's body (The response is closed once read)
+
+        Raises:
+            CircuitOpenError: The booru's circuit breaker is open
+            requests.RequestException: The request failed after all retries
+        """
+        if self.cache is None:
+            result = self.request_uri(url, package, stream=stream)
+            return closing_iter(result)
+        key = self.cache.key(url, package, self.auth[0] if self.auth else "")
+        result = self.request_uri(
+            url, package, stream=stream, headers=self.cache.headers(key) or None
+        )
+        if result.status_code == 304:
+            result.close()
+            logging.debug("Page %s not modified - Using cached page", result.url)
+            try:
+                return self.cache.read(key)
+            except KeyError:  # Evicted in the meantime
+                result = self.request_uri(url, package, stream=stream)
+        return self.cache.store(key, result)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Requests any URL (Such as a file) using the booru's session, see ``throttled_get``
+
+        Responses of temporary server problems count against the circuit breaker, other responses
+        (Such as ``404`` for a removed file) are returned as-is.
+
+        Raises:
+            CircuitOpenError: The booru's circuit breaker is open
+            requests.RequestException: Connection failed after all retries
+        """
+        self.check()
+        try:
+            result = throttled_get(
+                self.session, url, self.limiter, self.retry, **kwargs
+            )
+        except requests.RequestException:
+            self.failed()
+            raise
+        if result.status_code in self.retry.RETRY_CODES:
+            self.failed()
+        else:
+            self.breaker.success()
+        return result
+
+
 # def timer(start_time, name="URI Request", optional_clarifier=""):
 #     """Defines total time for function based on a start_time and optional naming"""
 #     end_time = time.time()
@@ -185,12 +754,25 @@ def request_uri(
 #         time.sleep(sleep_time / 1000)
 
 
-def set_logger(log: logging.Logger, name: str) -> logging.Logger:
+def set_logger(
+    log: logging.Logger,
+    name: str,
+    max_bytes: int = 10 * 1024 * 1024,
+    backups: int = 5,
+    compress: bool = False,
+) -> logging.Logger:
     """Set up of logging program based on a provided logging.Logger
 
+    Records are handed to a queue and written by a background thread (See ``logging.handlers.QueueListener``),
+    so logging never waits on the console or disk. The log file is rotated once larger than ``max_bytes``,
+    and every run starts a new file, keeping the previous ``backups`` files as ``<name>.1``, ``<name>.2``...
+
     Args:
         log (logging.Logger): Logger object to add handlers to
         name (str): Output file name
+        max_bytes (int): Size the log file is rotated at (0 disables rotation, overwriting the file every run)
+        backups (int): Amount of rotated log files kept
+        compress (bool): Whether rotated log files are compressed (As ``<name>.1.gz``...)
 
     Returns:
         logging.Logger: Logger formatted with log format specified (by me)
@@ -198,7 +780,20 @@ def set_logger(log: logging.Logger, name: str) -> logging.Logger:
     log.setLevel(logging.DEBUG)
 
     sh = logging.StreamHandler()
-    fh = logging.FileHandler(name, mode="w")
+    if max_bytes > 0:
+        fh = logging.handlers.RotatingFileHandler(
+            name, maxBytes=max_bytes, backupCount=backups, delay=True
+        )
+        if compress:
+            fh.namer = gzip_namer
+            fh.rotator = gzip_rotator
+        if os.path.exists(name) and os.path.getsize(name):
+            if backups:
+                fh.doRollover()  # Keeps the log of the previous run
+            else:
+                os.remove(name)
+    else:
+        fh = logging.FileHandler(name, mode="w")
     sh.setLevel(logging.INFO)
     fh.setLevel(logging.DEBUG)
 
@@ -208,16 +803,44 @@ def set_logger(log: logging.Logger, name: str) -> logging.Logger:
     sh.setFormatter(formatter)
     fh.setFormatter(formatter)
 
-    log.addHandler(fh)
-    log.addHandler(sh)
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        records, fh, sh, respect_handler_level=True
+    )
+    handler = logging.handlers.QueueHandler(records)
+    handler.listener = listener  # type: ignore[attr-defined] # As set by dictConfig from Python 3.12
+    log.addHandler(handler)
+    listener.start()
+    atexit.register(
+        stop_listener, listener
+    )  # Writes the remaining records before exiting
     return log
 
 
-def determine_api(api: str) -> str:
+def stop_listener(listener: logging.handlers.QueueListener) -> None:
+    """Stops a log listener, writing its remaining records, unless already stopped"""
+    if getattr(listener, "_thread", None) is not None:
+        listener.stop()
+
+
+def gzip_namer(name: str) -> str:
+    """Names a rotated log file (See ``set_logger``)"""
+    return f"{name}.gz"
+
+
+def gzip_rotator(source: str, dest: str) -> None:
+    """Compresses a rotated log file (See ``set_logger``)"""
+    with open(source, "rb") as plain, gzip.open(dest, "wb") as compressed:
+        shutil.copyfileobj(plain, compressed)
+    os.remove(source)
+
+
+def determine_api(api: str, timeout: float = 10.0) -> str:
     """Function that attempts to determine the API for a given site.
 
     Args:
         api (str): URL of the site (Such as https://google.com)
+        timeout (float): Seconds to wait on each probe of the site
 
     Returns:
         str: Determined API endpoint type for the given site, or 'None' if couldn't determine
@@ -231,7 +854,7 @@ def determine_api(api: str) -> str:
     # Attempt 'danbooru' booru api setup
     try:
         package = format_package(tags, before_id, "danbooru")
-        result = session.get(api + "/posts.json", params=package)
+        result = session.get(api + "/posts.json", params=package, timeout=timeout)
         if result.status_code == 200:
             data = result.json()
             if len(data) == 1:
@@ -240,22 +863,26 @@ def determine_api(api: str) -> str:
             api_type = "danbooru"
         else:
             raise requests.RequestException(f"Error Status Code: {result.status_code}")
-    except requests.RequestException:
-        pass
+    except (requests.RequestException, ValueError, LookupError, AssertionError):
+        pass  # Not a danbooru style API (Or no response)
 
     if api_type != "danbooru":
         # Attempt 'gelbooru' booru api setup [With support for JSON]
         try:
             package = format_package(tags, before_id, "gelbooru")
-            result = session.get(api + "/index.php", params=package)
+            result = session.get(api + "/index.php", params=package, timeout=timeout)
             if result.status_code == 200:
                 data = result.json()
                 assert type(data) == list and type(data[0]) == dict
                 api_type = "gelbooru"
             else:
+                import cloudscraper  # Only needed here, slow to import
+
                 scraper = cloudscraper.create_scraper()
                 # result = scraper.get(api+'/index.php', params=package).text
-                result = scraper.get(api + "/index.php", params=package)
+                result = scraper.get(
+                    api + "/index.php", params=package, timeout=timeout
+                )
                 # Cloudscraper is broken without paid subscription so just auto-fail
                 assert result.status_code == 403
                 logging.error(
@@ -264,13 +891,32 @@ def determine_api(api: str) -> str:
                 raise requests.RequestException(
                     f"Error Status Code: {result.status_code}"
                 )
-        except requests.RequestException:
+        except (requests.RequestException, ValueError, LookupError, AssertionError):
             pass
 
     logging.debug(f"Website {api} is of type {api_type}")
     return api_type
 
 
+def determine_apis(apis: typing.List[str], workers: int = 8) -> typing.Dict[str, str]:
+    """Determines the API of several sites at the same time, see ``determine_api``
+
+    Args:
+        apis (list): URLs of the sites (Such as https://google.com)
+        workers (int): Maximum amount of sites probed at the same time
+
+    Returns:
+        dict: Determined API endpoint type for each site, or 'None' if couldn't determine
+    """
+    apis = list(dict.fromkeys(apis))  # Each site is probed once
+    if not apis:
+        return {}
+    with ThreadPoolExecutor(
+        max_workers=min(len(apis), workers), thread_name_prefix="booru-dl-probe"
+    ) as executor:
+        return dict(zip(apis, executor.map(determine_api, apis)))
+
+
 # TODO format_package will need to take booru_api and either: if not defined ('default') run backend code to
 #  determine api endpoints
 # TODO remove 'limit' flag for format_package as each booru is different and leaving blank should provide max
@@ -279,6 +925,8 @@ def format_package(
     tags: typing.List[str],
     before_id: int,
     booru_api: str,
+    after: float = None,
+    min_faves: int = 0,
 ) -> typing.Dict[str, object]:
     """Formats package for session handler
 
@@ -291,6 +939,13 @@ def format_package(
         limit (int): Amount of posts to collect from the booru (Max of 320 for most websites)
         before_id (int): Last post ID to ignore (used to filter search to a certain page
             on the booru website)
+        booru_api (str): Type of booru API the package is sent to
+        after (float): Timestamp of the oldest posts searched for, sent as a ``date:>=`` meta tag if supported
+            (A day early, as boorus compare dates in their own time zone)
+        min_faves (int): Minimum favorites of posts searched for, sent as a ``favcount:>=`` meta tag if supported
+
+    Note:
+        Gelbooru style sites support neither meta tag, their posts are only checked locally
 
     Warnings:
         ``tags`` attribute must be limited to 4 tags or less to properly be
@@ -306,8 +961,14 @@ def format_package(
 
         special formatting for:
         page (b<post_id>)
-        limit (assumes 200 allowed)
+        limit (200 allowed, raised to 320 once a site is known to be e621 - See ``next_page``)
+        date (date:>=YYYY-MM-DD) and favcount (favcount:>=N) to let the booru drop posts outside the section
         """
+        if after is not None:
+            day = datetime.fromtimestamp(after - 86400, timezone.utc)
+            tags = tags + [f"date:>={day:%Y-%m-%d}"]
+        if min_faves > 0:
+            tags = tags + [f"favcount:>={min_faves}"]
         package = {
             "page": f"b{before_id}",
             "tags": " ".join(tags),  # Reminder: hard limit of 4 tags
@@ -328,8 +989,65 @@ def format_package(
             "s": "post",
             "q": "index",
             "json": "1",
-            "tags": " ".join(tags[:2]),  # 2 tags only for safety - truncates rating
+            # 2 tags only for safety - score and rating count against them (See planner.STRICT_LIMITS)
+            "tags": " ".join(tags[:2]),
+            "limit": 1000,
         }
     else:
         package = {}
     return package
+
+
+def next_page(
+    package: typing.Dict[str, object], booru_api: str, last_id: int, limit: int = None
+) -> None:
+    """Moves a search package (See ``format_package``) in-place to the posts older than a post
+
+    Danbooru style sites page with a ``b<post_id>`` cursor. Gelbooru style sites require ``page=dapi``, so they
+    page with an ``id:<<post_id>`` tag instead of ``pid`` page numbers, which skip or repeat posts when posts
+    are added during a search and stop working past a few thousand posts.
+
+    Args:
+        package (dict): Search package of the previous page
+        booru_api (str): Type of booru API the package is sent to
+        last_id (int): ID of the last (Oldest) post of the previous page
+        limit (int): Posts requested per page, unchanged if not provided
+    """
+    if booru_api == "gelbooru":
+        tags = [
+            tag
+            for tag in str(package.get("tags", "")).split()
+            if not tag.startswith("id:<")
+        ]
+        package["tags"] = " ".join(tags + [f"id:<{last_id}"])
+    else:
+        package["page"] = f"b{last_id}"
+    if limit:
+        package["limit"] = limit
+
+
+def range_package(
+    package: typing.Dict[str, object],
+    booru_api: str,
+    low: int = None,
+    high: int = None,
+) -> typing.Dict[str, object]:
+    """Copies a search package (See ``format_package``), limited to a range of post IDs
+
+    Args:
+        package (dict): Search package of the first page
+        booru_api (str): Type of booru API the package is sent to
+        low (int): Lowest post ID searched, sent as an ``id:>=`` meta tag (Unbounded if not provided)
+        high (int): Post ID the search starts below, sent as the page cursor (See ``next_page``)
+
+    Returns:
+        dict: Search package of the range, paged like any other search
+    """
+    package = dict(package)
+    if high is not None:
+        next_page(package, booru_api, high)
+    if low is not None:
+        package["tags"] = " ".join(
+            str(package.get("tags", "")).split() + [f"id:>={low}"]
+        )
+    return package
@@ -0,0 +1,215 @@
+"""On-disk HTTP cache of API pages
+
+Pages are stored in a local SQLite database with the ``ETag``/``Last-Modified`` validators the API
+returned, keyed by the page URL with the search package from ``format_package``. Requests for a stored
+page are made conditional (``If-None-Match``/``If-Modified-Since``), so an unchanged page is answered with
+an empty ``304 Not Modified`` and read from the cache instead of being downloaded and counted against the
+API's rate limit again. Responses without validators are not stored.
+
+Bodies are stored compressed. Entries not requested for ``max_age`` seconds are removed, and the least
+recently requested entries are removed once the cache grows past ``max_size`` bytes.
+"""
+import hashlib
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import typing
+import zlib
+
+import requests
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_checked_at ON pages (checked_at);
+"""
+CHUNK_SIZE = 65536
+
+
+def decompress(body: bytes) -> typing.Iterator[bytes]:
+    """Yields a compressed body in chunks, decompressing one chunk at a time"""
+    decompressor = zlib.decompressobj()
+    for start in range(0, len(body), CHUNK_SIZE):
+        chunk = decompressor.decompress(body[start : start + CHUNK_SIZE])
+        if chunk:
+            yield chunk
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+class PageCache:
+    """SQLite cache of (key, url, etag, last_modified, body, size, checked_at) API pages
+
+    Args:
+        database (str): Location of the SQLite database (Created if missing)
+        max_size (int): Bytes of compressed bodies kept before the least recently requested are removed
+        max_age (float): Seconds an entry is kept without being requested
+    """
+
+    def __init__(
+        self,
+        database: str,
+        max_size: int = 256 * 1024 * 1024,
+        max_age: float = 7 * 86400,
+    ):
+        self.database = pathlib.PurePath(database)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.hits = 0  #: Requests answered with 304 Not Modified
+
+        os.makedirs(self.database.parent, exist_ok=True)
+        self.connection = sqlite3.connect(
+            str(self.database), check_same_thread=False, isolation_level=None
+        )
+        self.connection.executescript(SCHEMA)
+        self.size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM pages"
+        ).fetchone()[0]
+        self.evict()
+
+    @staticmethod
+    def key(url: str, package: typing.Dict[str, object] = None, user: str = "") -> str:
+        """Collects the cache key of an API page
+
+        Args:
+            url (str): URL of the API endpoint
+            package (dict): Search package sent with the request (See ``backend.format_package``)
+            user (str): User name the request is authenticated with, if any (Results may differ per user)
+
+        Returns:
+            str: SHA-1 of the user and the full request URL
+        """
+        full_url = requests.Request("GET", url, params=package).prepare().url
+        return hashlib.sha1(f"{user}\n{full_url}".encode()).hexdigest()
+
+    def headers(self, key: str) -> typing.Dict[str, str]:
+        """Collects the conditional request headers of a stored page (Empty if not stored)"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT etag, last_modified FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return {}
+        headers = {}
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def read(self, key: str) -> typing.Iterator[bytes]:
+        """Collects the body of a stored page, marking it as recently requested
+
+        Returns:
+            iterator of bytes: Chunks of the body
+
+        Raises:
+            KeyError: The page is not stored (Such as when evicted since its headers were collected)
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT body FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(key)
+            self.connection.execute(
+                "UPDATE pages SET checked_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self.hits += 1
+        return decompress(row[0])
+
+    def store(self, key: str, response: requests.Response) -> typing.Iterator[bytes]:
+        """Yields the body of a response in chunks, storing it once completely read
+
+        The body is compressed as it passes through, so the whole page is never held uncompressed. Pages
+        that are not read to the end (Or without an ``ETag``/``Last-Modified`` header) are not stored.
+
+        Args:
+            key (str): Cache key of the page (See ``key``)
+            response (requests.Response): Successful response of the page, closed once read
+
+        Yields:
+            bytes: Decoded chunks of the body (As ``response.iter_content``)
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        try:
+            if not etag and not last_modified:
+                yield from response.iter_content(CHUNK_SIZE)
+                return
+            compressor = zlib.compressobj(1)
+            parts = []
+            for chunk in response.iter_content(CHUNK_SIZE):
+                parts.append(compressor.compress(chunk))
+                yield chunk
+            parts.append(compressor.flush())
+        finally:
+            response.close()
+        body = b"".join(parts)
+        with self.lock:
+            old = self.connection.execute(
+                "SELECT size FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.url,
+                    etag,
+                    last_modified,
+                    body,
+                    len(body),
+                    time.time(),
+                ),
+            )
+            self.size += len(body) - (old[0] if old else 0)
+        if self.size > self.max_size:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes pages not requested for ``max_age`` seconds, then the least recently requested pages
+        until the cache fits in ``max_size``
+        """
+        with self.lock:
+            removed = self.connection.execute(
+                "DELETE FROM pages WHERE checked_at < ?", (time.time() - self.max_age,)
+            ).rowcount
+            self.size = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM pages"
+            ).fetchone()[0]
+            if self.size > self.max_size:
+                kept = 0
+                cutoff = None
+                for checked_at, size in self.connection.execute(
+                    "SELECT checked_at, size FROM pages ORDER BY checked_at DESC"
+                ):
+                    kept += size
+                    if kept > self.max_size:
+                        cutoff = checked_at
+                        break
+                if cutoff is not None:
+                    removed += self.connection.execute(
+                        "DELETE FROM pages WHERE checked_at <= ?", (cutoff,)
+                    ).rowcount
+                    self.size = self.connection.execute(
+                        "SELECT COALESCE(SUM(size), 0) FROM pages"
+                    ).fetchone()[0]
+        if removed:
+            logging.debug(f"Removed {removed} pages from the page cache")
+
+    def close(self) -> None:
+        """Closes the database"""
+        with self.lock:
+            self.connection.close()
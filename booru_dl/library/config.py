@@ -20,6 +20,51 @@ A configuration file is required to have the following data sections/fields:
 
         Example: For section ``Dog``, gifs will go into a ``Dog/gif`` sub-folder
 
+    * ``OPTIONAL`` workers: Amount of files to download at the same time (Defaults to 4, 1 disables concurrency)
+    * ``OPTIONAL`` prefetch_pages: Amount of API pages requested ahead of the page being downloaded
+      (Defaults to 2, 0 disables prefetching)
+    * ``OPTIONAL`` stream_pages: Whether API pages are decoded while they are received, keeping only the
+      fields needed of each post (Defaults to True, False decodes whole pages using orjson if installed)
+    * ``OPTIONAL`` page_cache_size: MiB of API pages kept to request them again conditionally, answered
+      without the page if unchanged (Defaults to 256, 0 disables the page cache)
+    * ``OPTIONAL`` page_cache_days: Days a cached API page is kept without being requested (Defaults to 7)
+    * ``OPTIONAL`` api_cache_days: Days the API type determined for a [URI] entry missing one is reused
+      before it is determined again (Defaults to 7, 0 determines it on every run)
+    * ``OPTIONAL`` tag_count_days: Days the post counts of tags are reused to choose the tags searched for
+      sections with more tags than a booru accepts (Defaults to 1)
+    * ``OPTIONAL`` search_filters: Whether the days and min_faves of sections are sent with searches (As
+      ``date:>=`` and ``favcount:>=``), so Danbooru style boorus skip posts outside a section and searches end
+      sooner. Only sent while a section's tags leave room for them within the booru's tag limit, otherwise
+      checked locally (Defaults to True, disable for boorus counting them against a strict tag limit)
+    * ``OPTIONAL`` backfill_shards: Ranges of post IDs searched at the same time by searches without a
+      watermark (First searches of a section and ``--full``) of many posts, cut to hold about the same amount
+      of posts each (Defaults to 4, 1 searches with a single cursor)
+    * ``OPTIONAL`` watermark_settle_days: Days posts are searched again by later runs before searches stop
+      at them, so posts whose score or favorites rise past a section's min_score or min_faves after they
+      were first seen are still collected (Defaults to 3, 0 stops at the newest post seen - posts crossing a
+      minimum later are then only collected by ``--full``)
+    * ``OPTIONAL`` retries: Times a request is retried after a connection error or temporary server error
+      (Defaults to 3, 0 disables retries)
+    * ``OPTIONAL`` retry_backoff: Seconds waited before the first retry, doubled for every following retry
+      (Defaults to 1)
+    * ``OPTIONAL`` retry_backoff_max: Maximum seconds waited before a retry (Defaults to 60)
+    * ``OPTIONAL`` retry_jitter: Fraction of each wait that is randomized, from 0 to 1 (Defaults to 0.5)
+    * ``OPTIONAL`` failure_threshold: Failed requests in a row (After retries) before an API is skipped
+      for the rest of the run, or until failure_cooldown passed (Defaults to 5)
+    * ``OPTIONAL`` failure_cooldown: Seconds an API is skipped after reaching failure_threshold (Defaults to 300)
+    * ``OPTIONAL`` metrics_file: Prometheus textfile the counters and timings of a run are written to, such as
+      for the node_exporter textfile collector (Defaults to none)
+    * ``OPTIONAL`` summary_file: JSON file a summary of the counters and timings of a run is written to
+      (Defaults to .booru-dl/summary.json, empty disables it)
+
+#. Rate Limits
+    * ``OPTIONAL`` <uri_nickname>: Requests per second and burst size allowed for a [URI] entry
+
+        Example: ``e621 = 2, 4`` - URIs not listed default to 2 requests a second with a burst of 2.
+        Hosts that respond with ``429``/``503`` are slowed down automatically. Rates must be above 0.
+
+    * ``OPTIONAL`` default: Requests per second and burst size for any other host (Such as file servers)
+
 #. Blacklist
     * ``OPTIONAL`` tags: list of tags to ignore
 
@@ -29,7 +74,11 @@ A configuration file is required to have the following data sections/fields:
     If data is missing for any field other than tag, the data is collected from the
     default provided in the configuration file.
 
-    * tags: Tags to search for the section
+    * tags: Tags to search for the section, ``|`` separates sub-queries searched at the same time (Posts
+      matching any of them are collected once)
+
+        Example: ``cat | kitten | feline, -dog``
+
     * ``OPTIONAL`` days:  days to search for section
     * ``OPTIONAL`` ratings: ratings to search for section
     * ``OPTIONAL`` min_score: minimum score to search for in a section
@@ -58,10 +107,12 @@ Note:
 # mypy: ignore-errors
 
 import configparser
+import json
 import logging
 import os
 import pathlib
-from typing import Dict, List
+import time
+from typing import Dict, List, Tuple
 
 from booru_dl.library import backend
 
@@ -88,7 +139,10 @@ class Section:
     rating: List[str]  #: Rating(s) to search for
     min_score: int  #: Minimum score of section posts
     min_faves: int  #: Minimum favorites of section posts
-    tags: List[str]  #: Tags for section posts
+    tags: List[str]  #: Tags for section posts (Of the first sub-query)
+    queries: List[
+        List[str]
+    ] = []  #: Tags of every sub-query, posts matching any of them are collected
     ignore_tags: List[
         str
     ]  #: Tags to ignore for this specific section (Allows skipping blacklist)
@@ -125,6 +179,43 @@ class Config:
     default_min_score: int  #: Default minimum score of posts on the booru site
     default_min_fav: int  #: Default minimum favorite amount of posts on the booru site
     organize_by_type: bool  #: Whether to organize file types within specific sub-folders
+    workers: int = 4  #: Amount of files downloaded at the same time
+    prefetch_pages: int = (
+        2  #: Amount of API pages requested ahead of the page being downloaded
+    )
+    stream_pages: bool = True  #: Whether API pages are decoded while they are received
+    page_cache_size: int = (
+        256  #: MiB of API pages kept in the page cache (0 disables it)
+    )
+    page_cache_days: float = (
+        7.0  #: Days a cached API page is kept without being requested
+    )
+    api_cache_days: float = (
+        7.0  #: Days a determined API type is reused for URIs missing one
+    )
+    tag_count_days: float = 1.0  #: Days the post count of a tag is reused
+    search_filters: bool = True  #: Whether days and min_faves are sent with searches
+    backfill_shards: int = (
+        4  #: Ranges of post IDs searched at the same time by backfills
+    )
+    watermark_settle_days: float = (
+        3.0  #: Days posts are searched again before searches stop at them
+    )
+    retries: int = 3  #: Times a request is retried after a temporary failure
+    retry_backoff: float = 1.0  #: Seconds waited before the first retry
+    retry_backoff_max: float = 60.0  #: Maximum seconds waited before a retry
+    retry_jitter: float = 0.5  #: Fraction of each retry wait that is randomized
+    failure_threshold: int = 5  #: Failed requests in a row before an API is skipped
+    failure_cooldown: float = (
+        300.0  #: Seconds an API is skipped after too many failures
+    )
+    metrics_file: str = (
+        ""  #: Prometheus textfile of the run's metrics (Empty disables it)
+    )
+    summary_file: str = ".booru-dl/summary.json"  #: JSON summary of the run's metrics
+    rate_limits: Dict[
+        str, Tuple[float, int]
+    ] = dict()  #: Requests per second and burst size per [URI] nickname
     posts: Dict[
         str, Section
     ] = dict()  #: Dictionary of all sections to search for within the given config
@@ -260,6 +351,7 @@ class Config:
                         f"Found broken key {data[0]} in [URI] - Please fix or remove."
                     )
 
+            undetermined = []
             for result in result_list:
                 if (api := result_list[result][2]) and api in ["danbooru", "gelbooru"]:
                     logging.debug(f"API_TYPE Found: {api} for {result}")
@@ -271,13 +363,20 @@ class Config:
                     logging.warning(
                         f"Could not find API Type for {result} - Attempting to auto-determine"
                     )
-                    api_type = backend.determine_api(result_list[result][1])
-                    logging.warning(
-                        f"Determined API Type of {api_type} for {result}"
-                        f" Please add to config file as such: "
-                        f"{result}={result_list[result][1]},{api_type},<user_name>,<api_key>"
-                    )
-                    result_list[result][2] = api_type
+                    undetermined.append(result)
+
+            # Previously determined types are reused, the rest are probed at the same time
+            api_types = self._determine_api_types(
+                [result_list[result][1] for result in undetermined]
+            )
+            for result in undetermined:
+                api_type = api_types[result_list[result][1]]
+                logging.warning(
+                    f"Determined API Type of {api_type} for {result}"
+                    f" Please add to config file as such: "
+                    f"{result}={result_list[result][1]},{api_type},<user_name>,<api_key>"
+                )
+                result_list[result][2] = api_type
         else:
             logging.error(
                 "No URI Section Found - Please ensure config is set up correctly"
@@ -288,6 +387,67 @@ class Config:
             raise ValueError
         return result_list
 
+    def _determine_api_types(self, uris: List[str]) -> Dict[str, str]:
+        """Determines the API type of URIs missing one in the config
+
+        Types determined within ``api_cache_days`` are read from ``.booru-dl/api_types.json`` next to the
+        config, other URIs are probed at the same time (See ``backend.determine_apis``). Only URIs
+        that could be determined are cached, so failed probes are retried on the next run.
+
+        Args:
+            uris (list): URIs of the boorus (Such as https://google.com)
+
+        Returns:
+            dict: API type of each URI, or 'None' if couldn't determine
+        """
+        if not uris:
+            return {}
+        self.api_cache_days = max(
+            self.parser.getfloat("Other", "api_cache_days", fallback=7.0), 0
+        )
+        cache_path = self.path.joinpath(".booru-dl", "api_types.json")
+        try:
+            with open(cache_path) as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            cache = {}
+        if not isinstance(cache, dict):
+            cache = {}
+
+        expired = time.time() - self.api_cache_days * 86400
+        api_types = {}
+        for uri in uris:
+            entry = cache.get(uri)
+            if (
+                isinstance(entry, dict)
+                and entry.get("api_type") in ("danbooru", "gelbooru")
+                and entry.get("checked_at", 0) >= expired
+            ):
+                api_types[uri] = entry["api_type"]
+        if api_types:
+            logging.debug(f"API types of {', '.join(api_types)} collected from cache")
+
+        missing = [uri for uri in uris if uri not in api_types]
+        if missing:
+            probed = backend.determine_apis(missing)
+            api_types.update(probed)
+            checked_at = time.time()
+            cache.update(
+                {
+                    uri: {"api_type": api_type, "checked_at": checked_at}
+                    for uri, api_type in probed.items()
+                    if api_type != "None"
+                }
+            )
+            try:
+                os.makedirs(cache_path.parent, exist_ok=True)
+                with open(f"{cache_path}.tmp", "w") as file:
+                    json.dump(cache, file, indent=2)
+                os.replace(f"{cache_path}.tmp", cache_path)
+            except OSError as e:
+                logging.warning(f"Could not save determined API types ({e})")
+        return api_types
+
     # TODO fix this to work with multiple URI
     # def _get_api_key(self) -> Tuple[str, str]:
     #     """Collects the api and username for use in POST requests if provided
@@ -363,7 +523,11 @@ class Config:
                 #   min faves of 0
                 #   allowed file extensions of jpg/png/gif (images only)
                 self.default_days = int(data["days"]) if "days" in data else 20
-                self.default_rating = data["ratings"] if "ratings" in data else ["s"]
+                self.default_rating = (
+                    list(map(str.strip, data["ratings"].split(",")))
+                    if "ratings" in data
+                    else ["s"]
+                )
                 self.default_min_score = int(
                     data["min_score"] if "min_score" in data else 20
                 )
@@ -390,6 +554,106 @@ class Config:
                 self.organize_by_type = (
                     data["organize_by_type"] if "organize_by_type" in data else False
                 )
+                # Allows for multiple files to be downloaded at once
+                self.workers = max(int(data["workers"]) if "workers" in data else 4, 1)
+                # Bounds the memory used by pages waiting to be downloaded
+                self.prefetch_pages = max(
+                    int(data["prefetch_pages"]) if "prefetch_pages" in data else 2, 0
+                )
+                # Bounds the memory used by a page while it is decoded
+                self.stream_pages = data.getboolean("stream_pages", fallback=True)
+                # Unchanged API pages are answered from the cache instead of downloaded again
+                self.page_cache_size = max(
+                    int(data["page_cache_size"]) if "page_cache_size" in data else 256,
+                    0,
+                )
+                self.page_cache_days = max(
+                    float(data["page_cache_days"])
+                    if "page_cache_days" in data
+                    else 7.0,
+                    0,
+                )
+                # Sections with too many tags search the tags with the fewest posts
+                self.tag_count_days = max(
+                    float(data["tag_count_days"]) if "tag_count_days" in data else 1.0,
+                    0,
+                )
+                # Lets the booru skip posts outside the days and min_faves of a section
+                self.search_filters = data.getboolean("search_filters", fallback=True)
+                # Searches without a watermark page through several ranges of post IDs at once
+                self.backfill_shards = max(
+                    int(data["backfill_shards"]) if "backfill_shards" in data else 4, 1
+                )
+                # Posts may still cross min_score/min_faves after they were first seen
+                self.watermark_settle_days = max(
+                    float(data["watermark_settle_days"])
+                    if "watermark_settle_days" in data
+                    else 3.0,
+                    0,
+                )
+                # Temporary failures are retried with exponential backoff and jitter
+                self.retries = max(int(data["retries"]) if "retries" in data else 3, 0)
+                self.retry_backoff = max(
+                    float(data["retry_backoff"]) if "retry_backoff" in data else 1.0, 0
+                )
+                self.retry_backoff_max = max(
+                    float(data["retry_backoff_max"])
+                    if "retry_backoff_max" in data
+                    else 60.0,
+                    self.retry_backoff,
+                )
+                self.retry_jitter = min(
+                    max(
+                        float(data["retry_jitter"]) if "retry_jitter" in data else 0.5,
+                        0,
+                    ),
+                    1,
+                )
+                # APIs failing too often are skipped instead of failing every remaining request
+                self.failure_threshold = max(
+                    int(data["failure_threshold"])
+                    if "failure_threshold" in data
+                    else 5,
+                    1,
+                )
+                self.failure_cooldown = max(
+                    float(data["failure_cooldown"])
+                    if "failure_cooldown" in data
+                    else 300.0,
+                    0,
+                )
+                # Counters and timings of the run (See booru_dl.library.metrics)
+                self.metrics_file = data.get("metrics_file", "").strip()
+                self.summary_file = data.get(
+                    "summary_file", ".booru-dl/summary.json"
+                ).strip()
+
+            elif section_check == "rate limits":
+                # <uri_nickname> = <requests per second>, <burst size>
+                self.rate_limits = {}
+                for uri, value in data.items():
+                    if (uri not in self.uri and uri != "default") or not value:
+                        logging.warning(
+                            f"Found unknown URI {uri} in [Rate Limits] - Please fix or remove."
+                        )
+                        continue
+                    limit = list(map(str.strip, value.split(",")))
+                    try:
+                        rate = float(limit[0])
+                        burst = (
+                            int(limit[1])
+                            if len(limit) > 1 and limit[1]
+                            else max(int(rate), 1)
+                        )
+                    except (ValueError, OverflowError):
+                        rate = 0.0
+                    # Requests wait 1 / rate seconds for each token (See backend.TokenBucket)
+                    if not rate > 0:
+                        logging.warning(
+                            f"Found invalid rate limit {value} for URI {uri} in [Rate Limits] - Please fix or remove."
+                        )
+                        continue
+                    self.rate_limits[uri] = (rate, burst)
 
             else:
                 # Skip example created by self.default_config or URI constants file
@@ -402,8 +666,13 @@ class Config:
                 self.posts[f"{section}"].days = int(
                     self.__get_key("days", section, self.default_days.__str__())
                 )
-                self.posts[f"{section}"].rating = self.__get_key(
-                    "ratings", section, self.default_rating.__str__()
+                self.posts[f"{section}"].rating = list(
+                    map(
+                        str.strip,
+                        self.__get_key(
+                            "ratings", section, ", ".join(self.default_rating)
+                        ).split(","),
+                    )
                 )
                 self.posts[f"{section}"].min_score = int(
                     self.__get_key(
@@ -413,9 +682,12 @@ class Config:
                 self.posts[f"{section}"].min_faves = int(
                     self.__get_key("min_faves", section, self.default_min_fav.__str__())
                 )
-                self.posts[f"{section}"].tags = list(
-                    map(str.strip, (self.__get_key("tags", section, "")).split(","))
-                )
+                # Sub-queries are separated by |, posts matching any of them are collected
+                self.posts[f"{section}"].queries = [
+                    list(map(str.strip, query.split(",")))
+                    for query in self.__get_key("tags", section, "").split("|")
+                ]
+                self.posts[f"{section}"].tags = self.posts[f"{section}"].queries[0]
                 self.posts[f"{section}"].ignore_tags = list(
                     map(
                         str.strip,
@@ -498,6 +770,47 @@ class Config:
         config["Other"] = {
             "; Organize by file extension into subfolders [Not working at the moment]": None,
             "organize_by_type": "False",
+            "; Amount of files to download at the same time (1 downloads files one at a time)": None,
+            "workers": "4",
+            "; Amount of API pages requested ahead of the page being downloaded (0 disables)": None,
+            "prefetch_pages": "2",
+            "; Decode API pages while they are received (False decodes whole pages at once)": None,
+            "stream_pages": "True",
+            "; MiB of API pages kept to skip downloading unchanged pages again (0 disables), "
+            "removed after page_cache_days days without use": None,
+            "page_cache_size": "256",
+            "page_cache_days": "7",
+            "; Days the detected API type of [URI] entries without one is reused before detecting it again": None,
+            "api_cache_days": "7",
+            "; Days the post counts of tags are reused to choose which tags of a section are searched "
+            "(Boorus accept only a few, the rest are checked locally)": None,
+            "tag_count_days": "1",
+            "; Send the days and min_faves of sections with searches (date:/favcount: meta tags), "
+            "disable if a booru counts them against its tag limit": None,
+            "search_filters": "True",
+            "; Ranges of post IDs searched at the same time by first and --full searches of many posts "
+            "(1 searches with a single cursor)": None,
+            "backfill_shards": "4",
+            "; Days posts are searched again by later runs, collecting posts that reach min_score or "
+            "min_faves after they were first seen (0 stops at the newest post seen)": None,
+            "watermark_settle_days": "3",
+            "; Retries for connection errors and temporary server errors, waiting retry_backoff seconds "
+            "(doubled every retry up to retry_backoff_max, with retry_jitter of it randomized)": None,
+            "retries": "3",
+            "retry_backoff": "1",
+            "retry_backoff_max": "60",
+            "retry_jitter": "0.5",
+            "; Skip an API for failure_cooldown seconds after failure_threshold failed requests in a row": None,
+            "failure_threshold": "5",
+            "failure_cooldown": "300",
+            "; Files the counters and timings of a run are written to (Leave blank to disable), "
+            "metrics_file in the Prometheus text format": None,
+            "metrics_file": "",
+            "summary_file": ".booru-dl/summary.json",
+        }
+        config["Rate Limits"] = {
+            "; Requests per second and burst size for each [URI] nickname "
+            "(Ex. insert_nickname_for_uri = 2, 2)": None,
         }
         config["Example Post"] = {
             "; Copy this format (without or without comments [;]) and put what you need": None,
@@ -0,0 +1,155 @@
+"""Compiled post filters for config sections
+
+``Downloader.get_posts`` checks every post of a search against its section. Rather than walking the
+section's lists for every post, each section is compiled once into a ``SectionFilter`` holding sets of the
+allowed ratings, allowed file types and effective blacklist (The global blacklist without the section's
+``ignore_tags``), along with its time, score and favorite cutoffs. Tags of the section that were not sent to
+the booru (See :doc:`planner`) are checked as well - for sections of several sub-queries, by the
+``QueryFilter`` of each sub-query before their posts are merged.
+
+Checking a post is then a handful of comparisons and a single ``isdisjoint`` call on the post's tags.
+"""
+import time
+import typing
+
+from booru_dl.library.config import Section
+from booru_dl.library.posts import Post
+
+
+class SectionFilter:
+    """Filter compiled from a config section
+
+    Args:
+        section (Section): Section to compile
+        blacklist (list): Tags of the ``[Blacklist]`` config section
+        now (float): Timestamp the ``days`` cutoff is counted back from (Defaults to the current time)
+        required (iterable): Tags every post must have (Tags of the section not sent to the booru)
+        excluded (iterable): Tags no post may have (``-`` tags of the section not sent to the booru)
+    """
+
+    __slots__ = (
+        "name",
+        "cutoff",
+        "min_score",
+        "min_faves",
+        "ratings",
+        "allowed_types",
+        "blacklist",
+        "required",
+    )
+
+    def __init__(
+        self,
+        section: Section,
+        blacklist: typing.Iterable[str] = (),
+        now: float = None,
+        required: typing.Iterable[str] = (),
+        excluded: typing.Iterable[str] = (),
+    ):
+        self.name = section.name
+        #: Oldest allowed post creation time (Timestamp)
+        self.cutoff = (time.time() if now is None else now) - section.days * 86400
+        self.min_score = section.min_score
+        self.min_faves = section.min_faves
+        self.ratings = frozenset(section.rating)
+        self.allowed_types = frozenset(section.allowed_types)
+        #: Blacklisted tags not ignored by the section, and the excluded tags
+        self.blacklist = frozenset(tag for tag in blacklist if tag) - frozenset(
+            section.ignore_tags
+        )
+        self.blacklist |= frozenset(excluded)
+        #: Tags every post must have
+        self.required = frozenset(required)
+
+    def expired(self, created: float) -> bool:
+        """Checks if a post is older than the section's ``days`` (Every following post is as well)"""
+        return created < self.cutoff
+
+    def accepts(self, post: Post) -> bool:
+        """Checks if a post matches the section
+
+        Args:
+            post (Post): Post to check
+
+        Returns:
+            bool: True if the post should be downloaded for the section
+        """
+        return (
+            post.created_ts >= self.cutoff
+            and post.score >= self.min_score
+            and post.favs >= self.min_faves
+            and post.rating in self.ratings
+            and post.ext in self.allowed_types
+            and self.blacklist.isdisjoint(tags := post.tags.split())
+            and (not self.required or self.required.issubset(tags))
+        )
+
+    def reason(self, post: Post) -> typing.Optional[str]:
+        """Explains why a post is not accepted (For logging)
+
+        Args:
+            post (Post): Post to check
+
+        Returns:
+            str: Reason the post was rejected, or None if it is accepted
+        """
+        if post.created_ts < self.cutoff:
+            return "older than the section's days"
+        if post.ext not in self.allowed_types:
+            return f"extension [{post.ext}] not in allowed extensions"
+        if post.rating not in self.ratings:
+            return f"rating [{post.rating}] not in section ratings"
+        if post.favs < self.min_faves:
+            return f"{post.favs} favorites (Lower than criteria of {self.min_faves})"
+        if post.score < self.min_score:
+            return f"{post.score} score (Lower than criteria of {self.min_score})"
+        tags = post.tags.split()
+        blacklisted = self.blacklist.intersection(tags)
+        if blacklisted:
+            return f'blacklisted tag "{sorted(blacklisted)[0]}"'
+        missing = self.required.difference(tags)
+        if missing:
+            return f'missing tag "{sorted(missing)[0]}"'
+        return None
+
+
+class QueryFilter:
+    """Tags of a sub-query that were not sent to the booru (See :doc:`planner`)
+
+    Sections of several sub-queries check each sub-query's tags on its own posts, before the posts of every
+    sub-query are merged and checked against the section once (See ``SectionFilter``).
+
+    Args:
+        required (iterable): Tags every post must have
+        excluded (iterable): Tags no post may have
+    """
+
+    __slots__ = ("required", "excluded")
+
+    def __init__(
+        self,
+        required: typing.Iterable[str] = (),
+        excluded: typing.Iterable[str] = (),
+    ):
+        self.required = frozenset(required)
+        self.excluded = frozenset(excluded)
+
+    def __bool__(self) -> bool:
+        """Whether any tag is checked"""
+        return bool(self.required or self.excluded)
+
+    def accepts(self, post: Post) -> bool:
+        """Checks if a post has every required tag and no excluded tag"""
+        tags = post.tags.split()
+        return self.excluded.isdisjoint(tags) and self.required.issubset(tags)
+
+    def reason(self, post: Post) -> typing.Optional[str]:
+        """Explains why a post is not accepted (For logging)"""
+        tags = post.tags.split()
+        excluded = self.excluded.intersection(tags)
+        if excluded:
+            return f'excluded tag "{sorted(excluded)[0]}"'
+        missing = self.required.difference(tags)
+        if missing:
+            return f'missing tag "{sorted(missing)[0]}"'
+        return None
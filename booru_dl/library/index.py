@@ -0,0 +1,270 @@
+"""Persistent index of downloaded posts
+
+Stores every downloaded post in a local SQLite database so ``Downloader`` can decide whether a post
+was already downloaded (For any section) without touching the file system or network.
+
+The index is loaded into memory once when opened, lookups never query the database. New downloads are
+buffered and written in batched transactions. The first time an index is created, any existing
+``downloads/<section>/<api>/<post_id>.<ext>`` files are imported into it.
+
+The index also stores a watermark per (section, api, query): the newest post ID seen by the last
+complete search, allowing later searches to stop once they reach posts that were already checked, and the
+post counts of tags looked up to plan searches (See :doc:`planner`).
+"""
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    api TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    md5 TEXT,
+    path TEXT NOT NULL,
+    size INTEGER,
+    downloaded_at REAL,
+    PRIMARY KEY (api, post_id, section)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    section TEXT NOT NULL,
+    api TEXT NOT NULL,
+    query TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    days INTEGER NOT NULL,
+    updated_at REAL,
+    PRIMARY KEY (section, api, query)
+);
+CREATE TABLE IF NOT EXISTS tag_counts (
+    api TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    post_count INTEGER NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (api, tag)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class DownloadIndex:
+    """SQLite index of (api, post_id, section, md5, path, size, downloaded_at) download records
+
+    Args:
+        database (str): Location of the SQLite database (Created if missing)
+        downloads (str): Downloads folder imported into a newly created index
+        batch_size (int): Amount of records buffered before they are written to the database
+    """
+
+    def __init__(self, database: str, downloads: str, batch_size: int = 100):
+        self.database = pathlib.PurePath(database)
+        self.downloads = pathlib.PurePath(downloads)
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.pending: List[tuple] = []  # records waiting to be written
+
+        #: (api, post_id) -> {section: path} for every indexed post
+        self.posts: Dict[Tuple[str, int], Dict[str, str]] = {}
+
+        os.makedirs(self.database.parent, exist_ok=True)
+        self.connection = sqlite3.connect(
+            str(self.database), check_same_thread=False, isolation_level=None
+        )
+        self.connection.executescript(SCHEMA)
+        for api, post_id, section, path in self.connection.execute(
+            "SELECT api, post_id, section, path FROM downloads"
+        ):
+            self.posts.setdefault((api, post_id), {})[section] = path
+
+        if not self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'imported'"
+        ).fetchone():
+            self.import_downloads()
+
+    def import_downloads(self) -> int:
+        """Imports files already in the downloads folder (One-time, when the index is created)
+
+        Files are expected to follow ``<downloads>/<section>/<api>/<post_id>.<ext>``, anything else is ignored.
+
+        Returns:
+            int: Amount of files imported
+        """
+        imported = 0
+        for root, folders, files in os.walk(self.downloads):
+            folders[:] = [folder for folder in folders if not folder.startswith(".")]
+            parts = pathlib.PurePath(root).relative_to(self.downloads).parts
+            if len(parts) < 2:  # needs at least <section>/<api>
+                continue
+            section, api = "/".join(parts[:-1]), parts[-1]
+            for file in files:
+                post_id = file.split(".")[0]
+                if not post_id.isdigit() or file.endswith(".part"):
+                    continue
+                path = os.path.join(root, file)
+                stat = os.stat(path)
+                self.record(
+                    api, int(post_id), section, path, None, stat.st_size, stat.st_mtime
+                )
+                imported += 1
+        self.flush()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('imported', ?)",
+                (str(time.time()),),
+            )
+        logging.info(f"Imported {imported} existing downloads into the download index")
+        return imported
+
+    def lookup(self, api: str, post_id: int) -> Dict[str, str]:
+        """Collects every section a post was downloaded to
+
+        Args:
+            api (str): [URI] nickname the post came from
+            post_id (int): ID of the post
+
+        Returns:
+            dict: Section names mapped to the path of the downloaded file (Empty if never downloaded)
+        """
+        return self.posts.get((api, post_id), {})
+
+    def contains(self, api: str, post_id: int, section: str) -> bool:
+        """Checks if a post was already downloaded for a section"""
+        return section in self.posts.get((api, post_id), {})
+
+    def record(
+        self,
+        api: str,
+        post_id: int,
+        section: str,
+        path: str,
+        md5: Optional[str] = None,
+        size: Optional[int] = None,
+        downloaded_at: Optional[float] = None,
+    ) -> None:
+        """Adds a downloaded post to the index, writing the batch once ``batch_size`` records are buffered
+
+        Args:
+            api (str): [URI] nickname the post came from
+            post_id (int): ID of the post
+            section (str): Section the post was downloaded for
+            path (str): Location of the downloaded file
+            md5 (str): MD5 of the file if provided by the API
+            size (int): Size of the file in bytes
+            downloaded_at (float): Time of download (Defaults to now)
+        """
+        path = str(path)
+        with self.lock:
+            self.posts.setdefault((api, post_id), {})[section] = path
+            self.pending.append(
+                (
+                    api,
+                    post_id,
+                    section,
+                    md5,
+                    path,
+                    size,
+                    downloaded_at if downloaded_at is not None else time.time(),
+                )
+            )
+            flush = len(self.pending) >= self.batch_size
+        if flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes all buffered records to the database in a single transaction"""
+        with self.lock:
+            if not self.pending:
+                return
+            records, self.pending = self.pending, []
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO downloads "
+                    "(api, post_id, section, md5, path, size, downloaded_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    records,
+                )
+
+    def watermark(self, section: str, api: str, query: str, days: int) -> int:
+        """Collects the newest post ID checked by the last complete search
+
+        Args:
+            section (str): Section name
+            api (str): [URI] nickname searched
+            query (str): Query of the section (Its tags, score and rating)
+            days (int): Days currently searched for the section
+
+        Returns:
+            int: Post ID to stop searching at, or 0 if the search must cover all ``days``
+            (No previous search, or the previous search covered less days)
+        """
+        with self.lock:
+            result = self.connection.execute(
+                "SELECT post_id, days FROM watermarks WHERE section = ? AND api = ? AND query = ?",
+                (section, api, query),
+            ).fetchone()
+        if not result or result[1] < days:
+            return 0
+        return result[0]
+
+    def set_watermark(
+        self, section: str, api: str, query: str, post_id: int, days: int
+    ) -> None:
+        """Stores the newest post ID checked by a complete search
+
+        Args:
+            section (str): Section name
+            api (str): [URI] nickname searched
+            query (str): Query of the section (Its tags, score and rating)
+            post_id (int): Newest post ID checked
+            days (int): Days searched for the section
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO watermarks (section, api, query, post_id, days, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (section, api, query, post_id, days, time.time()),
+            )
+
+    def tag_count(self, api: str, tag: str, max_age: float) -> Optional[int]:
+        """Collects the stored post count of a tag
+
+        Args:
+            api (str): [URI] nickname the count was collected from
+            tag (str): Tag name
+            max_age (float): Seconds a stored count is valid for
+
+        Returns:
+            int: Amount of posts with the tag, or None if not stored (Or older than ``max_age``)
+        """
+        with self.lock:
+            result = self.connection.execute(
+                "SELECT post_count FROM tag_counts WHERE api = ? AND tag = ? AND checked_at >= ?",
+                (api, tag, time.time() - max_age),
+            ).fetchone()
+        return result[0] if result else None
+
+    def set_tag_count(self, api: str, tag: str, post_count: int) -> None:
+        """Stores the post count of a tag
+
+        Args:
+            api (str): [URI] nickname the count was collected from
+            tag (str): Tag name
+            post_count (int): Amount of posts with the tag
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO tag_counts (api, tag, post_count, checked_at) VALUES (?, ?, ?, ?)",
+                (api, tag, post_count, time.time()),
+            )
+
+    def close(self) -> None:
+        """Writes any buffered records and closes the database"""
+        self.flush()
+        self.connection.close()
@@ -0,0 +1,248 @@
+"""Counters and latency histograms of a run
+
+Every phase of a search (API requests, page parsing, filtering, rate limiter waits, file downloads and disk
+writes) is timed into a histogram, and posts, pages and files are counted, each broken down by section and
+[URI] nickname. Per-post results are counted per page by ``Downloader.get_posts``, so the hot loop only
+touches local variables.
+
+The metrics of a run can be exported as:
+    * A Prometheus textfile (See ``write_prometheus``), for the node_exporter textfile collector
+    * A JSON run summary (See ``write_summary``) with totals, means and estimated percentiles
+
+Example:
+    ``with metrics.time("api_request_seconds", section="Cats", api="e621"): ...``
+"""
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+import typing
+
+PREFIX = "booru_dl_"
+#: Upper bounds (Seconds) of the histogram buckets, the last bucket is unbounded
+BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+#: Description of every metric: (type, help)
+METRICS = {
+    "api_request_seconds": ("histogram", "Time until an API answered a page request"),
+    "page_parse_seconds": (
+        "histogram",
+        "Time spent receiving and decoding a page of posts",
+    ),
+    "filter_seconds": (
+        "histogram",
+        "Time spent checking a page of posts against the section and index",
+    ),
+    "rate_limit_wait_seconds": (
+        "histogram",
+        "Time a request waited on its host's rate limit",
+    ),
+    "file_download_seconds": (
+        "histogram",
+        "Time spent collecting a file, from request to index record",
+    ),
+    "disk_write_seconds": ("histogram", "Time spent writing a downloaded file to disk"),
+    "pages_total": ("counter", "API pages requested"),
+    "posts_total": ("counter", "Posts checked, by result"),
+    "files_total": ("counter", "Files collected, by result"),
+    "bytes_total": ("counter", "Bytes of files downloaded"),
+}
+
+Labels = typing.Tuple[typing.Tuple[str, str], ...]
+
+
+class Histogram:
+    """Counts of observed values per bucket (See ``BUCKETS``), with their sum and maximum"""
+
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile (Such as 0.95) by interpolating within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+
+class Metrics:
+    """Thread-safe registry of the counters and histograms of a run
+
+    Metrics are named without the ``booru_dl_`` prefix (See ``METRICS``) and labeled with keyword
+    arguments, such as ``metrics.inc("pages_total", section="Cats", api="e621")``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters: typing.Dict[typing.Tuple[str, Labels], float] = {}
+        self.histograms: typing.Dict[typing.Tuple[str, Labels], Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Adds to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """Records a duration in a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def time(self, name: str, **labels: str) -> typing.Iterator[None]:
+        """Records the duration of a ``with`` block in a histogram (Also if it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def totals(self) -> typing.Dict[str, float]:
+        """Sums every histogram (Seconds) and counter across its labels, by metric name"""
+        result: typing.Dict[str, float] = {}
+        with self.lock:
+            for (name, _), histogram in self.histograms.items():
+                result[name] = result.get(name, 0.0) + histogram.sum
+            for (name, _), value in self.counters.items():
+                result[name] = result.get(name, 0) + value
+        return result
+
+    def prometheus(self) -> str:
+        """Formats every metric in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            described = set()
+
+            def describe(name: str, kind: str) -> None:
+                if name not in described:
+                    described.add(name)
+                    lines.append(
+                        f"# HELP {PREFIX}{name} {METRICS.get(name, (kind, name))[1]}"
+                    )
+                    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+            for (name, labels), value in counters:
+                describe(name, "counter")
+                lines.append(f"{PREFIX}{name}{format_labels(labels)} {value:g}")
+            for (name, labels), histogram in histograms:
+                describe(name, "histogram")
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(
+                        f"{PREFIX}{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}"
+                    )
+                lines.append(
+                    f"{PREFIX}{name}_sum{format_labels(labels)} {histogram.sum:.6f}"
+                )
+                lines.append(
+                    f"{PREFIX}{name}_count{format_labels(labels)} {histogram.count}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """Collects a JSON serializable summary of the run"""
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "total_seconds": round(histogram.sum, 6),
+                    "mean_seconds": round(histogram.sum / histogram.count, 6)
+                    if histogram.count
+                    else 0.0,
+                    "p50_seconds": round(histogram.quantile(0.5), 6),
+                    "p95_seconds": round(histogram.quantile(0.95), 6),
+                    "max_seconds": round(histogram.max, 6),
+                }
+                for (name, labels), histogram in sorted(
+                    self.histograms.items(), key=lambda item: item[0]
+                )
+            ]
+        return {
+            "started_at": self.started,
+            "finished_at": time.time(),
+            "duration_seconds": round(time.time() - self.started, 3),
+            "totals": self.totals(),
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def write_prometheus(self, path: str) -> None:
+        """Writes every metric to a Prometheus textfile (Replaced atomically, as the collector requires)"""
+        write_atomic(path, self.prometheus())
+
+    def write_summary(self, path: str) -> None:
+        """Writes the JSON run summary (See ``summary``)"""
+        write_atomic(path, json.dumps(self.summary(), indent=2))
+
+
+def format_labels(labels: Labels) -> str:
+    """Formats labels as ``{key="value",...}`` (Escaped as Prometheus requires)"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+
+def escape(value: str) -> str:
+    """Escapes a label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_atomic(path: str, text: str) -> None:
+    """Writes a file through a temporary file, so readers never see it half written"""
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        file.write(text)
+    os.replace(temporary, path)
@@ -0,0 +1,220 @@
+"""Producer/consumer helpers for overlapping API requests with post processing
+
+Used by ``Downloader.get_posts`` to request the next page(s) of a search while the current one is
+being filtered and downloaded, to scan several ID ranges of a search at once (See ``Interleave``) and to
+search the sub-queries of a section at once (See ``Merge``).
+"""
+import heapq
+import itertools
+import queue
+import threading
+import typing
+
+_DONE = object()  # Marks the end of a producer's items
+
+
+class Prefetch:
+    """Runs an iterable on a background thread, keeping up to ``depth`` items ready ahead of use
+
+    The producer blocks once ``depth`` items are waiting, so at most ``depth`` (plus the one being
+    produced) items are held in memory. Exceptions raised by the producer are re-raised to the consumer.
+
+    Args:
+        iterable (iterable): Items to produce (Such as a generator of API pages)
+        depth (int): Amount of items to keep ready ahead of the consumer, ``0`` disables the background thread
+        name (str): Name of the producer thread (Shows in logging)
+
+    Example:
+        ``with Prefetch(pages, depth=2) as batches: for batch in batches: ...``
+    """
+
+    def __init__(
+        self, iterable: typing.Iterable, depth: int = 2, name: str = "booru-dl-prefetch"
+    ):
+        self.iterator = iter(iterable)
+        self.depth = depth
+        self.stopped = threading.Event()
+        self.queue: queue.Queue = queue.Queue(maxsize=max(depth, 1))
+        self.thread = None
+        if depth > 0:
+            self.thread = threading.Thread(
+                target=self._produce, args=(self.iterator,), name=name, daemon=True
+            )
+            self.thread.start()
+
+    def _produce(self, iterator: typing.Iterator) -> None:
+        """Producer thread - moves items from an iterator into the bounded queue"""
+        try:
+            for item in iterator:
+                if not self._put((item, None)):
+                    return
+        except BaseException as e:  # Passed to the consumer
+            self._put((None, e))
+            return
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+        self._put((_DONE, None))
+
+    def _put(self, item: tuple) -> bool:
+        """Puts an item on the queue, giving up if the consumer stopped
+
+        Returns:
+            bool: True if the item was queued
+        """
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self) -> typing.Iterator:
+        if self.thread is None:
+            yield from self.iterator
+            return
+        while True:
+            item, error = self.queue.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+
+    def close(self) -> None:
+        """Stops the producer, waiting for any in-progress item to finish"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        elif hasattr(self.iterator, "close"):
+            self.iterator.close()
+
+    def __enter__(self) -> "Prefetch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Interleave(Prefetch):
+    """Runs several iterables on background threads at once, yielding their items as they are produced
+
+    Items of each iterable keep their order, but items of different iterables are mixed. Every producer
+    blocks once ``depth`` items per iterable are waiting. Exceptions raised by any producer are re-raised to
+    the consumer, and closing stops every producer.
+
+    Args:
+        iterables (list): Iterables to produce (Such as generators of API pages, one per ID range)
+        depth (int): Amount of items to keep ready ahead of the consumer per iterable (At least 1)
+        name (str): Prefix of the producer thread names (Shows in logging)
+
+    Example:
+        ``with Interleave([shard_1, shard_2], depth=2) as batches: for batch in batches: ...``
+    """
+
+    def __init__(
+        self,
+        iterables: typing.Iterable[typing.Iterable],
+        depth: int = 2,
+        name: str = "booru-dl-interleave",
+    ):
+        self.iterators = [iter(iterable) for iterable in iterables]
+        self.depth = max(depth, 1)
+        self.stopped = threading.Event()
+        self.queue = queue.Queue(maxsize=self.depth * max(len(self.iterators), 1))
+        self.threads = [
+            threading.Thread(
+                target=self._produce,
+                args=(iterator,),
+                name=f"{name}-{number}",
+                daemon=True,
+            )
+            for number, iterator in enumerate(self.iterators)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def __iter__(self) -> typing.Iterator:
+        running = len(self.threads)
+        while running:
+            item, error = self.queue.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                running -= 1
+                continue
+            yield item
+
+    def close(self) -> None:
+        """Stops every producer, waiting for any in-progress items to finish"""
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+
+class Merge:
+    """Runs several iterables of pages on background threads at once, merging their pages by descending key
+
+    Every iterable runs ahead on its own thread (See ``Prefetch``), while a k-way merge (``heapq.merge``) only
+    compares the next item of each. Items with the same key as the previous item are dropped, so items
+    produced by several iterables are yielded once.
+
+    Args:
+        iterables (list): Pages (Lists of items) of every source, each ordered by descending key
+        key (callable): Key of an item (Such as its post ID)
+        size (int): Items per merged page
+        depth (int): Amount of pages to keep ready ahead of the merge per iterable (At least 1)
+        name (str): Prefix of the producer thread names (Shows in logging)
+
+    Example:
+        ``with Merge([cats, kittens], key=lambda post: post.id, size=200) as batches: for batch in batches: ...``
+    """
+
+    def __init__(
+        self,
+        iterables: typing.Iterable[typing.Iterable[list]],
+        key: typing.Callable[[typing.Any], typing.Any],
+        size: int,
+        depth: int = 2,
+        name: str = "booru-dl-merge",
+    ):
+        self.key = key
+        self.size = max(size, 1)
+        self.sources = [
+            Prefetch(iterable, max(depth, 1), name=f"{name}-{number}")
+            for number, iterable in enumerate(iterables)
+        ]
+
+    def __iter__(self) -> typing.Iterator[list]:
+        """Yields merged pages, or a single empty page if no iterable produced any item"""
+        page: list = []
+        previous = _DONE
+        merged = False
+        for item in heapq.merge(
+            *(itertools.chain.from_iterable(source) for source in self.sources),
+            key=self.key,
+            reverse=True,
+        ):
+            current = self.key(item)
+            if current == previous:
+                continue
+            previous = current
+            page.append(item)
+            if len(page) >= self.size:
+                yield page
+                merged = True
+                page = []
+        if page or not merged:
+            yield page
+
+    def close(self) -> None:
+        """Stops every producer, waiting for any in-progress pages to finish"""
+        for source in self.sources:
+            source.close()
+
+    def __enter__(self) -> "Merge":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,207 @@
+"""Query planning for sections with more tags than a booru accepts in one search
+
+Boorus only accept a few tags per search (See ``TAG_LIMITS``). Instead of sending the first tags of a section
+and ignoring the rest, the tags sent are the most selective ones: the tags with the fewest posts, according
+to the booru's tag counts (Collected from its ``TAG_URI`` and cached in the download index). The booru then
+returns as few pages as possible, and the tags that were not sent (Including ``-`` excluded tags) are checked
+locally by ``filters.SectionFilter``.
+
+Tags that cannot be checked locally (Meta tags such as ``order:score`` and wildcards) are always sent first.
+
+Boorus may accept less tags than their type allows (Danbooru limits tags by account level). A booru rejecting a
+search for its tags is searched again with ``MIN_TAG_LIMIT`` tags in all (Including score and rating), checking
+the others locally.
+
+Ratings are sent as a single meta tag where possible (See ``rating_searches``): ``rating:s`` for one rating,
+``-rating:g`` for all ratings of the booru but one and ``rating:s,q`` on boorus searching several ratings at once
+(See ``MULTI_RATINGS``). A single search returns the posts of every rating in as few pages as possible. Other
+combinations are searched once per rating, and the searches are merged by post ID (See ``pipeline.Merge``).
+
+Example:
+    For ``tags = cat, outside, cute, solo, -dog`` on a booru accepting 4 tags, ``cat`` and ``outside`` might
+    have millions of posts while ``cute`` and ``solo`` have thousands - ``cute solo outside cat`` is sent and
+    posts tagged ``dog`` are skipped locally.
+"""
+import logging
+import typing
+
+import requests
+
+from booru_dl.library.backend import Backend
+
+#: Tags sent in a single search of each booru type (Besides score and rating)
+TAG_LIMITS = {"danbooru": 4, "gelbooru": 2}
+#: Tags sent in a single search of a booru that rejected a search for its tags (Such as an anonymous Danbooru user),
+#: including score and rating
+MIN_TAG_LIMIT = 2
+#: Booru types counting score and rating against their tag limit
+STRICT_LIMITS = {"gelbooru"}
+#: Ratings a post can have on each booru (First letter), by post adapter name (See ``posts.ADAPTERS``) or booru
+#: type until the adapter of a booru is known - ratings are not sent to boorus not listed
+RATINGS = {
+    "danbooru": ("g", "s", "q", "e"),
+    "e621": ("s", "q", "e"),
+    "gelbooru": ("g", "s", "q", "e"),
+}
+#: Boorus (Post adapter names) searching several ratings with a single tag, such as ``rating:s,q``
+MULTI_RATINGS = {"danbooru"}
+
+
+class Plan:
+    """How a section's tags are searched on a booru
+
+    Args:
+        tags (list): Tags sent to the booru, most selective first
+        required (iterable): Tags every post must have, checked locally
+        excluded (iterable): Tags no post may have, checked locally
+    """
+
+    __slots__ = ("tags", "required", "excluded")
+
+    def __init__(
+        self,
+        tags: typing.List[str],
+        required: typing.Iterable[str] = (),
+        excluded: typing.Iterable[str] = (),
+    ):
+        self.tags = tags
+        self.required = frozenset(required)
+        self.excluded = frozenset(excluded)
+
+    def __repr__(self) -> str:
+        return f"Plan(tags={self.tags}, required={sorted(self.required)}, excluded={sorted(self.excluded)})"
+
+
+def is_local(tag: str) -> bool:
+    """Checks if a tag can be checked against the tags of a post (Meta tags and wildcards cannot)"""
+    name = tag[1:] if tag.startswith("-") else tag
+    return bool(name) and not any(character in name for character in ":*~")
+
+
+def plan(
+    tags: typing.List[str],
+    limit: int,
+    count: typing.Callable[[str], typing.Optional[int]],
+) -> Plan:
+    """Chooses the tags of a section sent to a booru
+
+    Counts are only collected if the section has more tags than ``limit``. Tags without a known count are
+    ranked after every counted tag, in the order of the section.
+
+    Args:
+        tags (list): Tags of the section (``-`` prefixed tags are excluded)
+        limit (int): Amount of tags the booru accepts in one search
+        count (callable): Collects the amount of posts with a tag, or None if unknown
+
+    Returns:
+        Plan: Tags to send, and tags to check locally
+    """
+    tags = [tag for tag in tags if tag]
+    if len(tags) <= limit:
+        return Plan(tags)
+
+    sent = [tag for tag in tags if not is_local(tag)]
+    if len(sent) > limit:
+        logging.warning(
+            f"Only {limit} of the meta tags {', '.join(sent)} can be searched - Ignoring {', '.join(sent[limit:])}"
+        )
+        sent = sent[:limit]
+    included = [tag for tag in tags if is_local(tag) and not tag.startswith("-")]
+    excluded = [tag for tag in tags if is_local(tag) and tag.startswith("-")]
+    if len(sent) + len(included) > limit:
+        counts = {tag: count(tag) for tag in included}
+        included.sort(key=lambda tag: (counts[tag] is None, counts[tag] or 0))
+        logging.debug(
+            "Tag counts: " + ", ".join(f"{tag} {counts[tag]}" for tag in included)
+        )
+    # Excluded tags only narrow a search, so they are sent after every included tag fits
+    ranked = included + excluded
+    free = limit - len(sent)
+    sent += ranked[:free]
+    local = ranked[free:]
+    return Plan(
+        sent,
+        [tag for tag in local if not tag.startswith("-")],
+        [tag[1:] for tag in local if tag.startswith("-")],
+    )
+
+
+def rating_searches(
+    ratings: typing.List[str], booru: str, detected: bool = False
+) -> typing.List[typing.List[str]]:
+    """Collects the rating tags of the searches covering the ratings of a section
+
+    Args:
+        ratings (list): Ratings of the section (First letter, such as ``s``)
+        booru (str): Post adapter name of the booru, or its booru type if not known yet (See ``RATINGS``)
+        detected (bool): Whether ``booru`` is the adapter name - a booru type covers several boorus (Danbooru
+            and e621), so ``MULTI_RATINGS`` only apply once the booru is known
+
+    Returns:
+        list: Rating tags of each search - one search with ``rating:<rating>`` for one rating,
+        ``-rating:<rating>`` for all ratings but one or ``rating:<rating>,<rating>`` where supported, one search
+        per rating otherwise, or one search without a rating tag (All ratings, or the booru is not listed)
+    """
+    ratings = list(dict.fromkeys(ratings))
+    known = RATINGS.get(booru)
+    missing = [rating for rating in known or () if rating not in ratings]
+    if not known or not ratings or not missing:
+        return [[]]
+    if len(ratings) == 1:
+        return [[f"rating:{ratings[0]}"]]
+    if len(missing) == 1:
+        return [[f"-rating:{missing[0]}"]]
+    if detected and booru in MULTI_RATINGS:
+        return [[f"rating:{','.join(ratings)}"]]
+    return [[f"rating:{rating}"] for rating in ratings]
+
+
+def tag_package(tag: str, booru_api: str) -> typing.Dict[str, object]:
+    """Formats the package requesting the post count of a tag from ``TAG_URI``"""
+    if booru_api == "gelbooru":
+        return {"page": "dapi", "s": "tag", "q": "index", "json": "1", "name": tag}
+    return {"search[name_matches]": tag, "limit": 1}
+
+
+def parse_count(data: object, tag: str) -> typing.Optional[int]:
+    """Collects the post count of a tag from a ``TAG_URI`` response
+
+    Supports Danbooru (A list of tags with ``post_count``), e621 (The same, or ``{"tags": []}`` if not found)
+    and Gelbooru (``{"tag": [...]}`` or a list of tags with ``count``).
+
+    Returns:
+        int: Amount of posts with the tag, or None if the tag was not found
+    """
+    if isinstance(data, dict):
+        data = data.get("tag", data.get("tags", []))
+    if not isinstance(data, list):
+        return None
+    for entry in data:
+        if isinstance(entry, dict) and entry.get("name", tag) == tag:
+            value = entry.get("post_count", entry.get("count"))
+            if value is not None:
+                return int(value)
+    return None
+
+
+def fetch_count(booru: Backend, url: str, tag: str) -> typing.Optional[int]:
+    """Requests the post count of a tag
+
+    Args:
+        booru (Backend): Backend of the booru
+        url (str): ``TAG_URI`` of the booru
+        tag (str): Tag name
+
+    Returns:
+        int: Amount of posts with the tag, or None if unknown (Including failed requests)
+    """
+    try:
+        response = booru.get(
+            url, params=tag_package(tag, booru.api_type), auth=booru.auth, timeout=30
+        )
+        if response.status_code != 200:
+            raise requests.RequestException(response.status_code)
+        return parse_count(response.json(), tag)
+    except (requests.RequestException, ValueError) as e:
+        logging.debug(f"Could not collect the post count of {tag} from {url} ({e})")
+        return None
@@ -0,0 +1,243 @@
+"""Normalized posts and the adapters that parse them from booru API responses
+
+Every booru returns posts in its own JSON shape (``tag_string`` vs. tag categories vs. a tag string,
+``file_url`` vs. a ``file`` object, ...). Instead of working out the shape again for every post, an adapter
+is chosen once per API from the first post it returns (See ``detect``) and turns each raw post into a
+compact ``Post`` record.
+
+Supported response shapes:
+    * ``DanbooruAdapter``: Danbooru style ``/posts.json`` (A list of posts with ``tag_string``)
+    * ``E621Adapter``: e621 style ``/posts.json`` (``{"posts": [...]}`` with ``file`` and tag categories)
+    * ``GelbooruAdapter``: Gelbooru style ``/index.php?page=dapi`` (A list, or ``{"post": [...]}``)
+"""
+import abc
+import itertools
+import logging
+import typing
+from datetime import datetime
+
+
+class Post:
+    """A single post, normalized from any supported API
+
+    Uses ``__slots__`` so a page of posts holds only these fields instead of the full JSON dictionaries.
+    """
+
+    __slots__ = (
+        "id",
+        "md5",
+        "ext",
+        "url",
+        "tags",
+        "score",
+        "favs",
+        "rating",
+        "created_ts",
+        "file_size",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        md5: typing.Optional[str],
+        ext: str,
+        url: str,
+        tags: str,
+        score: int,
+        favs: int,
+        rating: str,
+        created_ts: float,
+        file_size: typing.Optional[int],
+    ):
+        self.id = id  #: Post ID
+        self.md5 = md5  #: MD5 of the file, or None if not provided by the API
+        self.ext = ext  #: File extension (Such as ``png``)
+        self.url = url  #: URL of the file
+        self.tags = tags  #: All tags of the post separated by spaces (Kept as one string to save memory)
+        self.score = score  #: Total score
+        self.favs = favs  #: Favorite count (0 if not provided by the API)
+        self.rating = rating  #: First letter of the rating (Such as ``s``)
+        self.created_ts = created_ts  #: Creation time (Timestamp)
+        self.file_size = file_size  #: File size in bytes (None if not provided)
+
+    def __repr__(self) -> str:
+        return f"Post(id={self.id}, ext={self.ext!r}, rating={self.rating!r}, score={self.score})"
+
+
+def parse_time(value: str) -> float:
+    """Converts an API creation time (ISO 8601 or ``Sat Jun 26 13:12:05 -0500 2021``) to a timestamp"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return datetime.strptime(value, "%a %b %d %H:%M:%S %z %Y").timestamp()
+
+
+def file_ext(url: str) -> str:
+    """Collects the file extension from a file URL"""
+    return url.rsplit("/", 1)[-1].rsplit(".", 1)[-1]
+
+
+class PostAdapter(abc.ABC):
+    """Base adapter converting the posts of one API response shape into ``Post`` records
+
+    Adapters implement ``convert``, an adapter missing it cannot be created.
+    """
+
+    name = "base"  #: Name of the response shape (For logging)
+    page_limit = 100  #: Most posts the API returns per page
+
+    @staticmethod
+    def unwrap(data: typing.Union[list, dict]) -> list:
+        """Collects the list of raw posts from a decoded API response"""
+        if isinstance(data, dict):
+            return data.get("posts", data.get("post", []))
+        return data
+
+    @abc.abstractmethod
+    def convert(self, raw: dict) -> Post:
+        """Converts a single raw post (Implemented by each adapter)
+
+        Raises:
+            KeyError: Missing data
+            TypeError: Data of an unexpected type
+            ValueError: Data of an unexpected format
+        """
+
+    def parse(self, raw: dict) -> typing.Optional[Post]:
+        """Converts a single raw post, or None if the post is unusable (Such as hidden files)"""
+        try:
+            return self.convert(raw)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            if isinstance(raw, dict) and "id" in raw and not self.file_url(raw):
+                logging.warning(
+                    f"File access for Post {raw['id']} blocked by site - possibly requires API access"
+                )
+            else:
+                logging.debug("Skipping unusable %s post (%r)", self.name, e)
+            return None
+
+    def parse_page(self, raw_posts: list) -> typing.List[Post]:
+        """Converts every usable post of a page"""
+        return [post for post in map(self.parse, raw_posts) if post is not None]
+
+    @staticmethod
+    def file_url(raw: dict) -> typing.Optional[str]:
+        """Collects the file URL of a raw post, or None if hidden"""
+        return raw.get("file_url")
+
+    def require_file_url(self, raw: dict) -> str:
+        """Collects the file URL of a raw post
+
+        Raises:
+            ValueError: The file is hidden (Or missing)
+        """
+        url = self.file_url(raw)
+        if not url or not isinstance(url, str):
+            raise ValueError(f"No file URL for post {raw.get('id')}")
+        return url
+
+
+class DanbooruAdapter(PostAdapter):
+    """Danbooru style posts (``tag_string``, ``file_url``, ``fav_count``)"""
+
+    name = "danbooru"
+    page_limit = 200
+
+    def convert(self, raw: dict) -> Post:
+        url = self.require_file_url(raw)
+        size = raw.get("file_size")
+        return Post(
+            int(raw["id"]),
+            raw.get("md5") or None,
+            raw.get("file_ext") or file_ext(url),
+            url,
+            raw["tag_string"],
+            int(raw.get("score") or 0),
+            int(raw.get("fav_count") or 0),
+            raw["rating"][:1].lower(),
+            parse_time(raw["created_at"]),
+            int(size) if size else None,
+        )
+
+
+class E621Adapter(PostAdapter):
+    """e621 style posts (``file`` object, ``score`` object and tag categories)"""
+
+    name = "e621"
+    page_limit = 320
+
+    @staticmethod
+    def file_url(raw: dict) -> typing.Optional[str]:
+        return (raw.get("file") or {}).get("url")
+
+    def convert(self, raw: dict) -> Post:
+        file = raw["file"]
+        url = self.require_file_url(raw)
+        score = raw["score"]
+        return Post(
+            int(raw["id"]),
+            file.get("md5") or None,
+            file.get("ext") or file_ext(url),
+            url,
+            " ".join(itertools.chain.from_iterable(raw["tags"].values())),
+            int(score["total"] if isinstance(score, dict) else score or 0),
+            int(raw.get("fav_count") or 0),
+            raw["rating"][:1].lower(),
+            parse_time(raw["created_at"]),
+            int(file["size"]) if file.get("size") else None,
+        )
+
+
+class GelbooruAdapter(PostAdapter):
+    """Gelbooru style posts (``tags`` string, ``file_url``, word ratings, no favorites)"""
+
+    name = "gelbooru"
+    page_limit = 1000
+
+    def convert(self, raw: dict) -> Post:
+        url = self.require_file_url(raw)
+        return Post(
+            int(raw["id"]),
+            raw.get("md5") or raw.get("hash") or None,
+            file_ext(url),
+            url,
+            raw["tags"].strip(),
+            int(raw.get("score") or 0),
+            int(raw.get("fav_count") or 0),
+            raw["rating"][:1].lower(),
+            parse_time(raw["created_at"]),
+            None,
+        )
+
+
+#: Adapters by name
+ADAPTERS: typing.Dict[str, PostAdapter] = {
+    adapter.name: adapter
+    for adapter in (DanbooruAdapter(), E621Adapter(), GelbooruAdapter())
+}
+
+
+def detect(sample: dict, api_type: str, container: str = None) -> PostAdapter:
+    """Chooses the adapter for an API from the first post it returned
+
+    Args:
+        sample (dict): First raw post returned by the API
+        api_type (str): Type of booru API from the config (``danbooru`` or ``gelbooru``)
+        container (str): Key of the object the posts were listed in (``posts`` or ``post``), if any
+
+    Returns:
+        PostAdapter: Adapter to parse every response of the API with
+    """
+    if api_type == "gelbooru":
+        return ADAPTERS["gelbooru"]
+    if not isinstance(sample, dict):
+        sample = {}
+    if (
+        container == "posts"
+        or isinstance(sample.get("file"), dict)
+        or isinstance(sample.get("tags"), dict)
+    ):
+        return ADAPTERS["e621"]
+    if "tag_string" in sample or not sample:
+        return ADAPTERS["danbooru"]
+    return ADAPTERS["gelbooru"]
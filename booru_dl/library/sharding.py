@@ -0,0 +1,132 @@
+"""ID range shards of large first-time searches (Backfills)
+
+A search pages through its posts with a single cursor, each page waiting on the one before it (See
+``Downloader.iter_pages``). Searching every post of a popular tag over a year takes hundreds of pages.
+
+Backfills (Searches without a watermark, such as the first search of a section or ``--full``) are instead split
+into ranges of post IDs, each searched with its own cursor at the same time (See ``backend.range_package``).
+Requests of every range still wait on the host's rate limit, and posts land in the same index and folders.
+
+Posts of a search are not spread evenly over post IDs (A tag may have been more popular at times, and boorus
+receive more posts every year), so ranges are cut from a few small probe pages (See ``PROBE_LIMIT``):
+
+#. The newest posts of the search measure how many post IDs the booru uses per second, estimating the post ID
+   at the start of the section's days (See ``estimate_id``), refined by probing around the estimate
+#. Probes spread between that ID and the newest post measure how many posts of the search each part of the
+   range holds (See ``density``)
+#. The range is cut where every shard holds the same amount of posts (See ``shard_bounds``), so the shards
+   finish at about the same time
+
+The oldest shard is not bounded below and ends at the section's days like any other search, so a poor estimate
+only costs balance, never posts.
+"""
+import typing
+
+#: Posts requested by each probe
+PROBE_LIMIT = 20
+#: Probes refining the estimated post ID at the start of a section's days
+REFINE_PROBES = 3
+#: Pages of posts each shard should search at least, smaller searches are split into less shards
+SHARD_PAGES = 2
+
+
+def estimate_id(
+    samples: typing.List[typing.Tuple[int, float]], timestamp: float
+) -> int:
+    """Estimates the ID of a post created at a given time, from posts of known creation times
+
+    Interpolates between the posts created closest before and after ``timestamp``, or extrapolates along the
+    oldest and newest post if all of them are older or newer (Their IDs are furthest apart, so the estimated
+    post IDs per second are the least noisy).
+
+    Args:
+        samples (list): Post ID and creation timestamp of known posts
+        timestamp (float): Creation timestamp to estimate a post ID for
+
+    Returns:
+        int: Estimated post ID (At least 1)
+    """
+    samples = sorted(set(samples), key=lambda sample: sample[1])
+    before = [sample for sample in samples if sample[1] < timestamp]
+    after = [sample for sample in samples if sample[1] >= timestamp]
+    if before and after:
+        (low_id, low_time), (high_id, high_time) = before[-1], after[0]
+    elif len(samples) >= 2:
+        (low_id, low_time), (high_id, high_time) = samples[0], samples[-1]
+    else:
+        return max(samples[0][0], 1) if samples else 1
+    if high_time <= low_time:
+        return max(low_id, 1)
+    rate = (high_id - low_id) / (high_time - low_time)
+    return max(int(low_id + rate * (timestamp - low_time)), 1)
+
+
+def density(
+    before_id: int, count: int, last_id: typing.Optional[int], limit: int, bottom: int
+) -> float:
+    """Estimates the posts of a search per post ID below a probe
+
+    Args:
+        before_id (int): Post ID the probe searched below
+        count (int): Posts returned by the probe
+        last_id (int): ID of the oldest post returned by the probe (None if unknown)
+        limit (int): Posts requested by the probe
+        bottom (int): Lowest post ID searched
+
+    Returns:
+        float: Posts per post ID - if the probe returned less posts than requested, those were all of the
+        posts down to ``bottom``
+    """
+    if count >= limit and last_id is not None:
+        return count / max(before_id - last_id, 1)
+    return count / max(before_id - bottom, 1)
+
+
+def shard_bounds(
+    densities: typing.List[typing.Tuple[int, float]],
+    bottom: int,
+    top: int,
+    shards: int,
+) -> typing.List[int]:
+    """Cuts a range of post IDs into shards holding about the same amount of posts
+
+    Each density applies from its post ID down to the next one (The last down to ``bottom``). Without any
+    posts measured, the range is cut into shards of the same size.
+
+    Args:
+        densities (list): Post ID and posts per post ID below it, measured by probes (See ``density``)
+        bottom (int): Lowest post ID searched
+        top (int): Highest post ID searched
+        shards (int): Amount of shards
+
+    Returns:
+        list: Post IDs where the shards meet, highest first - each shard searches from its bound up to the
+        previous one (The newest shard has no upper bound and the oldest no lower bound)
+    """
+    points = sorted(
+        ((min(max(point, bottom), top), value) for point, value in densities),
+        reverse=True,
+    )
+    if not points or points[0][0] < top:
+        points.insert(0, (top, points[0][1] if points else 0.0))
+    segments = [
+        (high, low, value)
+        for (high, value), (low, _) in zip(points, points[1:] + [(bottom, 0.0)])
+        if high > low
+    ]
+    total = sum((high - low) * value for high, low, value in segments)
+    if total <= 0:
+        segments = [(top, bottom, 1.0)]
+        total = float(top - bottom)
+
+    bounds: typing.List[int] = []
+    seen = 0.0
+    targets = [total * number / shards for number in range(1, shards)]
+    for high, low, value in segments:
+        posts = (high - low) * value
+        while targets and seen + posts >= targets[0]:
+            bound = int(high - (targets.pop(0) - seen) / value)
+            if bottom < bound < top and (not bounds or bound < bounds[-1]):
+                bounds.append(bound)
+        seen += posts
+    return bounds
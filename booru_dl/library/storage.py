@@ -0,0 +1,80 @@
+"""Content-addressed storage of downloaded files
+
+Every unique file is stored once in ``downloads/.blobs/<md5[:2]>/<md5>.<ext>``, and section folders
+(``downloads/<section>/<api>/<post_id>.<ext>``) receive a hardlink to it. If hardlinks are not
+possible (Such as file systems without support for them) a symlink is used, and a copy as a last resort.
+The layout of section folders is the same as without the blob store.
+"""
+import logging
+import os
+import pathlib
+import shutil
+import threading
+import typing
+
+
+class BlobStore:
+    """Stores files by MD5 and links them into section folders
+
+    Args:
+        root (str): Folder to store blobs in (Hidden folders are ignored by the download index import)
+    """
+
+    def __init__(self, root: str):
+        self.root = pathlib.PurePath(root)
+        self.locks: typing.Dict[str, threading.Lock] = {}
+        self.locks_lock = threading.Lock()
+
+    def path(self, md5: str, ext: str) -> pathlib.PurePath:
+        """Collects the location of a blob
+
+        Args:
+            md5 (str): MD5 of the file
+            ext (str): File extension
+
+        Returns:
+            pathlib.PurePath: Location of the blob (May not exist yet)
+        """
+        md5 = md5.lower()
+        return self.root.joinpath(md5[:2], f"{md5}.{ext}")
+
+    def lock(self, md5: str) -> threading.Lock:
+        """Collects the lock of a blob, preventing two workers from downloading the same file at once"""
+        with self.locks_lock:
+            return self.locks.setdefault(md5.lower(), threading.Lock())
+
+    @staticmethod
+    def link(source: str, target: str) -> str:
+        """Places ``source`` at ``target`` as a hardlink, symlink or copy (Tried in that order)
+
+        The link is created next to ``target`` and renamed over it, so an existing target (Such as a dangling
+        symlink to a removed blob, or a stale file) is replaced.
+
+        Args:
+            source (str): Existing file
+            target (str): Location to create
+
+        Returns:
+            str: Type of link created (``hardlink``, ``symlink`` or ``copy``)
+
+        Raises:
+            OSError: The file could not be placed at ``target`` by any means
+        """
+        os.makedirs(pathlib.PurePath(target).parent, exist_ok=True)
+        temporary = f"{target}.link"
+        if os.path.lexists(temporary):
+            os.remove(temporary)
+        kind = "copy"
+        try:
+            os.link(source, temporary)
+            kind = "hardlink"
+        except OSError as e:
+            logging.debug("Hardlink from %s to %s failed (%s)", source, target, e)
+            try:
+                os.symlink(os.path.abspath(source), temporary)
+                kind = "symlink"
+            except OSError as e:
+                logging.debug("Symlink from %s to %s failed (%s)", source, target, e)
+                shutil.copyfile(source, temporary)
+        os.replace(temporary, target)
+        return kind
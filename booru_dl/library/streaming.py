@@ -0,0 +1,148 @@
+"""JSON decoding of API pages
+
+API pages are either decoded as they arrive (``PostStream``), holding a single raw post at a time instead of
+the whole response and every field of every post, or decoded at once (``loads``) using the fastest installed
+decoder.
+
+Supported page layouts (Matching ``posts.PostAdapter.unwrap``):
+    * A list of posts (Danbooru, older Gelbooru)
+    * An object holding the list of posts in ``posts`` (e621) or ``post`` (Gelbooru)
+
+Note:
+    ``orjson`` is used by ``loads`` if installed, otherwise the standard library ``json`` module.
+    Streaming always uses the standard library decoder, whose C scanner decodes each post.
+"""
+import codecs
+import json
+import re
+import typing
+
+try:
+    import orjson
+except ImportError:  # Optional, falls back to the standard library
+    orjson = None
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+CONTAINERS = ("posts", "post")  #: Keys of objects holding the list of posts
+
+
+def loads(data: typing.Union[bytes, str]) -> typing.Any:
+    """Decodes a complete JSON document, using ``orjson`` if installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class PostStream:
+    """Iterates the raw posts of a JSON API page while it is being received
+
+    Only the unread part of the response is buffered, and each post is decoded on its own. Anything after
+    the list of posts is ignored.
+
+    Args:
+        chunks (iterable of bytes): Response body, such as ``response.iter_content(65536)``
+
+    Raises:
+        ValueError: The page is not valid JSON (Raised while iterating)
+
+    Example:
+        ``for raw in PostStream(response.iter_content(65536)): adapter.parse(raw)``
+    """
+
+    def __init__(self, chunks: typing.Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.decoder = json.JSONDecoder()
+        self.text = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        #: Key of the object holding the posts (``posts`` or ``post``), None for a list or if not found yet
+        self.container: typing.Optional[str] = None
+
+    def _fill(self) -> bool:
+        """Reads the next chunk into the buffer, dropping the part already decoded
+
+        Returns:
+            bool: False once the response ended
+        """
+        if self.eof:
+            return False
+        if self.pos > 65536 or self.pos > len(self.buffer) // 2:
+            self.buffer = self.buffer[self.pos :]
+            self.pos = 0
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer += self.text.decode(chunk)
+                return True
+        self.buffer += self.text.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def _peek(self) -> str:
+        """Skips whitespace and collects the next character ("" at the end of the response)"""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _decode(self) -> typing.Any:
+        """Decodes the JSON value at the next position"""
+        if not self._peek():
+            raise ValueError("API page ended unexpectedly")
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A value reaching the end of the buffer may continue in the next chunk (Such as a number)
+            if end < len(self.buffer) or not self._fill():
+                self.pos = end
+                return value
+
+    def _expect(self, character: str) -> None:
+        """Moves past the next character, which must be ``character``"""
+        found = self._peek()
+        if found != character:
+            raise ValueError(
+                f"Expected {character!r} in API page at {self.pos}, found {found!r}"
+            )
+        self.pos += 1
+
+    def _items(self) -> typing.Iterator[typing.Any]:
+        """Yields the values of the list at the current position"""
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._decode()
+            found = self._peek()
+            self.pos += 1
+            if found == "]":
+                return
+            if found != ",":
+                raise ValueError(f"Expected ',' or ']' in API page, found {found!r}")
+
+    def __iter__(self) -> typing.Iterator[dict]:
+        first = self._peek()
+        if first == "[":
+            yield from self._items()
+        elif first == "{":
+            self.pos += 1
+            while self._peek() not in ("}", ""):
+                if self.buffer[self.pos] == ",":
+                    self.pos += 1
+                    continue
+                key = self._decode()
+                self._expect(":")
+                if key in CONTAINERS and self._peek() == "[":
+                    self.container = key
+                    yield from self._items()
+                    return
+                self._decode()  # Skip any other value
+        elif first:
+            raise ValueError(f"Unexpected {first!r} at the start of API page")
@@ -14,14 +14,30 @@ Please see :doc:`config` and :doc:`backend` for more details on how these librar
 import logging
 import os
 import pathlib
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from time import sleep
+from typing import Dict, List, Optional, Tuple
 
 import requests
 
-from booru_dl.library import backend
+from booru_dl.library import (
+    backend,
+    cache,
+)
 from booru_dl.library import config as cfg
+from booru_dl.library import (
+    filters,
+    index,
+    metrics,
+    pipeline,
+    planner,
+    posts,
+    sharding,
+    storage,
+    streaming,
+)
 from booru_dl.library.backend import format_package
 
 
@@ -30,6 +46,7 @@ class Downloader:
 
     Args:
         config_loc (str): Default of ``config.ini``, any config file provided
+        full (bool): Search all ``days`` of every section, ignoring where previous searches stopped
 
     Warnings:
         ``config_loc`` must be of type ``str`` and not contain anything other than the file name.
@@ -39,6 +56,7 @@ class Downloader:
     def __init__(
         self,
         config_loc: str = "config.ini",
+        full: bool = False,
     ):  # Self-starting function
         logging.info("Starting Booru downloader [v1.0.0]")
 
@@ -50,10 +68,8 @@ class Downloader:
         # Makes all needed directories
         os.makedirs(self.filepath, exist_ok=True)
 
-        # Collects config and Session
+        # Collects config - every request goes through the session of its [URI] (See self.backends)
         self.config = cfg.Config(config_loc)
-        # TODO extract session to run on post basis (likely)
-        self.session = backend.get_session(self.config.useragent)  # Get useragent
 
         # Collects metadata
         # TODO add support for multiple uri, api_keys, and usernames - will be implemented in config
@@ -63,68 +79,430 @@ class Downloader:
         # TODO add support for multiple blacklists PER URI (possible but is it needed?)
         self.blacklist = self.config.blacklist
 
-    # TODO refactor get_data to be more modular in format
+        # Files are fetched by a pool of workers while API pages are requested from get_posts
+        self.workers = self.config.workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="booru-dl"
+        )
+        # Time spent in every phase (Requests, parsing, filtering, downloads...) by section and API
+        self.metrics = metrics.Metrics()
+
+        # Requests to every host (API pages and files) wait on that host's token bucket
+        self.limiter = backend.RateLimiter(
+            *self.config.rate_limits.get("default", (2.0, 2)), metrics=self.metrics
+        )
+        for api, (rate, burst) in self.config.rate_limits.items():
+            if api != "default":
+                self.limiter.configure(self.URI[api][1], rate, burst)
+
+        # Temporary failures are retried, APIs failing too often are skipped by their circuit breaker
+        self.retry = backend.RetryPolicy(
+            self.config.retries,
+            self.config.retry_backoff,
+            self.config.retry_backoff_max,
+            self.config.retry_jitter,
+        )
+
+        # API pages already seen are requested conditionally and answered from the cache if unchanged
+        self.page_cache = (
+            cache.PageCache(
+                self.path.joinpath(".booru-dl", "pages.sqlite"),
+                self.config.page_cache_size * 1024 * 1024,
+                self.config.page_cache_days * 86400,
+            )
+            if self.config.page_cache_size > 0
+            else None
+        )
+
+        # One backend (session, connection pool, user-agent and auth) per [URI], shared by its workers
+        # Pool covers every download worker plus the page producers (One per shard) requesting the same host
+        self.backends = {
+            api: backend.Backend(
+                *self.URI[api],
+                limiter=self.limiter,
+                pool_size=self.workers
+                + self.config.prefetch_pages
+                + self.config.backfill_shards,
+                retry=self.retry,
+                breaker=backend.CircuitBreaker(
+                    self.config.failure_threshold, self.config.failure_cooldown
+                ),
+                cache=self.page_cache,
+            )
+            for api in self.URI
+        }
+
+        # Files are stored once by MD5 and linked into each section folder
+        self.blobs = storage.BlobStore(self.filepath.joinpath(".blobs"))
+
+        # Post adapter of each API, chosen from its first page of posts (See iter_pages)
+        self.adapters: Dict[str, posts.PostAdapter] = {}
+        # Tags sent in one search of APIs that rejected a search for its tags (See get_posts)
+        self.tag_limits: Dict[str, int] = {}
+
+        # Searches stop at posts checked by previous runs unless a full search is requested
+        self.full = full
+
+        # Index of every post downloaded, checked before any network or file system work
+        self.index = index.DownloadIndex(
+            self.path.joinpath(".booru-dl", "index.sqlite"), self.filepath
+        )
+
+        # Totals across all (section, api) collections of get_data
+        self.progress = dict(jobs=0, total_jobs=0, downloaded=0, skipped=0)
+        self.progress_lock = threading.Lock()
+
     def get_data(self):
         """Collects all data from the sections determined on class instantiation
 
         For each section to download, takes the criteria provided and POST requests
         the booru site provided until a flag is reached (eg. Past days allowed, end of
         provided input from booru site)
+
+        Every (section, api) pair is a job. Jobs are grouped into one lane per host: the jobs of
+        a lane run one after another, while lanes of different hosts run at the same time.
+        Jobs of an API whose circuit breaker opened (Too many failures in a row) are skipped.
         """
         func_result = 0
         start = time.time()
+        lanes: Dict[str, List[Tuple[cfg.Section, str, str]]] = {}
         for section_name in self.config.posts:
-            logging.info(f'Beginning Download of section "{section_name}"')
             section: cfg.Section = self.config.posts[section_name]
-            # 3 tags + score + rating for filtering
-            # TODO package must be changed per-api endpoint - will need nested loop to run <Section> per <URI>
-            # TODO also update format_package to support multiple API endpoints (via backend class)
-            #  for best result, will likely need to refactor this into backend OR update get_posts to run format_package
             for api in section.api_endpoint:
-                booru_type = self.config.uri[api][2]
+                booru_type = self.config.uri[api][
+                    2
+                ]  # List contains booru type at index 2
                 if booru_type != "None":
-                    logging.info(f"Beginning collection from '{api}' [{section_name}]")
-                    before_id = 10000000
-                    if len(section.rating) > 1:
-                        self.package = format_package(
-                            section.tags[:3] + [f"score:>={section.min_score}"],
-                            before_id,
-                            booru_api=booru_type,  # List contains booru type at index 2
-                        )
-                    else:
-                        self.package = format_package(
-                            section.tags[:4]
-                            + [
-                                f"score:>={section.min_score}",
-                                f"rating:{section.rating[0]}",
-                            ],
-                            before_id,
-                            booru_api=booru_type,
-                        )
-                    # Check for file collection issues
-                    if not func_result:
-                        func_result = self.get_posts(section, api, booru_type)
-                        if func_result == 1:
-                            logging.error(
-                                f"Problem with post collection for api {api} - Too High post requirements likely"
-                            )
-                    else:
-                        self.get_posts(section, api, booru_type)
+                    host = self.limiter.host(self.config.uri[api][1])
+                    lanes.setdefault(host, []).append((section, api, booru_type))
                 else:
                     logging.error(
                         f"Detected broken API {api} - Remove from config or send info to developer if bug"
                     )
                     func_result = 1
 
+        self.progress = dict(
+            jobs=0,
+            total_jobs=sum(len(jobs) for jobs in lanes.values()),
+            downloaded=0,
+            skipped=0,
+        )
+        with ThreadPoolExecutor(
+            max_workers=max(len(lanes), 1), thread_name_prefix="booru-dl-lane"
+        ) as scheduler:
+            results = [scheduler.submit(self.run_lane, jobs) for jobs in lanes.values()]
+            for result in results:
+                func_result |= result.result()
+        self.index.flush()
+
         logging.info(
-            f"All Sections have been collected (Total execution time of {time.time() - start:.2f}s)"
+            f"All Sections have been collected - {self.progress['downloaded']} Downloaded / "
+            f"{self.progress['skipped']} Already Downloaded "
+            f"(Total execution time of {time.time() - start:.2f}s)"
         )
+        self.export_metrics()
         return func_result  # if any post collection failed should return 1
 
+    def export_metrics(self):
+        """Logs the time spent in each phase and writes the configured metrics files
+
+        See ``metrics_file`` and ``summary_file`` in :doc:`config`. A file that cannot be written is
+        logged and skipped.
+        """
+        totals = self.metrics.totals()
+        logging.info(
+            "Time by phase (Summed across threads): "
+            + ", ".join(
+                f"{name[:-8]} {totals[name]:.2f}s"
+                for name in metrics.METRICS
+                if name.endswith("_seconds") and name in totals
+            )
+        )
+        for path, write in (
+            (self.config.metrics_file, self.metrics.write_prometheus),
+            (self.config.summary_file, self.metrics.write_summary),
+        ):
+            if path:
+                try:
+                    write(path)
+                    logging.debug(f"Metrics written to {path}")
+                except OSError as e:
+                    logging.error(f"Could not write metrics to {path} ({e})")
+
+    def run_lane(self, jobs: List[Tuple[cfg.Section, str, str]]) -> int:
+        """Runs the (section, api) jobs of a single host one after another
+
+        A job raising an unexpected error is logged and counted as failed, the following jobs still run.
+
+        Args:
+            jobs (list): Tuples of section, [URI] nickname and booru type to collect posts for
+
+        Returns:
+            int: 0 if all jobs succeeded, 1 if any post collection failed
+        """
+        lane_result = 0
+        for section, api, booru_type in jobs:
+            if self.backends[api].breaker.is_open:
+                logging.error(
+                    f"Skipping collection from '{api}' [{section.name}] - API failed too many times"
+                )
+                lane_result = 1
+            else:
+                logging.info(f"Beginning collection from '{api}' [{section.name}]")
+                # Check for file collection issues, an unexpected error only fails its own job
+                try:
+                    job_result = self.get_posts(section, api, booru_type)
+                except Exception:
+                    logging.exception(
+                        f"Collection from '{api}' [{section.name}] failed unexpectedly"
+                    )
+                    job_result = 1
+                if job_result == 1:
+                    logging.error(
+                        f"Problem with post collection for api {api} - Too High post requirements likely"
+                    )
+                    lane_result = 1
+            self.index.flush()
+            with self.progress_lock:
+                self.progress["jobs"] += 1
+                logging.info(
+                    f"Progress: {self.progress['jobs']}/{self.progress['total_jobs']} collections done - "
+                    f"{self.progress['downloaded']} Downloaded / {self.progress['skipped']} Already Downloaded"
+                )
+        return lane_result
+
+    @staticmethod
+    def section_package(
+        section: cfg.Section,
+        booru_type: str,
+        tags: List[str] = None,
+        now: float = None,
+        limit: int = None,
+        strict: bool = None,
+        rating: List[str] = None,
+    ) -> dict:
+        """Formats the first search package for a section on a given booru type
+
+        Args:
+            section (cfg.Section): Section to search for
+            booru_type (str): Type of booru API the package is sent to
+            tags (list): Tags sent to the booru (See ``plan_search``), defaults to the first tags of the section
+            now (float): Timestamp the section's days are counted back from - if provided, the booru also
+                filters by the section's min_faves and days where supported (See ``format_package``), as long
+                as the tags leave room for them
+            limit (int): Tags the booru accepts besides score and rating, defaults to ``planner.TAG_LIMITS``
+            strict (bool): Whether score and rating count against ``limit`` as well (Such as for a booru that
+                rejected a search for its tags), they are then only sent in the places left by the tags -
+                defaults to whether the booru type is in ``planner.STRICT_LIMITS``
+            rating (list): Rating tags of the search (See ``planner.rating_searches``), defaults to the rating
+                tags of the section if a single search covers its ratings
+
+        Returns:
+            dict: Package to provide ``backend.request_uri``
+        """
+        # Tags + score + rating for filtering
+        before_id = 10000000
+        if limit is None:
+            limit = planner.TAG_LIMITS.get(booru_type, 4)
+        if strict is None:
+            strict = booru_type in planner.STRICT_LIMITS
+        if rating is None:
+            searches = planner.rating_searches(section.rating, booru_type)
+            rating = searches[0] if len(searches) == 1 else []
+        tags = (section.tags if tags is None else tags)[:limit]
+        free = limit - len(tags)
+        score = [f"score:>={section.min_score}"]
+        if strict:  # Rating first, it usually drops more posts
+            rating = rating[:free]
+            score = score[: free - len(rating)]
+            free -= len(rating) + len(score)
+        # min_faves and days only take the places left by the tags, otherwise they are only checked locally
+        if now is None:
+            free = 0
+        min_faves = section.min_faves if free > 0 else 0
+        if min_faves > 0:
+            free -= 1
+        return format_package(
+            tags + score + rating,
+            before_id,
+            booru_api=booru_type,
+            after=now - section.days * 86400 if free > 0 else None,
+            min_faves=min_faves,
+        )
+
+    @staticmethod
+    def section_query(section: cfg.Section) -> str:
+        """Collects the whole query of a section, keying its watermarks
+
+        Ratings are only part of the query for single rating sections, as they were before multiple ratings
+        were sent, so earlier watermarks stay valid. Sub-queries are joined by ``|``.
+        """
+        ratings = [f"rating:{section.rating[0]}"] if len(section.rating) == 1 else []
+        queries = section.queries or [section.tags]
+        return " | ".join(
+            " ".join(query)
+            for query in queries[:-1]
+            + [queries[-1] + [f"score:>={section.min_score}"] + ratings]
+        )
+
+    def plan_search(
+        self,
+        section: cfg.Section,
+        url: str,
+        booru_type: str,
+        tags: List[str] = None,
+        limit: int = None,
+    ) -> planner.Plan:
+        """Chooses the tags of a section sent to an API, the others are checked locally (See :doc:`planner`)
+
+        Args:
+            section (cfg.Section): Section to search for
+            url (str): [URI] nickname of the API to search
+            booru_type (str): Type of booru API
+            tags (list): Tags of the sub-query to search, defaults to the tags of the section
+            limit (int): Tags sent, defaults to the tag limit of the API (See ``tag_limit``)
+
+        Returns:
+            planner.Plan: Tags to send, and tags to check locally
+        """
+        search = planner.plan(
+            section.tags if tags is None else tags,
+            self.tag_limit(url, booru_type)[0] if limit is None else limit,
+            lambda tag: self.tag_count(url, tag),
+        )
+        if search.required or search.excluded:
+            logging.info(
+                f"Searching API {url} for {' '.join(search.tags)} [{section.name}] - Checking "
+                f"{' '.join(sorted(search.required) + ['-' + tag for tag in sorted(search.excluded)])} locally"
+            )
+        return search
+
+    def tag_limit(self, url: str, booru_type: str) -> Tuple[int, bool]:
+        """Collects the tags sent in one search of an API (See ``planner.TAG_LIMITS``)
+
+        Returns:
+            tuple: Amount of tags, and whether score and rating count against it (Lowered to
+            ``planner.MIN_TAG_LIMIT`` in all once the API rejected a search for its tags - See ``get_posts``)
+        """
+        if url in self.tag_limits:
+            return self.tag_limits[url], True
+        return (
+            planner.TAG_LIMITS.get(booru_type, 4),
+            booru_type in planner.STRICT_LIMITS,
+        )
+
+    def tag_count(self, url: str, tag: str) -> Optional[int]:
+        """Collects the post count of a tag on an API, stored in the download index for ``tag_count_days``
+
+        Args:
+            url (str): [URI] nickname of the API
+            tag (str): Tag name
+
+        Returns:
+            int: Amount of posts with the tag, or None if unknown
+        """
+        count = self.index.tag_count(url, tag, self.config.tag_count_days * 86400)
+        if count is None and self.config.paths[url].get("TAG_URI"):
+            count = planner.fetch_count(
+                self.backends[url], self.config.paths[url]["TAG_URI"], tag
+            )
+            if count is not None:
+                self.index.set_tag_count(url, tag, count)
+        return count
+
+    def fetch_post(self, section: str, api: str, post: posts.Post):
+        """Downloads a post for a section and records it in the download index
+
+        Posts with a known MD5 are stored once in the blob store and hardlinked into the section folder,
+        so a post matching several sections (or boorus) is only downloaded once. Posts without an MD5 are
+        linked from another section's file if downloaded before, otherwise downloaded to the section folder.
+
+        Args:
+            section (str): Section name the post is collected for
+            api (str): [URI] nickname the post came from
+            post (posts.Post): Post to download
+
+        Returns:
+            Same as ``download_file``
+        """
+        post_id, url, md5, size = post.id, post.url, post.md5, post.file_size
+        folder = f"{section}/{api}"
+        ext = url.split("/")[-1].split(".")[-1]
+        file_name = f"{post_id}.{ext}"
+        target = self.filepath.joinpath(pathlib.PurePath(folder), file_name)
+
+        start = time.perf_counter()
+        outcome = "failed"  # Counted in files_total once the post is done
+        try:
+            if os.path.exists(target):  # Downloaded before the index existed
+                logging.debug("File %s already exists - Skipping", file_name)
+                file_name = 1
+                outcome = "exists"
+            elif md5:
+                blob = self.blobs.path(md5, ext)
+                outcome = "linked"
+                with self.blobs.lock(md5):
+                    if not os.path.exists(blob):
+                        if not self.save_file(
+                            self.backends[api].session, url, blob, size, api
+                        ):
+                            return -1
+                        outcome = "downloaded"
+                link = self.blobs.link(blob, target)
+                logging.debug(
+                    "Stored %s as %s (%s to %s)", file_name, blob, link, target
+                )
+            else:
+                for path in self.index.lookup(api, post_id).values():
+                    if os.path.exists(path):
+                        link = self.blobs.link(path, target)
+                        logging.debug(
+                            "Collected %s from %s (%s)", file_name, path, link
+                        )
+                        outcome = "linked"
+                        break
+                else:
+                    file_name = self.download_file(
+                        self.backends[api].session,
+                        url,
+                        folder,
+                        str(post_id),
+                        size,
+                        api,
+                    )
+                    outcome = {1: "exists", -1: "failed"}.get(file_name, "downloaded")
+        except requests.RequestException as e:  # Failed after retries, or the API is skipped
+            logging.error(f"Error downloading {url} - {type(e).__name__}: {e}")
+            outcome = "failed"
+            return -1
+        except OSError as e:  # Writing or linking the file failed, the next search retries it
+            logging.error(f"Error storing {url} at {target} - {type(e).__name__}: {e}")
+            outcome = "failed"
+            return -1
+        finally:
+            self.metrics.observe(
+                "file_download_seconds",
+                time.perf_counter() - start,
+                section=section,
+                api=api,
+            )
+            self.metrics.inc("files_total", section=section, api=api, result=outcome)
+        if file_name != -1:
+            self.index.record(
+                api, post_id, section, target, md5, os.path.getsize(target)
+            )
+        return file_name
+
     # TODO: refactor this into backend and/or combine with already available backend.request_uri()
     # TODO: remove session from required variables as it is a global class variable
     def download_file(
-        self, session: requests.Session, url: str, section: str, file_name: str
+        self,
+        session: requests.Session,
+        url: str,
+        section: str,
+        file_name: str,
+        size: int = None,
+        api: str = None,
     ):
         """Downloads the given file url to a provided Section folder
 
@@ -133,6 +511,8 @@ class Downloader:
             url (str): URL/URI of the exact location of the file to download
             section (str): Section Name to place file within (Can be a path-like string eg. ``'foo/bar'``)
             file_name (str): Name to be used for the file
+            size (int): Size of the file in bytes if provided by the API
+            api (str): [URI] nickname the file belongs to, see ``save_file``
 
         Returns:
             (int): 0 if successful, or -1 if a problem occurs
@@ -146,27 +526,105 @@ class Downloader:
         if os.path.exists(
             filepath.joinpath(file_name)
         ):  # no point in downloading what we already have
-            logging.debug(f"File {file_name} already exists - Skipping")
+            logging.debug("File %s already exists - Skipping", file_name)
             return 1
-        else:
-            os.makedirs(filepath, exist_ok=True)
-        # TODO api broken atm
-        # if self.USER and self.API:
-        #     result = session.get(url, stream=True, auth=(self.USER, self.API))
-        # else:
-        result = session.get(url, stream=True)
-        if result.status_code == 200:
-            with open(filepath.joinpath(file_name), "wb") as f:
+        if self.save_file(session, url, filepath.joinpath(file_name), size, api):
+            return file_name
+        return -1
+
+    def save_file(
+        self,
+        session: requests.Session,
+        url: str,
+        path,
+        size: int = None,
+        api: str = None,
+    ) -> bool:
+        """Downloads the given file url to an exact path
+
+        The file is written to ``<path>.part`` and renamed to ``path`` once complete, so an interrupted
+        download never leaves a truncated file behind. An existing ``.part`` file is resumed with a
+        ``Range`` request if the server supports it (Otherwise the download restarts).
+
+        Args:
+            session (requests.Session): A user-agent created by the backend script for web handling
+            url (str): URL/URI of the exact location of the file to download
+            path (pathlib.PurePath): Location to write the file to (Parent folders are created)
+            size (int): Size of the file in bytes as reported by the API, used to check the file is complete
+            api (str): [URI] nickname the file belongs to - requests go through its backend, counting
+                failures against its circuit breaker (``session`` is used directly if not provided)
+
+        Returns:
+            bool: True if the file was downloaded completely
+
+        Raises:
+            requests.RequestException: Connection failed after all retries, or the API's breaker is open
+        """
+        os.makedirs(pathlib.PurePath(path).parent, exist_ok=True)
+        part = f"{path}.part"
+        for _ in range(2):  # A rejected resume is retried once from the start
+            expected = size
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            if api:
+                result = self.backends[api].get(url, stream=True, headers=headers)
+            else:
+                result = backend.throttled_get(
+                    session, url, self.limiter, self.retry, stream=True, headers=headers
+                )
+            if result.status_code == 416:  # Range not satisfiable - .part is invalid
+                result.close()
+                if size and offset == size:
+                    break  # .part already contains the whole file
+                logging.debug("Could not resume %s - Restarting download", part)
+                os.remove(part)
+                continue
+            if result.status_code not in (200, 206):
+                logging.error(
+                    f"Error downloading {url} [Status Code: {result.status_code}]"
+                )
+                # DEBUG to file
+                return False
+            if result.status_code == 200:
+                offset = 0  # Server ignored the Range header
+            elif offset:
+                logging.debug("Resuming %s from %s bytes", part, offset)
+
+            if not expected and "Content-Encoding" not in result.headers:
+                if "/" in (total := result.headers.get("Content-Range", "")):
+                    expected = int(total.split("/")[-1]) if total[-1] != "*" else None
+                elif "Content-Length" in result.headers:
+                    expected = offset + int(result.headers["Content-Length"])
+            # Time spent in writes, the rest of the loop waits on the network
+            writing = 0.0
+            with open(part, "ab" if offset else "wb") as f:
                 for chunk in result.iter_content(chunk_size=8192):
+                    start = time.perf_counter()
                     f.write(chunk)
-            logging.debug(f"Downloaded {file_name} to {filepath.joinpath(file_name)}")
-            return file_name
+                    writing += time.perf_counter() - start
+            self.metrics.observe("disk_write_seconds", writing, api=api or "")
+            self.metrics.inc(
+                "bytes_total", os.path.getsize(part) - offset, api=api or ""
+            )
+            break
         else:
+            return False
+
+        written = os.path.getsize(part)
+        if expected and written > expected:
             logging.error(
-                f"Error downloading {file_name} [Status Code: {result.status_code}]"
+                f"Download of {url} is larger than expected ({written} of {expected} bytes) - Removing"
             )
-            # DEBUG to file
-            return -1
+            os.remove(part)
+            return False
+        elif expected and written < expected:
+            logging.error(
+                f"Incomplete download of {url} ({written} of {expected} bytes) - Will resume on next run"
+            )
+            return False
+        os.replace(part, path)
+        logging.debug("Downloaded %s to %s", url, path)
+        return True
 
     # TODO: tags are not yet checked for boorus - eventually add support once api support is done
     # TODO: update variables used in the function to take global class variables where available
@@ -183,185 +641,602 @@ class Downloader:
         """
         # TODO check tag validity
 
-        # Sections stuff
-        max_time = section.days * 86400  # seconds
-        min_faves = section.min_faves
-        min_score = section.min_score
-
-        package = self.package
-
         # 'Telemetry'
         start = datetime.now().timestamp()
+
+        # Most selective tags of every sub-query are sent, the others are checked locally
+        # The booru also drops posts outside the section's days and min_faves where supported
+        limit, strict = self.tag_limit(url, endpoint)
+        # Ratings a single search cannot cover are searched once each (See planner.rating_searches)
+        adapter = self.adapters.get(url)
+        ratings = planner.rating_searches(
+            section.rating, adapter.name if adapter else endpoint, adapter is not None
+        )
+        if len(ratings) > 1:
+            logging.info(
+                f"Searching API {url} once per rating ({', '.join(section.rating)}) [{section.name}]"
+            )
+        # Strict limits keep a place for the rating searched (Negated ratings drop few posts)
+        reserved = 1 if strict and ratings[0] and ratings[0][0][0] != "-" else 0
+        plans = [
+            self.plan_search(section, url, endpoint, tags, limit - reserved)
+            for tags in section.queries or [section.tags]
+        ]
+        searches = [search for search in plans for _ in ratings]
+        packages = [
+            self.section_package(
+                section,
+                endpoint,
+                search.tags,
+                now=start if self.config.search_filters else None,
+                limit=limit,
+                strict=strict,
+                rating=rating,
+            )
+            for search in plans
+            for rating in ratings
+        ]
+        package = packages[0]
+
+        # Sections stuff - compiled once, checked for every post
+        # Tags of several sub-queries are checked on the posts of each sub-query instead (See query_pages)
+        search = plans[0] if len(plans) == 1 else planner.Plan([])
+        post_filter = filters.SectionFilter(
+            section,
+            self.blacklist,
+            now=start,
+            required=search.required,
+            excluded=search.excluded,
+        )
+        # Per-post messages are only formatted if they will be logged
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
         last_id = 100000000  # arbitrarily big number
         total_posts = 0
         searched_posts = 0
         skipped_files = 0
         loop = 1  # loop tracking
+        pending = set()  # downloads queued on the worker pool
+        failed_files = 0
+        result = 0
 
-        # Main function loop
-        while last_id > 1:
-            # TODO api needs to be fixed
-            # if self.USER and self.API:
-            #     current_batch = backend.request_uri(
-            #         self.session,
-            #         self.config.paths[url]["POST_URI"],
-            #         package,
-            #         (self.USER, self.API),
-            #     )
-            #     current_batch = current_batch.json()["posts"]
-            #
-            # else:
-            current_batch = backend.request_uri(
-                self.session, self.config.paths[url]["POST_URI"], package
-            ).json()
-            if len(current_batch) > 0:
-                if type(current_batch) == dict:
-                    current_batch = current_batch["posts"]
-            else:
+        # Stop at the newest post checked by the previous complete search (Unless running a full search)
+        # Keyed by the whole query of the section, as the tags sent may change with the tag counts
+        query = self.section_query(section)
+        watermark = (
+            0
+            if self.full
+            else self.index.watermark(section.name, url, query, section.days)
+        )
+        # Posts may still reach min_score/min_faves for a while, so the watermark only moves past older posts
+        settled = start - self.config.watermark_settle_days * 86400
+        newest_id = 0  # Newest post checked that is older than settled
+        # Whether every post down to the days limit/watermark was checked
+        complete = False
+
+        # Backfills of many posts search several ranges of post IDs at once (See plan_shards)
+        shards = []
+        if not watermark and self.config.backfill_shards > 1 and len(packages) == 1:
+            try:
+                shards = self.plan_shards(url, package, section, post_filter.cutoff)
+            except backend.TagLimitError:
+                pass  # The search is rejected as well, and planned again with less tags below
+            except requests.RequestException as e:
                 logging.warning(
-                    f"No Data for API {url} - Perhaps the requirements are too high"
+                    f"Could not split the search of API {url} into shards ({e}) - Searching with one cursor"
                 )
-                return 1
 
-            for post in current_batch:
-                searched_posts += 1
-                # Simple profiling setup
-                post_start = time.time()
+        if len(packages) > 1:
+            # Sub-queries (And ratings) are searched at the same time and merged newest first, so posts found by
+            # several sub-queries are checked once and the days/watermark still end the search at the first
+            # older post
+            pages = pipeline.Merge(
+                [
+                    self.query_pages(
+                        url,
+                        query_package,
+                        section.name,
+                        filters.QueryFilter(query.required, query.excluded)
+                        if len(plans) > 1
+                        else filters.QueryFilter(),
+                    )
+                    for query, query_package in zip(searches, packages)
+                ],
+                key=lambda post: post.id,
+                size=int(package.get("limit") or 100),
+                depth=self.config.prefetch_pages,
+                name=f"booru-dl-queries-{url}",
+            )
+        elif shards:
+            pages = pipeline.Interleave(
+                [
+                    self.iter_pages(url, shard, section.name, post_filter.cutoff)
+                    for shard in shards
+                ],
+                self.config.prefetch_pages,
+                name=f"booru-dl-shards-{url}",
+            )
+        else:
+            pages = pipeline.Prefetch(
+                self.iter_pages(url, package, section.name),
+                self.config.prefetch_pages,
+                name=f"booru-dl-pages-{url}",
+            )
 
-                # Attempt collection of post attributes - skip post if issues
-                try:
-                    last_id = post_id = self.collect_post_id(post)
-                    file_ext, file = self.collect_post_file(post, post_id)
-                    tags = self.collect_post_tags(post, post_id)
-                except AssertionError:
-                    continue
+        # Main function loop - the next page(s) are requested while the current one is processed
+        # Requests that keep failing (After retries) stop the search, files already queued still finish
+        try:
+            with pages:
+                for current_batch in pages:
+                    if len(current_batch) == 0:
+                        logging.warning(
+                            f"No Data for API {url} - Perhaps the requirements are too high"
+                        )
+                        result = 1
+                        break
 
-                if file_ext not in section.allowed_types:
-                    logging.debug(
-                        f"Post {post_id} was skipped due to being extension "
-                        f"[{file_ext}] (Not in allowed extensions)"
-                    )
-                    continue
+                    # Counted in locals and recorded once per page, synchronous downloads are not filtering
+                    page_start = time.perf_counter()
+                    fetching = 0.0
+                    accepted = filtered = known = 0
+                    for post in current_batch:
+                        searched_posts += 1
 
-                # Collect post score
-                score = 0
-                if "score" in post and type(post["score"]) == int:
-                    score = post["score"]
-                else:  # "score" in post and type(post["score"]) == dict:
-                    score = post["score"]["total"]
+                        last_id = post_id = post.id
+                        if post.created_ts <= settled:
+                            newest_id = max(newest_id, post_id)
+                        if post_id <= watermark:
+                            logging.info(
+                                f"Reached posts checked by a previous search (Post {watermark}) - "
+                                f"Use --full to search all {section.days} days"
+                            )
+                            last_id = 0
+                            break
 
-                faves = post["fav_count"] if "fav_count" in post else 0
-                rating = post["rating"]
+                        # Check for invalid files
+                        if post_filter.expired(post.created_ts):  # invalid time
+                            last_id = 0
+                            break
+                        if not post_filter.accepts(post):
+                            filtered += 1
+                            if debug:
+                                logging.debug(
+                                    "Post %s was skipped due to %s",
+                                    post_id,
+                                    post_filter.reason(post),
+                                )
+                            continue
 
-                # TODO refactor time to separate function to support multiple APIs
-                try:
-                    post_time = datetime.fromisoformat(post["created_at"]).timestamp()
-                except ValueError:
-                    post_time = time.mktime(
-                        time.strptime(post["created_at"], "%a %b %d %H:%M:%S %z %Y")
+                        if self.index.contains(url, post_id, section.name):
+                            if debug:
+                                logging.debug(
+                                    "Post %s already downloaded - Skipping", post_id
+                                )
+                            skipped_files += 1
+                            known += 1
+                            continue
+
+                        # Download the file if not blacklisted and stuff
+                        accepted += 1
+                        if self.workers > 1:
+                            # File fetches run on the worker pool, each host keeps its own rate limit
+                            pending.add(
+                                self.executor.submit(
+                                    self.fetch_post, section.name, url, post
+                                )
+                            )
+                            continue
+                        fetch_start = time.perf_counter()
+                        file_name = self.fetch_post(section.name, url, post)
+                        fetching += time.perf_counter() - fetch_start
+                        if file_name == 1:
+                            skipped_files += 1
+                            continue
+                        elif file_name == -1:
+                            failed_files += 1
+                            continue
+
+                        total_posts += 1  # If reach here post was acquired
+
+                    self.metrics.observe(
+                        "filter_seconds",
+                        time.perf_counter() - page_start - fetching,
+                        section=section.name,
+                        api=url,
                     )
+                    for name, count in (
+                        ("accepted", accepted),
+                        ("filtered", filtered),
+                        ("known", known),
+                    ):
+                        if count:
+                            self.metrics.inc(
+                                "posts_total",
+                                count,
+                                section=section.name,
+                                api=url,
+                                result=name,
+                            )
 
-                    # TODO refactor all checks to separate function - also re-add min_score test
-                # Check for invalid files
-                if start - post_time > max_time:  # invalid time
-                    # print(f'Debug: Too low time {post_id}')
-                    last_id = 0
-                    break
-                if rating not in section.rating:
-                    # print(f'Debug: Rating wrong {post_id}')
-                    continue
-                if faves < min_faves:  # invalid favcount
-                    logging.debug(
-                        f"Post {post_id} has {faves} favorites "
-                        f"(Lower than criteria of {min_faves}) - Skipping file"
+                    # Keep at most one page of downloads queued ahead of the next API page
+                    downloaded, skipped, failed = self.collect_downloads(
+                        pending, limit=len(current_batch)
                     )
-                    continue
+                    total_posts += downloaded
+                    skipped_files += skipped
+                    failed_files += failed
 
-                if score < min_score:  # invalid score
+                    # TODO Add info on which URI is being searched - add support for multiple api searches
+                    #  simultaneously this will require multiprocessing and refactor of code body of function
+                    #  to a parameterized function
+                    if searched_posts > 0 and len(current_batch) > 0:
+                        logging.info(
+                            f"API Search {loop} - {total_posts} Downloaded / {skipped_files} "
+                            f"Already Downloaded ({100 * ((total_posts + skipped_files) / searched_posts):.2f}% "
+                            f"posts collected from search)]"
+                        )
+                    # If less than 10% of files are touched after 5 or more loops (wasted effort)
+                    if (
+                        searched_posts > 0
+                        and (100 * ((total_posts + skipped_files) / searched_posts))
+                        < 10
+                        and loop >= 5
+                    ):
+                        logging.error(
+                            f"Limited posts were downloaded after {loop} search loops - "
+                            f"Please ensure your configuration is reasonable to prevent wasted searches"
+                        )
+                        break
                     logging.debug(
-                        f"Post {post_id} has {score} score "
-                        f"(Lower than criteria of {min_score}) - Skipping file"
+                        f"{total_posts + skipped_files} Files collected (or cached); {searched_posts} Searched"
                     )
-                    continue
-                # Check if any blacklisted tags exist, and if so skip
-                blacklisted = False
-                for tag in tags:  # invalid tags
-                    if tag in self.blacklist:
-                        # A tag can be blacklist-ignored per section
-                        # but will iterate through all tags to ensure there aren't any actual blacklisted ones
-                        if len(section.ignore_tags) > 0 and tag in section.ignore_tags:
-                            logging.debug(
-                                f'Ignored blacklisted tag "{tag}" for post {post_id}, '
-                                f'due to section "{section.name}" settings'
-                            )
-                        else:
-                            logging.debug(
-                                f'Found blacklisted tag "{tag}" for post {post_id} - Skipping file'
-                            )
-                            blacklisted = True
-                            break  # skip file
-                if blacklisted:
-                    continue
-
-                # TODO refactor this to use the function to obtain file url for multi endpoints
-                # Download the file if not blacklisted and stuff
-                file_name = self.download_file(
-                    self.session, file, f"{section.name}/{url}", str(post_id)
-                )  # 3rd argument is file name (optional)
-                if file_name == 1:
-                    skipped_files += 1
-                    continue
-
-                # TODO add support for determination of status code errors related to
-                #  too many requests and update timing based on error
-                # Check timing and ensure 2 requests a second compliance
-                post_finish = time.time()
-                post_timing = post_finish - post_start
-                if post_timing < 0.5:
-                    # print(f'sleeping for a little more ({0.5-post_timing})') - removed due to how many times it occurs
-                    sleep(0.5 - post_timing)
-
-                total_posts += 1  # If reach here post was acquired
-
-            # TODO Add info on which URI is being searched - add support for multiple api searches simultaneously
-            #  this will require multiprocessing and refactor of code body of function to a parameterized function
-            if searched_posts > 0 and len(current_batch) > 0:
-                logging.info(
-                    f"API Search {loop} - {total_posts} Downloaded / {skipped_files} Already Downloaded "
-                    f"({100 * ((total_posts + skipped_files) / searched_posts):.2f}% posts collected from search)]"
+                    if last_id == 0:
+                        logging.info(
+                            f"Downloaded all valid posts for the given days ({section.days})"
+                        )
+                        complete = True
+                        break
+                    # Reached end of possible images to download (See iter_pages)
+                    loop += 1
+                else:
+                    complete = True
+        except backend.TagLimitError as e:
+            # Searched again with less tags if rejected before any post was checked (Others checked locally)
+            if searched_posts or url in self.tag_limits:
+                logging.error(
+                    f'Search of API {url} failed for "{section.name}" - {type(e).__name__}: {e}'
                 )
-            # If less than 10% of files are touched after 5 or more loops (wasted effort)
+                result = 1
+            else:
+                logging.warning(
+                    f"API {url} rejected a search for its tags ({e}) - Searching "
+                    f"{planner.MIN_TAG_LIMIT} tags in all and checking the others locally"
+                )
+                self.tag_limits[url] = planner.MIN_TAG_LIMIT
+                return self.get_posts(section, url, endpoint)
+        except requests.RequestException as e:
+            logging.error(
+                f'Search of API {url} stopped for "{section.name}" - {type(e).__name__}: {e}'
+            )
+            result = 1
+        downloaded, skipped, failed = self.collect_downloads(pending)
+        total_posts += downloaded
+        skipped_files += skipped
+        failed_files += failed
+
+        # Failed downloads are retried by the next search, so the watermark is only moved by clean searches
+        if complete and not failed_files and newest_id > watermark:
+            self.index.set_watermark(section.name, url, query, newest_id, section.days)
+        with self.progress_lock:
+            self.progress["downloaded"] += total_posts
+            self.progress["skipped"] += skipped_files
+        end = time.time()
+        logging.info(
+            f"All done! {total_posts} Downloaded / {skipped_files} Already Downloaded - "
+            f'Execution took {end - start:.2f} seconds for "{section.name}" [API {url}]'
+        )
+        return result
+
+    def iter_pages(
+        self, url: str, package: dict, section: str = "", cutoff: float = None
+    ):
+        """Pages through the search results of an API
+
+        Each page continues from the lowest post ID of the previous one (See ``backend.next_page``), with as
+        many posts per page as the API returns (See ``posts.PostAdapter.page_limit``). Paging stops at a page
+        containing less posts than requested (End of available posts) or once the caller stops iterating.
+
+        Args:
+            url (str): [URI] nickname of the API to search
+            package (dict): Search package from ``section_package``, updated in-place with the page cursor
+            section (str): Section name the search is for (Labels its metrics)
+            cutoff (float): Timestamp of the oldest posts searched for - if provided, older posts are dropped,
+                paging stops at the first of them and pages without posts are skipped (Used by shards, whose
+                pages are mixed with the pages of other shards - See ``plan_shards``)
+
+        Yields:
+            list of posts.Post: Posts of each page, parsed by the API's adapter (See ``posts.detect``)
+        """
+        api_type = self.URI[url][2]
+        while True:
+            limit = int(package.get("limit") or 0)
+            current_batch, raw_count, last_id = self.request_page(url, package, section)
+            expired = (
+                cutoff is not None
+                and bool(current_batch)
+                and current_batch[-1].created_ts < cutoff
+            )
+            if expired:
+                current_batch = [
+                    post for post in current_batch if post.created_ts >= cutoff
+                ]
+            if current_batch or (
+                not raw_count and cutoff is None
+            ):  # Pages of only unusable posts are skipped
+                yield current_batch
             if (
-                searched_posts > 0
-                and (100 * ((total_posts + skipped_files) / searched_posts)) < 10
-                and loop >= 5
+                expired
+                or raw_count == 0
+                or raw_count < limit
+                or last_id is None
+                or last_id <= 1
             ):
-                logging.error(
-                    f"Limited posts were downloaded after {loop} search loops - "
-                    f"Please ensure your configuration is reasonable to prevent wasted searches"
+                return
+            adapter = self.adapters.get(url)
+            backend.next_page(
+                package, api_type, last_id, adapter.page_limit if adapter else None
+            )
+
+    def query_pages(
+        self,
+        url: str,
+        package: dict,
+        section: str,
+        query_filter: filters.QueryFilter,
+    ):
+        """Pages through the search results of a sub-query, dropping posts without its tags checked locally
+
+        Args:
+            url (str): [URI] nickname of the API to search
+            package (dict): Search package of the sub-query (See ``iter_pages``)
+            section (str): Section name the search is for (Labels its metrics)
+            query_filter (filters.QueryFilter): Tags of the sub-query that were not sent to the API
+
+        Yields:
+            list of posts.Post: Posts of each page matching the sub-query
+        """
+        if not query_filter:
+            yield from self.iter_pages(url, package, section)
+            return
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        for page in self.iter_pages(url, package, section):
+            batch = [post for post in page if query_filter.accepts(post)]
+            if len(batch) < len(page):
+                self.metrics.inc(
+                    "posts_total",
+                    len(page) - len(batch),
+                    section=section,
+                    api=url,
+                    result="filtered",
                 )
+                if debug:
+                    for post in page:
+                        if not query_filter.accepts(post):
+                            logging.debug(
+                                "Post %s was skipped due to %s",
+                                post.id,
+                                query_filter.reason(post),
+                            )
+            yield batch
+
+    def plan_shards(
+        self, url: str, package: dict, section: cfg.Section, cutoff: float
+    ) -> List[dict]:
+        """Splits a backfill into ranges of post IDs searched at the same time (See :doc:`sharding`)
+
+        Shard bounds are chosen from a few probe pages of ``sharding.PROBE_LIMIT`` posts, so every shard holds
+        about the same amount of posts.
+
+        Args:
+            url (str): [URI] nickname of the API to search
+            package (dict): Search package from ``section_package``
+            section (cfg.Section): Section to search for
+            cutoff (float): Timestamp of the oldest posts searched for
+
+        Returns:
+            list of dict: Search package of each shard, newest posts first - empty if the search holds too few
+            posts to be split
+
+        Raises:
+            requests.RequestException: A probe failed
+        """
+        api_type = self.URI[url][2]
+
+        def probe(before_id: Optional[int]):
+            probe_package = dict(package, limit=sharding.PROBE_LIMIT)
+            if before_id is not None:
+                backend.next_page(probe_package, api_type, before_id)
+            return self.request_page(url, probe_package, section.name)
+
+        newest, raw_count, last_id = probe(None)
+        if (
+            raw_count < sharding.PROBE_LIMIT
+            or not newest
+            or newest[-1].created_ts < cutoff
+        ):
+            return []
+        top = newest[0].id
+        # Posts expected from the time the newest posts took to be posted, each shard searches a few pages
+        span = newest[0].created_ts - newest[-1].created_ts
+        expected = (
+            raw_count * (newest[0].created_ts - cutoff) / span
+            if span > 0
+            else float("inf")
+        )
+        shards = min(
+            self.config.backfill_shards,
+            int(expected // (self.adapters[url].page_limit * sharding.SHARD_PAGES)),
+        )
+        if shards < 2:
+            return []
+
+        # Post ID at the start of the section's days, refined by probing around its estimate
+        samples = [(post.id, post.created_ts) for post in newest]
+        low = 0
+        for _ in range(sharding.REFINE_PROBES):
+            high = min(post_id for post_id, created in samples if created >= cutoff)
+            guess = sharding.estimate_id(samples, cutoff)
+            if not low < guess < high:
+                guess = (low + high) // 2
+            if guess <= low:
                 break
-            logging.debug(
-                f"{total_posts + skipped_files} Files collected (or cached); {searched_posts} Searched"
+            found, count, _ = probe(guess)
+            samples += [(post.id, post.created_ts) for post in found]
+            if not found or found[0].created_ts < cutoff:
+                low = guess
+            elif found[-1].created_ts < cutoff or count < sharding.PROBE_LIMIT:
+                break  # The oldest post of the section's days is known
+        bottom = min(max(sharding.estimate_id(samples, cutoff), low), top)
+
+        # Posts per post ID along the range, measured by probes spread across it
+        densities = [
+            (
+                top + 1,
+                sharding.density(
+                    top + 1, raw_count, last_id, sharding.PROBE_LIMIT, bottom
+                ),
             )
-            if last_id == 0:
-                logging.info(
-                    f"Downloaded all valid posts for the given days ({section.days})"
+        ]
+        for number in range(shards * 2 - 1, 0, -1):
+            point = bottom + (top - bottom) * number // (shards * 2)
+            _, count, oldest = probe(point)
+            densities.append(
+                (
+                    point,
+                    sharding.density(
+                        point, count, oldest, sharding.PROBE_LIMIT, bottom
+                    ),
                 )
-                break
-            # Reached end of possible images to download
-            if (
-                len(current_batch) < 20
-            ):  # assume minimum size of 20 - TODO per-api check of return amount
-                break
-            else:
-                loop += 1
-                package["page"] = f"b{last_id}"
-        end = time.time()
+            )
+        bounds = sharding.shard_bounds(densities, bottom, top, shards)
+        if not bounds:
+            return []
         logging.info(
-            f'All done! Execution took {end - start:.2f} seconds for "{section.name}" [API {url}]'
+            f"Searching API {url} for {section.name} in {len(bounds) + 1} ranges of post IDs "
+            f"(Split at {', '.join(str(bound) for bound in bounds)})"
         )
-        return 0
+        return [
+            backend.range_package(package, api_type, low=lower, high=upper)
+            for upper, lower in zip([None] + bounds, bounds + [None])
+        ]
+
+    def request_page(self, url: str, package: dict, section: str = ""):
+        """Requests a single page of search results and parses its posts
+
+        With ``stream_pages`` enabled, posts are parsed while the page is received so only one raw post
+        is held at a time, otherwise the whole page is decoded at once (See :doc:`streaming`).
+
+        Args:
+            url (str): [URI] nickname of the API to search
+            package (dict): Search package from ``section_package``
+            section (str): Section name the search is for (Labels its metrics)
+
+        Returns:
+            tuple: Usable posts (list of posts.Post), amount of posts on the page (Including unusable
+            posts) and ID of the last post on the page (None if unknown)
+
+        Raises:
+            requests.RequestException: The request failed or the page is not valid JSON
+        """
+        stream = self.config.stream_pages
+        api_type = self.URI[url][2]
+        adapter = self.adapters.get(url)
+        current_batch = []
+        raw_count = 0
+        raw = None
+        # Authenticated with the [URI] user name and API key if provided, unchanged pages come from the cache
+        start = time.perf_counter()
+        chunks = self.backends[url].request_page(
+            self.config.paths[url]["POST_URI"], package, stream=stream
+        )
+        received = time.perf_counter()
+        self.metrics.observe(
+            "api_request_seconds", received - start, section=section, api=url
+        )
+        self.metrics.inc("pages_total", section=section, api=url)
+        try:
+            if stream:
+                raw_posts = streaming.PostStream(chunks)
+            else:
+                data = streaming.loads(b"".join(chunks))
+                raw_posts = posts.PostAdapter.unwrap(data)
+            for raw in raw_posts:
+                raw_count += 1
+                if (
+                    adapter is None
+                ):  # Chosen once per API, from the first post it returns
+                    if stream:
+                        container = raw_posts.container
+                    else:
+                        container = (
+                            "posts"
+                            if isinstance(data, dict) and "posts" in data
+                            else None
+                        )
+                    adapter = self.adapters[url] = posts.detect(
+                        raw, api_type, container
+                    )
+                    logging.debug(f"Parsing posts of API {url} as {adapter.name}")
+                post = adapter.parse(raw)
+                if post is not None:
+                    current_batch.append(post)
+            # Reads anything after the posts so the whole page can be cached
+            for _ in chunks:
+                pass
+        except ValueError as e:
+            raise requests.RequestException(f"Invalid page from API {url} ({e})")
+        finally:
+            chunks.close()
+            self.metrics.observe(
+                "page_parse_seconds",
+                time.perf_counter() - received,
+                section=section,
+                api=url,
+            )
+        try:
+            last_id = int(raw["id"])
+        except (KeyError, TypeError, ValueError):
+            last_id = None
+        return current_batch, raw_count, last_id
+
+    @staticmethod
+    def collect_downloads(futures: set, limit: int = 0):
+        """Waits on queued downloads until at most ``limit`` of them are still running
+
+        Args:
+            futures (set): Pending ``download_file`` futures, finished futures are removed in-place
+            limit (int): Amount of downloads allowed to remain queued
+
+        Returns:
+            tuple of int: Amount of files downloaded, skipped (Already downloaded) and failed
+        """
+        downloaded = 0
+        skipped = 0
+        failed = 0
+        while futures:
+            done = {future for future in futures if future.done()}
+            if not done and len(futures) > limit:
+                done = wait(futures, return_when=FIRST_COMPLETED)[0]
+            if not done:
+                break
+            futures -= done
+            for future in done:
+                if (file_name := future.result()) == 1:
+                    skipped += 1
+                elif file_name == -1:
+                    failed += 1
+                else:
+                    downloaded += 1
+        return downloaded, skipped, failed
 
     def collect_key(self, expected_types: list, post: dict, id=None):
         """Collect post keys based on expected types
@@ -526,8 +1401,6 @@ class Downloader:
 
 
 if __name__ == "__main__":
-    logger = backend.set_logger(logging.getLogger(), "booru-dl.log")
-    # Main entrypoint
-    downloader = Downloader()
-    downloader.get_data()
-    os.system("pause")  # Warn: Windows only
+    from booru_dl.__main__ import main
+
+    raise SystemExit(main())
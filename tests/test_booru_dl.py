@@ -164,10 +164,11 @@ def test_bad_download(download_file):
     """Sends a bad file to downloader"""
     if download_file.config.paths["test_uri"]:
         result = download_file.download_file(
-            download_file.session,
+            download_file.backends["test_uri"].session,
             f'{download_file.config.paths["test_uri"]["POST_URI"]}/bad_download.png',
             "Bad Data",
             "bad_download",
+            api="test_uri",
         )
         assert result == -1
         path = download_file.path / "downloads/Bad Data/"
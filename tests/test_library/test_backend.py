@@ -1,5 +1,6 @@
 import logging
 import os
+from datetime import datetime, timezone
 
 import pytest
 import requests
@@ -26,6 +27,23 @@ def test_set_logger():
     assert type(logger) == logging.Logger
 
 
+@pytest.mark.parametrize(
+    "booru_api, expected",
+    [
+        ("danbooru", "cat score:>=5 date:>=2021-06-27 favcount:>=10"),
+        ("gelbooru", "cat score:>=5"),  # No date or favcount meta tags
+    ],
+)
+def test_format_package_filters(booru_api, expected):
+    """Days and favorites are sent as meta tags where supported (Dates a day early for time zones)"""
+    after = datetime(2021, 6, 28, 13, 0, tzinfo=timezone.utc).timestamp()
+    package = backend.format_package(
+        ["cat", "score:>=5"], 100, booru_api, after=after, min_faves=10
+    )
+    assert package["tags"] == expected
+    assert backend.format_package(["cat"], 100, booru_api, min_faves=0)["tags"] == "cat"
+
+
 def test_get_session(collect_config):
     """Checks to make sure its the expected useragent and a proper session is created from it"""
     assert "Booru" in collect_config.useragent
@@ -97,11 +115,13 @@ def test_request_uri_bad_tags(provide_package_data, get_session):
         provide_package_data[1]["tags"] = (
             provide_package_data[1]["tags"] + " filler_tag1 filler_tag2"
         )
-        backend.request_uri(
-            get_session,
-            provide_package_data[0].paths["test_0"]["POST_URI"],
-            provide_package_data[1],
-        )
+        # Rejected searches are no longer cut to 2 tags, leaving tags unchecked (See Downloader.get_posts)
+        with pytest.raises(backend.TagLimitError):
+            backend.request_uri(
+                get_session,
+                provide_package_data[0].paths["test_0"]["POST_URI"],
+                provide_package_data[1],
+            )
 
 
 def test_request_uri_success_no_package(provide_package_data, get_session):
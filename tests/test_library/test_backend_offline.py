@@ -0,0 +1,244 @@
+"""Offline tests of backend (See test_backend.py for the tests requesting real boorus)"""
+import email.utils
+import gzip
+import io
+import logging
+import threading
+import time
+
+import pytest
+import requests
+
+from booru_dl.library import backend
+
+
+def make_response(status_code: int, retry_after: str = None) -> requests.Response:
+    """Creates an offline response for rate limiter checks"""
+    response = requests.Response()
+    response.status_code = status_code
+    response.raw = io.BytesIO()
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return response
+
+
+def test_token_bucket_burst():
+    """Burst requests are immediate, the next one waits for a token to refill"""
+    bucket = backend.TokenBucket(rate=20, burst=3)
+    assert sum(bucket.acquire() for _ in range(3)) == 0
+    assert 0 < bucket.acquire() <= 0.06
+
+
+def test_token_bucket_penalize():
+    """Penalties block the bucket and slow down the rate until rewarded"""
+    bucket = backend.TokenBucket(rate=20, burst=1)
+    assert bucket.penalize(0.1) == 0.1
+    assert bucket.rate == 10
+    assert bucket.acquire() >= 0.09
+    bucket.reward()
+    assert bucket.rate == 11 and bucket.penalties == 0
+
+
+@pytest.mark.parametrize(
+    "retry_after, expected",
+    [("5", 5.0), ("-5", 0.0), ("not a date", None), (None, None)],
+)
+def test_parse_retry_after(retry_after, expected):
+    assert backend.parse_retry_after(make_response(429, retry_after)) == expected
+
+
+def test_parse_retry_after_date():
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 < backend.parse_retry_after(make_response(503, date)) <= 30
+
+
+def test_rate_limiter_hosts():
+    """Buckets are keyed by host, unknown hosts receive the default rate"""
+    limiter = backend.RateLimiter(rate=5, burst=5)
+    limiter.configure("https://Booru.example/", 1, 2)
+    assert limiter.bucket("https://booru.example/posts.json").burst == 2
+    assert limiter.bucket("https://cdn.booru.example/file.png").rate == 5
+    assert limiter.update("https://booru.example/posts.json", make_response(429, "0"))
+    assert not limiter.update("https://booru.example/posts.json", make_response(200))
+
+
+def test_rate_limiter_metrics():
+    """Waits are recorded by host"""
+    from booru_dl.library import metrics
+
+    registry = metrics.Metrics()
+    limiter = backend.RateLimiter(rate=100, burst=1, metrics=registry)
+    for _ in range(3):
+        limiter.acquire("https://booru.example/posts.json")
+    histogram = registry.histograms[
+        ("rate_limit_wait_seconds", (("host", "booru.example"),))
+    ]
+    assert histogram.count == 3 and histogram.sum > 0.01
+
+
+def test_backend_session():
+    """Each backend owns a session with its own user-agent, auth and connection pool"""
+    limiter = backend.RateLimiter()
+    booru = backend.Backend(
+        "test",
+        "https://booru.example",
+        "danbooru",
+        "test_user",
+        "test_api",
+        limiter,
+        12,
+    )
+    anonymous = backend.Backend("test_2", "https://booru.example", "danbooru")
+    assert booru.auth == ("test_user", "test_api") and anonymous.auth is None
+    assert "test_user" in booru.session.headers["User-Agent"]
+    assert "unknown" in anonymous.session.headers["User-Agent"]
+    assert "gzip" in booru.session.headers["Accept-Encoding"]
+    assert booru.session.get_adapter("https://booru.example")._pool_maxsize == 12
+    assert booru.session is not anonymous.session
+
+
+class QueuedSession:
+    """Offline session returning (or raising) queued results in order"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_retry_policy_delay():
+    """Delays double every attempt up to the maximum, jitter only shortens them"""
+    policy = backend.RetryPolicy(retries=5, backoff=1, backoff_max=4, jitter=0)
+    assert [policy.delay(attempt) for attempt in range(4)] == [1, 2, 4, 4]
+    policy = backend.RetryPolicy(backoff=2, jitter=0.5)
+    assert all(1 <= policy.delay(0) <= 2 for _ in range(50))
+
+
+def test_throttled_get_retries():
+    """Temporary failures are retried until a response succeeds"""
+    retry = backend.RetryPolicy(retries=3, backoff=0.01)
+    session = QueuedSession(
+        requests.ConnectionError(), make_response(502), make_response(200)
+    )
+    assert backend.throttled_get(session, "https://booru.example", retry=retry).ok
+    assert session.calls == 3
+
+    # Other failures are returned immediately, temporary ones once retries run out
+    session = QueuedSession(make_response(404))
+    assert backend.throttled_get(session, "", retry=retry).status_code == 404
+    session = QueuedSession(*[make_response(500)] * 4)
+    assert backend.throttled_get(session, "", retry=retry).status_code == 500
+    assert session.calls == 4
+    with pytest.raises(requests.ConnectionError):
+        backend.throttled_get(
+            QueuedSession(requests.ConnectionError()),
+            "",
+            retry=backend.RetryPolicy(retries=0),
+        )
+
+
+def test_circuit_breaker():
+    """Breakers open after repeated failures and close again after the cooldown and a success"""
+    breaker = backend.CircuitBreaker(threshold=2, cooldown=0.05)
+    assert not breaker.failure() and not breaker.is_open
+    assert breaker.failure() and breaker.is_open
+    assert not breaker.failure()  # Already open
+    time.sleep(0.06)
+    assert not breaker.is_open
+    breaker.success()
+    assert breaker.failures == 0 and not breaker.failure()
+
+
+def test_backend_circuit_breaker():
+    """Backends refuse requests while their breaker is open"""
+    booru = backend.Backend(
+        "test",
+        "https://booru.example",
+        "danbooru",
+        retry=backend.RetryPolicy(retries=0),
+        breaker=backend.CircuitBreaker(threshold=2, cooldown=60),
+    )
+    booru.session = QueuedSession(make_response(502), requests.ConnectionError())
+    assert booru.get("https://booru.example/file.png").status_code == 502
+    with pytest.raises(requests.ConnectionError):
+        booru.request_uri("https://booru.example/posts.json", {"tags": "cat"})
+    with pytest.raises(backend.CircuitOpenError):
+        booru.get("https://booru.example/file.png")
+    assert booru.session.calls == 2
+
+
+def test_determine_apis(monkeypatch):
+    """Sites are probed at the same time, each of them once"""
+    calls = []
+    probing = threading.Barrier(
+        2, timeout=5
+    )  # Broken unless both sites are probed at once
+
+    def determine_api(api):
+        calls.append(api)
+        probing.wait()
+        return "danbooru"
+
+    monkeypatch.setattr(backend, "determine_api", determine_api)
+    result = backend.determine_apis(
+        ["https://a.example", "https://b.example", "https://a.example"]
+    )
+    assert result == {"https://a.example": "danbooru", "https://b.example": "danbooru"}
+    assert sorted(calls) == ["https://a.example", "https://b.example"]
+
+
+def test_set_logger_rotation(tmp_path):
+    """Every run starts a new log file, rotated ones are compressed and only the newest are kept"""
+    name = str(tmp_path / "booru-dl.log")
+    for run in range(3):
+        logger = backend.set_logger(
+            logging.getLogger(f"Rotation Check {run}"), name, 1024, 1, True
+        )
+        logger.propagate = False
+        for line in range(40):
+            logger.debug("Run %d line %d", run, line)
+        handler = logger.handlers[-1]
+        handler.listener.stop()  # Writes the queued records
+        logger.removeHandler(handler)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "booru-dl.log",
+        "booru-dl.log.1.gz",
+    ]
+    with open(name) as file:
+        assert "Run 2 line 39" in file.read()
+    with gzip.open(f"{name}.1.gz", "rt") as file:
+        assert "Run 2 line" in file.read()  # Rotated while written
+
+
+def test_next_page():
+    """Danbooru style sites page with b<id> cursors, Gelbooru style sites keep page=dapi and use id:<<id>"""
+    package = backend.format_package(["cat"], 10000000, "danbooru")
+    backend.next_page(package, "danbooru", 500, 320)
+    assert package["page"] == "b500" and package["limit"] == 320
+
+    package = backend.format_package(["cat", "dog"], 10000000, "gelbooru")
+    assert package["limit"] == 1000
+    backend.next_page(package, "gelbooru", 500)
+    backend.next_page(package, "gelbooru", 300)
+    assert package["page"] == "dapi"
+    assert package["tags"] == "cat dog id:<300"
+    assert package["limit"] == 1000
+
+
+def test_range_package():
+    """Ranges start below their upper bound and end at an id:>= tag, leaving the original package as is"""
+    package = backend.format_package(["cat"], 10000000, "danbooru")
+    shard = backend.range_package(package, "danbooru", low=100, high=500)
+    assert shard["page"] == "b500" and shard["tags"] == "cat id:>=100"
+    assert package["page"] == "b10000000" and package["tags"] == "cat"
+    assert backend.range_package(package, "danbooru", high=500)["tags"] == "cat"
+
+    package = backend.format_package(["cat"], 10000000, "gelbooru")
+    shard = backend.range_package(package, "gelbooru", low=100, high=500)
+    assert shard["page"] == "dapi" and shard["tags"] == "cat id:<500 id:>=100"
@@ -0,0 +1,116 @@
+import io
+import random
+import time
+
+import requests
+
+from booru_dl.library import backend, cache
+
+PAGE = b'[{"id": 2, "tags": "cat"}, {"id": 1, "tags": "dog"}]' * 2000
+
+
+def make_response(status_code: int, body: bytes = b"", **headers) -> requests.Response:
+    """Creates an offline response with a body and headers"""
+    response = requests.Response()
+    response.status_code = status_code
+    response.raw = io.BytesIO(body)
+    response.url = "https://booru.example/posts.json?tags=cat"
+    response.headers.update(headers)
+    return response
+
+
+class RecordingSession:
+    """Offline session returning queued responses and recording the headers of each request"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.headers = []
+
+    def get(self, url, **kwargs):
+        self.headers.append(kwargs.get("headers") or {})
+        return self.responses.pop(0)
+
+
+def test_key():
+    key = cache.PageCache.key(
+        "https://booru.example/posts.json", {"tags": "cat", "page": "b10"}
+    )
+    assert key == cache.PageCache.key(
+        "https://booru.example/posts.json", {"tags": "cat", "page": "b10"}
+    )
+    assert key != cache.PageCache.key(
+        "https://booru.example/posts.json", {"tags": "cat", "page": "b20"}
+    )
+    assert key != cache.PageCache.key(
+        "https://booru.example/posts.json", {"tags": "cat", "page": "b10"}, "user"
+    )
+
+
+def test_store_and_read(tmp_path):
+    pages = cache.PageCache(tmp_path / "pages.sqlite")
+    assert pages.headers("key") == {}
+    response = make_response(
+        200, PAGE, ETag='"abc"', **{"Last-Modified": "Mon, 28 Jun 2021 13:37:41 GMT"}
+    )
+    assert b"".join(pages.store("key", response)) == PAGE
+    assert pages.headers("key") == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Mon, 28 Jun 2021 13:37:41 GMT",
+    }
+    assert 0 < pages.size < len(PAGE)
+    assert b"".join(pages.read("key")) == PAGE
+    assert pages.hits == 1
+    # Kept across runs
+    assert b"".join(cache.PageCache(tmp_path / "pages.sqlite").read("key")) == PAGE
+
+
+def test_store_skipped(tmp_path):
+    """Pages without validators, or not read to the end, are not stored"""
+    pages = cache.PageCache(tmp_path / "pages.sqlite")
+    assert b"".join(pages.store("plain", make_response(200, PAGE))) == PAGE
+    partial = pages.store("partial", make_response(200, PAGE, ETag='"abc"'))
+    next(partial)
+    partial.close()
+    assert pages.headers("plain") == pages.headers("partial") == {}
+    assert pages.size == 0
+
+
+def test_evict(tmp_path):
+    pages = cache.PageCache(tmp_path / "pages.sqlite", max_size=1024**2, max_age=3600)
+    for number in range(3):
+        body = random.Random(number).randbytes(256 * 1024 * (number + 1))
+        b"".join(pages.store(str(number), make_response(200, body, ETag=f'"{number}"')))
+    # Least recently requested pages are removed once larger than max_size
+    assert pages.headers("0") == pages.headers("1") == {}
+    assert pages.headers("2") == {"If-None-Match": '"2"'}
+    assert pages.size <= pages.max_size
+
+    pages.connection.execute("UPDATE pages SET checked_at = ?", (time.time() - 7200,))
+    pages.evict()
+    assert pages.headers("2") == {}
+    assert pages.size == 0
+
+
+def test_backend_request_page(tmp_path):
+    """Cached pages are requested conditionally and read from the cache if not modified"""
+    booru = backend.Backend(
+        "test",
+        "https://booru.example",
+        "danbooru",
+        retry=backend.RetryPolicy(retries=0),
+        cache=cache.PageCache(tmp_path / "pages.sqlite"),
+    )
+    booru.session = RecordingSession(
+        make_response(200, PAGE, ETag='"abc"'),
+        make_response(304, ETag='"abc"'),
+        make_response(200, PAGE[::-1], ETag='"def"'),
+    )
+    for expected in (PAGE, PAGE, PAGE[::-1]):
+        chunks = booru.request_page("https://booru.example/posts.json", {"tags": "cat"})
+        assert b"".join(chunks) == expected
+    assert booru.session.headers == [
+        {},
+        {"If-None-Match": '"abc"'},
+        {"If-None-Match": '"abc"'},
+    ]
+    assert booru.cache.hits == 1
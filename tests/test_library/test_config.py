@@ -122,6 +122,7 @@ def test__parse_config(collect_config):
     collect_config._parse_config()  # force re-parse of config file
     assert "NEW_SECTION" in collect_config.posts
     assert collect_config.posts["NEW_SECTION"].tags == ["pikachu", "cute"]
+    assert collect_config.posts["NEW_SECTION"].queries == [["pikachu", "cute"]]
 
 
 def test__parse_config_changed_default(collect_config):
@@ -0,0 +1,99 @@
+"""Offline tests of config (See test_config.py for the tests needing the urls of real boorus)"""
+import pytest
+
+from booru_dl.library import config
+
+
+@pytest.fixture
+def make_config(tmp_path, monkeypatch):
+    """Creates a Config from the given ini text, without sections left by other tests"""
+    monkeypatch.setattr(config.Config, "posts", {})
+
+    def make(text: str) -> config.Config:
+        ini = tmp_path / "test.ini"
+        ini.write_text(text)
+        return config.Config(str(ini))
+
+    return make
+
+
+def test__parse_config_rate_limits(make_config, caplog):
+    """Rates that are not above 0 (Or not numbers) are ignored with a warning, like unknown URIs"""
+    result = make_config(
+        "[URI]\n"
+        "one = https://one.example, danbooru\n"
+        "two = https://two.example, danbooru\n"
+        "three = https://three.example, danbooru\n"
+        "four = https://four.example, danbooru\n"
+        "[Rate Limits]\n"
+        "one = 5, 10\n"
+        "two = 0, 2\n"
+        "three = -1\n"
+        "four = fast\n"
+        "default = 0.5\n"
+        "five = 2\n"
+    )
+    assert result.rate_limits == {"one": (5.0, 10), "default": (0.5, 1)}
+    warnings = [
+        record.message for record in caplog.records if "[Rate Limits]" in record.message
+    ]
+    assert len(warnings) == 4
+    assert any(
+        "invalid rate limit fast for URI four" in message for message in warnings
+    )
+
+
+def test__determine_api_types(tmp_path, monkeypatch):
+    """API types are probed once per URI and reused from the cache on later runs"""
+    probed = []
+
+    def determine_apis(uris):
+        probed.append(uris)
+        return {uri: "None" if "broken" in uri else "danbooru" for uri in uris}
+
+    monkeypatch.setattr(config.backend, "determine_apis", determine_apis)
+    ini = tmp_path / "test.ini"
+    ini.write_text(
+        "[URI]\n"
+        "first = https://first.example\n"
+        "second = https://first.example\n"
+        "broken = https://broken.example\n"
+        "typed = https://typed.example, gelbooru\n"
+    )
+    result = config.Config(str(ini))
+    assert [result.uri[uri][2] for uri in result.uri] == [
+        "danbooru",
+        "danbooru",
+        "None",
+        "gelbooru",
+    ]
+    assert probed == [
+        ["https://first.example", "https://first.example", "https://broken.example"]
+    ]
+
+    # Undetermined APIs are probed again, determined ones come from the cache until they expire
+    config.Config(str(ini))
+    assert probed[1] == ["https://broken.example"]
+    with open(ini, "a") as file:
+        file.write("[Other]\napi_cache_days = 0\n")
+    config.Config(str(ini))
+    assert probed[2] == [
+        "https://first.example",
+        "https://first.example",
+        "https://broken.example",
+    ]
+
+
+def test__parse_config_queries(make_config):
+    """Sub-queries of a section are separated by |, the first is kept as the section's tags"""
+    result = make_config(
+        "[URI]\n"
+        "one = https://one.example, danbooru\n"
+        "[Default]\n"
+        "days = 30\n"
+        "[Cats]\n"
+        "tags = cat | kitten | feline, -dog\n"
+    )
+    section = result.posts["Cats"]
+    assert section.queries == [["cat"], ["kitten"], ["feline", "-dog"]]
+    assert section.tags == ["cat"]
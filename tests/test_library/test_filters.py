@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from booru_dl.library import config, filters, posts
+
+
+@pytest.fixture
+def section():
+    section = config.Section()
+    section.name = "Dog"
+    section.days = 2
+    section.rating = ["s", "q"]
+    section.min_score = 10
+    section.min_faves = 5
+    section.tags = ["dog"]
+    section.ignore_tags = ["canine"]
+    section.allowed_types = ["png", "jpg"]
+    section.api_endpoint = ["e621"]
+    return section
+
+
+def test_compile(section):
+    post_filter = filters.SectionFilter(section, ["cat", "canine", ""], now=1000000.0)
+    assert post_filter.blacklist == frozenset(["cat"])
+    assert post_filter.ratings == frozenset(["s", "q"])
+    assert post_filter.cutoff == 1000000.0 - 2 * 86400
+
+
+@pytest.mark.parametrize(
+    "post, reason",
+    [
+        (("png", "s", 10, 5, ["dog", "canine"], 0), None),
+        (("gif", "s", 10, 5, ["dog"], 0), "extension"),
+        (("png", "e", 10, 5, ["dog"], 0), "rating"),
+        (("png", "s", 9, 5, ["dog"], 0), "score"),
+        (("png", "s", 10, 4, ["dog"], 0), "favorites"),
+        (("png", "s", 10, 5, ["dog", "cat"], 0), "blacklisted"),
+        (("png", "s", 10, 5, ["dog"], -3 * 86400), "older"),
+    ],
+)
+def test_accepts(section, post, reason):
+    now = time.time()
+    post_filter = filters.SectionFilter(section, ["cat", "canine"], now=now)
+    ext, rating, score, favs, tags, age = post
+    post = posts.Post(
+        1, None, ext, "", " ".join(tags), score, favs, rating, now + age, None
+    )
+    assert post_filter.accepts(post) == (reason is None)
+    if reason is None:
+        assert post_filter.reason(post) is None
+    else:
+        assert reason in post_filter.reason(post)
+    assert post_filter.expired(post.created_ts) == (reason == "older")
+
+
+@pytest.mark.parametrize(
+    "tags, reason",
+    [
+        (["dog", "solo", "outside"], None),
+        (["dog", "outside"], 'missing tag "solo"'),
+        (["dog", "solo", "outside", "cat"], "blacklisted"),
+        (["dog", "solo", "outside", "leash"], 'blacklisted tag "leash"'),
+    ],
+)
+def test_accepts_planned_tags(section, tags, reason):
+    """Tags not sent to the booru are checked locally"""
+    post_filter = filters.SectionFilter(
+        section, ["cat"], required=["solo", "outside"], excluded=["leash"]
+    )
+    post = posts.Post(1, None, "png", "", " ".join(tags), 10, 5, "s", time.time(), None)
+    assert post_filter.accepts(post) == (reason is None)
+    if reason is None:
+        assert post_filter.reason(post) is None
+    else:
+        assert reason in post_filter.reason(post)
+
+
+@pytest.mark.parametrize(
+    "tags, reason",
+    [
+        (["cat", "solo"], None),
+        (["cat"], 'missing tag "solo"'),
+        (["cat", "solo", "dog"], 'excluded tag "dog"'),
+    ],
+)
+def test_query_filter(tags, reason):
+    """Sub-queries check their own tags that were not sent to the booru"""
+    query_filter = filters.QueryFilter(required=["solo"], excluded=["dog"])
+    post = posts.Post(1, None, "png", "", " ".join(tags), 10, 5, "s", time.time(), None)
+    assert query_filter
+    assert query_filter.accepts(post) == (reason is None)
+    assert query_filter.reason(post) == reason
+    assert not filters.QueryFilter()
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from booru_dl.library import index
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    """Downloads folder containing files from a previous run"""
+    folder = tmp_path / "downloads"
+    (folder / "Dog" / "e621").mkdir(parents=True)
+    (folder / "Main Test" / "Cat" / "danbooru").mkdir(parents=True)
+    (folder / "Dog" / "e621" / "100.png").write_bytes(b"1234")
+    (folder / "Dog" / "e621" / "101.webm.part").write_bytes(b"12")
+    (folder / "Dog" / "e621" / "notes.txt").write_bytes(b"")
+    (folder / "Main Test" / "Cat" / "danbooru" / "7.jpg").write_bytes(b"1")
+    return folder
+
+
+def test_import_downloads(tmp_path, downloads):
+    result = index.DownloadIndex(tmp_path / "index.sqlite", downloads)
+    assert result.contains("e621", 100, "Dog")
+    assert result.contains("danbooru", 7, "Main Test/Cat")
+    assert not result.lookup("e621", 101)
+    result.close()
+
+    # Import only happens once
+    os.remove(downloads / "Dog" / "e621" / "100.png")
+    assert index.DownloadIndex(tmp_path / "index.sqlite", downloads).contains(
+        "e621", 100, "Dog"
+    )
+
+
+def test_record_batches(tmp_path, downloads):
+    result = index.DownloadIndex(tmp_path / "index.sqlite", downloads, batch_size=2)
+    result.record("e621", 5, "Dog", "downloads/Dog/e621/5.png", "abc", 10)
+    assert result.contains("e621", 5, "Dog") and len(result.pending) == 1
+    result.record("e621", 5, "Canine", "downloads/Canine/e621/5.png", "abc", 10)
+    assert not result.pending  # Batch written
+
+    reopened = index.DownloadIndex(tmp_path / "index.sqlite", downloads)
+    assert set(reopened.lookup("e621", 5)) == {"Dog", "Canine"}
+
+
+def test_watermark(tmp_path, downloads):
+    result = index.DownloadIndex(tmp_path / "index.sqlite", downloads)
+    assert result.watermark("Dog", "e621", "dog score:>=20", 20) == 0
+    result.set_watermark("Dog", "e621", "dog score:>=20", 5000, 20)
+    assert result.watermark("Dog", "e621", "dog score:>=20", 20) == 5000
+    assert result.watermark("Dog", "e621", "dog score:>=20", 10) == 5000
+    # Searching more days than the previous search covered requires a full search
+    assert result.watermark("Dog", "e621", "dog score:>=20", 30) == 0
+    assert result.watermark("Dog", "e621", "dog score:>=50", 20) == 0
+
+
+def test_tag_count(tmp_path, downloads):
+    result = index.DownloadIndex(tmp_path / "index.sqlite", downloads)
+    assert result.tag_count("e621", "dog", 86400) is None
+    result.set_tag_count("e621", "dog", 5000)
+    assert result.tag_count("e621", "dog", 86400) == 5000
+    assert result.tag_count("danbooru", "dog", 86400) is None
+    result.connection.execute("UPDATE tag_counts SET checked_at = 0")
+    assert result.tag_count("e621", "dog", 86400) is None  # Too old
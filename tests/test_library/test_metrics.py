@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from booru_dl.library import metrics
+
+
+def test_histogram_buckets():
+    histogram = metrics.Histogram()
+    for value in (0.0005, 0.001, 0.3, 100.0):
+        histogram.observe(value)
+    assert histogram.counts[0] == 2  # Bucket bounds are inclusive
+    assert histogram.counts[metrics.BUCKETS.index(0.5)] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.count == 4 and histogram.max == 100.0
+    assert histogram.sum == pytest.approx(100.3015)
+
+
+def test_histogram_quantile():
+    histogram = metrics.Histogram()
+    assert histogram.quantile(0.5) == 0.0
+    for _ in range(100):
+        histogram.observe(0.2)
+    # Interpolated within the (0.1, 0.25] bucket, never above the maximum
+    assert 0.1 < histogram.quantile(0.5) <= 0.2
+    assert histogram.quantile(0.99) == 0.2
+
+
+def test_counters_and_totals():
+    registry = metrics.Metrics()
+    registry.inc("pages_total", section="Cats", api="e621")
+    registry.inc("pages_total", section="Cats", api="e621")
+    registry.inc("pages_total", api="e621", section="Dogs")
+    registry.inc("bytes_total", 2048, api="e621")
+    with registry.time("api_request_seconds", section="Cats", api="e621"):
+        pass
+    assert (
+        registry.counters[("pages_total", (("api", "e621"), ("section", "Cats")))] == 2
+    )
+    totals = registry.totals()
+    assert totals["pages_total"] == 3 and totals["bytes_total"] == 2048
+    assert 0 <= totals["api_request_seconds"] < 1
+
+
+def test_prometheus():
+    registry = metrics.Metrics()
+    registry.inc("files_total", section='Say "Cheese"\\', result="downloaded")
+    registry.observe("disk_write_seconds", 0.003, api="e621")
+    text = registry.prometheus()
+    assert "# TYPE booru_dl_files_total counter\n" in text
+    assert (
+        'booru_dl_files_total{result="downloaded",section="Say \\"Cheese\\"\\\\"} 1\n'
+        in text
+    )
+    assert "# TYPE booru_dl_disk_write_seconds histogram\n" in text
+    assert 'booru_dl_disk_write_seconds_bucket{api="e621",le="0.0025"} 0\n' in text
+    assert 'booru_dl_disk_write_seconds_bucket{api="e621",le="0.005"} 1\n' in text
+    assert 'booru_dl_disk_write_seconds_bucket{api="e621",le="+Inf"} 1\n' in text
+    assert 'booru_dl_disk_write_seconds_count{api="e621"} 1\n' in text
+
+
+def test_write_summary(tmp_path):
+    registry = metrics.Metrics()
+    registry.observe("filter_seconds", 0.02, section="Cats", api="e621")
+    path = tmp_path / "metrics" / "summary.json"
+    registry.write_summary(str(path))
+    summary = json.loads(path.read_text())
+    assert summary["totals"] == {"filter_seconds": 0.02}
+    assert summary["histograms"][0]["labels"] == {"section": "Cats", "api": "e621"}
+    assert summary["histograms"][0]["max_seconds"] == 0.02
+    assert not (tmp_path / "metrics" / "summary.json.tmp").exists()
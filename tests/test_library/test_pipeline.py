@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from booru_dl.library import pipeline
+
+
+def counting_pages(produced: list, amount: int = 10):
+    """Generator recording each page produced"""
+    for page in range(amount):
+        produced.append(page)
+        yield page
+
+
+@pytest.mark.parametrize("depth", [0, 1, 3])
+def test_prefetch_order(depth):
+    with pipeline.Prefetch(range(50), depth) as items:
+        assert list(items) == list(range(50))
+
+
+def test_prefetch_bounded():
+    """Producer is only allowed to run ``depth`` items (+1 in progress) ahead"""
+    produced = []
+    with pipeline.Prefetch(counting_pages(produced), depth=2) as items:
+        iterator = iter(items)
+        assert next(iterator) == 0
+        time.sleep(0.2)
+        assert len(produced) <= 4
+
+
+def test_prefetch_close_stops_producer():
+    produced = []
+    prefetch = pipeline.Prefetch(counting_pages(produced, 1000), depth=1)
+    for item in prefetch:
+        if item == 2:
+            break
+    prefetch.close()
+    assert not prefetch.thread.is_alive()
+    assert len(produced) < 10
+
+
+def test_prefetch_raises_producer_error():
+    def broken():
+        yield 1
+        raise ValueError("Broken page")
+
+    with pipeline.Prefetch(broken(), depth=2) as items:
+        with pytest.raises(ValueError):
+            list(items)
+
+
+def test_interleave():
+    """Every item of every iterable is produced once, each iterable in its own order"""
+    iterables = [range(0, 50), range(100, 130), range(200, 200)]
+    with pipeline.Interleave(iterables, depth=2) as items:
+        result = list(items)
+    assert sorted(result) == list(range(0, 50)) + list(range(100, 130))
+    assert [item for item in result if item < 100] == list(range(0, 50))
+    assert [item for item in result if item >= 100] == list(range(100, 130))
+
+
+def test_interleave_close_stops_producers():
+    produced = [[], []]
+    interleave = pipeline.Interleave(
+        [counting_pages(produced[0], 1000), counting_pages(produced[1], 1000)], depth=1
+    )
+    for number, _ in enumerate(interleave):
+        if number == 2:
+            break
+    interleave.close()
+    assert not any(thread.is_alive() for thread in interleave.threads)
+    assert all(len(pages) < 10 for pages in produced)
+
+
+def test_interleave_raises_producer_error():
+    def broken():
+        yield 1
+        raise ValueError("Broken page")
+
+    with pipeline.Interleave([range(1000), broken()], depth=2) as items:
+        with pytest.raises(ValueError):
+            list(items)
+
+
+def test_merge():
+    """Pages of every source are merged by descending key, items of several sources are kept once"""
+    sources = [
+        [[10, 8], [5, 1]],
+        [[9, 8, 7], [2]],
+        [[8], [1]],
+        [],
+    ]
+    with pipeline.Merge(sources, key=lambda item: item, size=3) as pages:
+        assert list(pages) == [[10, 9, 8], [7, 5, 2], [1]]
+
+
+def test_merge_empty():
+    """A search without any item still yields an (empty) page"""
+    with pipeline.Merge([[], [[]]], key=lambda item: item, size=3) as pages:
+        assert list(pages) == [[]]
+
+
+def test_merge_close_stops_producers():
+    produced = [[], []]
+    merge = pipeline.Merge(
+        [
+            ([-page] for page in counting_pages(produced[0], 1000)),
+            ([-page] for page in counting_pages(produced[1], 1000)),
+        ],
+        key=lambda item: item,
+        size=1,
+        depth=1,
+    )
+    for page in merge:
+        if page == [-2]:
+            break
+    merge.close()
+    assert not any(source.thread.is_alive() for source in merge.sources)
+    assert all(len(pages) < 10 for pages in produced)
@@ -0,0 +1,113 @@
+import io
+
+import pytest
+import requests
+
+from booru_dl.library import backend, planner
+
+COUNTS = {"cat": 900000, "outside": 300000, "cute": 4000, "solo": 20000}
+
+
+def count(tag):
+    return COUNTS.get(tag)
+
+
+def test_plan_fits():
+    """Sections within the limit are sent as-is, without collecting counts"""
+    search = planner.plan(["cat", "-dog", ""], 4, lambda tag: pytest.fail(tag))
+    assert search.tags == ["cat", "-dog"]
+    assert not search.required and not search.excluded
+
+
+def test_plan_selective():
+    search = planner.plan(["cat", "outside", "cute", "solo", "-dog"], 2, count)
+    assert search.tags == ["cute", "solo"]
+    assert search.required == {"outside", "cat"}
+    assert search.excluded == {"dog"}
+
+
+def test_plan_excluded_after_included():
+    search = planner.plan(["-dog", "cat", "-wolf", "cute", "solo"], 4, count)
+    assert search.tags == ["cat", "cute", "solo", "-dog"]  # Every included tag fits
+    assert search.excluded == {"wolf"} and not search.required
+
+
+def test_plan_unknown_and_meta():
+    """Meta tags are always sent, tags without a count are ranked last"""
+    search = planner.plan(["unknown", "cat", "cute", "order:score", "fav*"], 3, count)
+    assert search.tags == ["order:score", "fav*", "cute"]
+    assert search.required == {"cat", "unknown"}
+
+
+@pytest.mark.parametrize(
+    "ratings, booru, detected, expected",
+    [
+        (["s"], "danbooru", False, [["rating:s"]]),
+        (["e", "e"], "danbooru", False, [["rating:e"]]),
+        (["s", "q", "e"], "danbooru", False, [["-rating:g"]]),
+        (["g", "s", "q"], "danbooru", False, [["-rating:e"]]),
+        (["g", "s", "q", "e"], "danbooru", False, [[]]),
+        # Danbooru and e621 share a booru type, only Danbooru searches several ratings at once
+        (["s", "q"], "danbooru", False, [["rating:s"], ["rating:q"]]),
+        (["s", "q"], "danbooru", True, [["rating:s,q"]]),
+        (["s", "q"], "e621", True, [["-rating:e"]]),
+        (["s"], "gelbooru", False, [["rating:s"]]),
+        (["g", "e"], "gelbooru", True, [["rating:g"], ["rating:e"]]),
+        (["s", "q"], "unknown", False, [[]]),
+    ],
+)
+def test_rating_searches(ratings, booru, detected, expected):
+    assert planner.rating_searches(ratings, booru, detected) == expected
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        ([{"name": "cat", "post_count": 12}], 12),
+        ([{"name": "cats", "post_count": 12}], None),
+        ({"tags": []}, None),
+        ({"@attributes": {"count": 1}, "tag": [{"name": "cat", "count": "7"}]}, 7),
+        ([{"name": "cat", "count": 3}], 3),
+        ("not a tag", None),
+    ],
+)
+def test_parse_count(data, expected):
+    assert planner.parse_count(data, "cat") == expected
+
+
+class TagSession:
+    """Offline session answering tag requests"""
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.params = []
+
+    def get(self, url, **kwargs):
+        self.params.append(kwargs["params"])
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.raw = io.BytesIO(self.body)
+        return response
+
+
+@pytest.mark.parametrize(
+    "api_type, status_code, body, expected",
+    [
+        ("danbooru", 200, b'[{"name": "cat", "post_count": 5}]', 5),
+        ("danbooru", 404, b"", None),
+        ("danbooru", 200, b"<html>", None),
+        ("gelbooru", 200, b'{"tag": [{"name": "cat", "count": 8}]}', 8),
+    ],
+)
+def test_fetch_count(api_type, status_code, body, expected):
+    booru = backend.Backend(
+        "test",
+        "https://booru.example",
+        api_type,
+        retry=backend.RetryPolicy(retries=0),
+    )
+    booru.session = TagSession(status_code, body)
+    assert planner.fetch_count(booru, "https://booru.example/tags", "cat") == expected
+    assert "cat" in booru.session.params[0].values()
+    assert booru.breaker.failures == 0  # Missing tags do not count as API failures
@@ -0,0 +1,101 @@
+import pytest
+
+from booru_dl.library import posts
+
+DANBOORU = {
+    "id": 10,
+    "created_at": "2021-06-28T13:37:41.123-04:00",
+    "score": 25,
+    "fav_count": 7,
+    "rating": "s",
+    "md5": "abcdef",
+    "file_ext": "png",
+    "file_url": "https://cdn.booru.example/abcdef.png",
+    "file_size": 100,
+    "tag_string": "cat solo",
+}
+E621 = {
+    "id": 11,
+    "created_at": "2021-06-28T13:37:41.123-04:00",
+    "score": {"up": 30, "down": -5, "total": 25},
+    "fav_count": 7,
+    "rating": "s",
+    "file": {
+        "url": "https://static.booru.example/abcdef.png",
+        "ext": "png",
+        "md5": "abcdef",
+        "size": 100,
+    },
+    "tags": {"general": ["cat", "solo"], "species": ["felid"], "artist": []},
+}
+GELBOORU = {
+    "id": 12,
+    "created_at": "Mon Jun 28 13:37:41 -0400 2021",
+    "score": 25,
+    "rating": "safe",
+    "md5": "abcdef",
+    "file_url": "https://img.booru.example/abcdef.png",
+    "tags": "cat solo",
+}
+
+
+@pytest.mark.parametrize(
+    "sample, api_type, container, adapter",
+    [
+        (DANBOORU, "danbooru", None, "danbooru"),
+        (E621, "danbooru", "posts", "e621"),
+        (E621, "danbooru", None, "e621"),
+        (GELBOORU, "gelbooru", "post", "gelbooru"),
+        (GELBOORU, "danbooru", None, "gelbooru"),
+    ],
+)
+def test_detect(sample, api_type, container, adapter):
+    assert posts.detect(sample, api_type, container).name == adapter
+
+
+@pytest.mark.parametrize(
+    "data", [[DANBOORU], {"posts": [E621]}, {"@attributes": {}, "post": [GELBOORU]}]
+)
+def test_unwrap(data):
+    assert len(posts.PostAdapter.unwrap(data)) == 1
+
+
+@pytest.mark.parametrize(
+    "adapter, raw",
+    [("danbooru", DANBOORU), ("e621", E621), ("gelbooru", GELBOORU)],
+)
+def test_parse(adapter, raw):
+    """Every shape normalizes to the same post"""
+    post = posts.ADAPTERS[adapter].parse(raw)
+    assert post.id == raw["id"]
+    assert (post.md5, post.ext, post.rating) == ("abcdef", "png", "s")
+    assert post.url.endswith("/abcdef.png")
+    assert {"cat", "solo"} <= set(post.tags.split())
+    assert (post.score, post.favs) == (25, 7 if adapter != "gelbooru" else 0)
+    assert post.created_ts == 1624901861.123 or post.created_ts == 1624901861
+    assert post.file_size == (100 if adapter != "gelbooru" else None)
+    assert not hasattr(post, "__dict__")
+
+
+def test_parse_unusable():
+    """Posts without a file or ID are dropped from the page"""
+    hidden = dict(DANBOORU, id=13)
+    del hidden["file_url"]
+    broken = dict(DANBOORU)
+    del broken["id"]
+    page = posts.ADAPTERS["danbooru"].parse_page([DANBOORU, hidden, broken])
+    assert [post.id for post in page] == [10]
+    hidden = dict(E621, file=dict(E621["file"], url=None))
+    assert posts.ADAPTERS["e621"].parse(hidden) is None
+
+
+def test_adapter_requires_convert():
+    """Adapters without convert fail when created, not on their first post"""
+
+    class Incomplete(posts.PostAdapter):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    with pytest.raises(TypeError):
+        posts.PostAdapter()
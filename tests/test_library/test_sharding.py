@@ -0,0 +1,45 @@
+import pytest
+
+from booru_dl.library import sharding
+
+
+def test_estimate_id():
+    """Post IDs are interpolated between the closest posts, or extrapolated along the oldest and newest"""
+    samples = [(1000, 1000.0), (900, 900.0), (500, 100.0)]
+    assert sharding.estimate_id(samples, 950.0) == 950
+    assert sharding.estimate_id(samples, 500.0) == 700
+    # 500 IDs over 900 seconds, continued past the oldest post
+    assert sharding.estimate_id(samples, -800.0) == 0 + 1
+    assert sharding.estimate_id(samples[:2], 0.0) == 1
+    assert sharding.estimate_id(samples[:2], 800.0) == 800
+    assert sharding.estimate_id([(5, 1.0)], 0.0) == 5
+    assert sharding.estimate_id([], 0.0) == 1
+
+
+def test_density():
+    # Full probe - 20 posts from ID 1000 down to 800
+    assert sharding.density(1000, 20, 800, 20, 0) == pytest.approx(0.1)
+    # Last posts of the search - 5 posts down to the lowest ID searched
+    assert sharding.density(1000, 5, 990, 20, 500) == pytest.approx(0.01)
+
+
+@pytest.mark.parametrize("shards", [2, 3, 4])
+def test_shard_bounds_even(shards):
+    """Evenly spread posts are cut into shards of the same size"""
+    bounds = sharding.shard_bounds([(1000, 0.5), (500, 0.5)], 0, 1000, shards)
+    assert bounds == [int(1000 - 1000 * number / shards) for number in range(1, shards)]
+
+
+def test_shard_bounds_density():
+    """Dense parts of the range are cut into smaller shards"""
+    # 900 posts from 1000 down to 900, 100 posts from 900 down to 0 - 250 posts per shard
+    bounds = sharding.shard_bounds([(1000, 9.0), (900, 1 / 9)], 0, 1000, 4)
+    assert bounds == [972, 944, 916]
+    bounds = sharding.shard_bounds([(1000, 9.0), (900, 1 / 9)], 0, 1000, 2)
+    assert bounds == [944]
+
+
+def test_shard_bounds_unmeasured():
+    assert sharding.shard_bounds([(1000, 0.0)], 0, 1000, 2) == [500]
+    assert sharding.shard_bounds([], 0, 1000, 4) == [750, 500, 250]
+    assert sharding.shard_bounds([(1000, 1.0)], 0, 2, 4) == [1]
@@ -0,0 +1,34 @@
+import os
+
+from booru_dl.library import storage
+
+
+def test_blob_path(tmp_path):
+    blobs = storage.BlobStore(tmp_path / ".blobs")
+    assert blobs.path("ABCDEF", "png") == tmp_path / ".blobs" / "ab" / "abcdef.png"
+    assert blobs.lock("abcdef") is blobs.lock("ABCDEF")
+
+
+def test_link(tmp_path):
+    blobs = storage.BlobStore(tmp_path / ".blobs")
+    blob = blobs.path("abcdef", "png")
+    os.makedirs(blob.parent)
+    with open(blob, "wb") as f:
+        f.write(b"data")
+    target = tmp_path / "Dog" / "e621" / "1.png"
+    assert blobs.link(blob, target) in ["hardlink", "symlink", "copy"]
+    assert target.read_bytes() == b"data"
+
+
+def test_link_replaces_target(tmp_path):
+    """Stale files and dangling symlinks at the target are replaced"""
+    source = tmp_path / "source.png"
+    source.write_bytes(b"data")
+    stale = tmp_path / "stale.png"
+    stale.write_bytes(b"old")
+    dangling = tmp_path / "dangling.png"
+    os.symlink(tmp_path / "removed.png", dangling)
+    for target in (stale, dangling):
+        storage.BlobStore.link(source, target)
+        assert target.read_bytes() == b"data"
+    assert not os.path.lexists(f"{stale}.link")
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from booru_dl.library import streaming
+
+POSTS = [
+    {
+        "id": 2,
+        "tags": "cat solo",
+        "score": -1.5e3,
+        "file_url": "https://booru.example/ü.png",
+    },
+    {"id": 1, "tags": "dog", "score": 25, "flags": {"deleted": False}, "pools": [1, 2]},
+]
+
+
+def chunks(data: bytes, size: int):
+    return [data[start : start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize(
+    "page, container",
+    [
+        (POSTS, None),
+        ({"posts": POSTS}, "posts"),
+        ({"@attributes": {"limit": 100, "count": 2}, "post": POSTS}, "post"),
+    ],
+)
+def test_post_stream(page, container):
+    data = json.dumps(page, indent=1, ensure_ascii=False).encode()
+    for size in range(1, len(data) + 1, 7):
+        stream = streaming.PostStream(chunks(data, size))
+        assert list(stream) == POSTS
+        assert stream.container == container
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"[]",
+        b" [ ] ",
+        b"{}",
+        b'{"posts": []}',
+        b'{"success": false, "message": "x"}',
+        b"",
+    ],
+)
+def test_post_stream_empty(data):
+    assert list(streaming.PostStream(chunks(data, 3))) == []
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"<html></html>",
+        b'[{"id": 1}',
+        b'[{"id": 1} {"id": 2}]',
+        b'{"posts": [{"id": }]}',
+    ],
+)
+def test_post_stream_invalid(data):
+    with pytest.raises(ValueError):
+        list(streaming.PostStream(chunks(data, 4)))
+
+
+def test_loads():
+    data = json.dumps({"posts": POSTS}).encode()
+    assert streaming.loads(data) == {"posts": POSTS}
+    assert streaming.loads(data.decode()) == {"posts": POSTS}
@@ -0,0 +1,481 @@
+"""Offline tests of the downloader (See test_booru_dl.py for the tests searching real boorus)"""
+import copy
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+import requests
+
+from booru_dl.library import config, planner, posts
+from booru_dl.main import Downloader
+
+CONFIG = """[URI]
+one = https://one.example, danbooru
+two = https://two.example, gelbooru
+[Default]
+days = 30
+ratings = s, q, e
+min_score = 0
+min_faves = 0
+allowed_types = jpg, png, gif
+[Blacklist]
+tags =
+[Other]
+workers = 1
+page_cache_size = 0
+retries = 0
+[Cats]
+tags = cat
+ignore_tags =
+api_endpoints = one
+"""
+
+
+def run_python(code: str) -> str:
+    """Runs code in a new interpreter (Nothing imported yet) and collects its output"""
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+
+
+def test_import_lazy():
+    """Importing the package loads neither the downloader nor its dependencies, which never load cloudscraper"""
+    output = run_python(
+        "import sys\n"
+        "import booru_dl\n"
+        "print(*(name in sys.modules for name in ('requests', 'cloudscraper', 'booru_dl.main')))\n"
+        "booru_dl.Downloader\n"
+        "print('booru_dl.main' in sys.modules, 'cloudscraper' in sys.modules)\n"
+    ).split()
+    assert output == ["False", "False", "False", "True", "False"]
+
+
+def test_cli_help():
+    """``--help`` is answered before the downloader is imported"""
+    output = run_python(
+        "import sys\n"
+        "from booru_dl.__main__ import main\n"
+        "try:\n"
+        "    main(['--help'])\n"
+        "except SystemExit as e:\n"
+        "    print(e.code, 'requests' in sys.modules)\n"
+    )
+    assert "booru-dl" in output
+    assert output.split()[-2:] == ["0", "False"]
+
+
+@pytest.mark.parametrize(
+    "ratings, booru_type, tags, query",
+    [
+        (["s"], "danbooru", "cat dog score:>=5 rating:s", "cat dog score:>=5 rating:s"),
+        (
+            ["s", "q", "e"],
+            "danbooru",
+            "cat dog score:>=5 -rating:g",
+            "cat dog score:>=5",
+        ),
+        (["s"], "gelbooru", "cat dog", "cat dog score:>=5 rating:s"),
+    ],
+)
+def test_section_package(ratings, booru_type, tags, query):
+    """Multiple ratings are sent as one search, watermarks stay keyed as before"""
+    section = config.Section()
+    section.tags = ["cat", "dog"]
+    section.rating = ratings
+    section.min_score = 5
+    assert Downloader.section_package(section, booru_type)["tags"] == tags
+    assert Downloader.section_query(section) == query
+
+
+@pytest.mark.parametrize(
+    "tags, limit, filters",
+    [
+        (["cat", "dog"], None, ["favcount:>=10", "date:>=2021-06-27"]),
+        (["cat", "dog", "cute"], None, ["favcount:>=10"]),  # Room for one of them
+        (["cat", "dog", "cute", "solo"], None, []),
+        (["cat"], 2, ["favcount:>=10"]),
+    ],
+)
+def test_section_package_filters(tags, limit, filters):
+    """min_faves and days are only sent in the places the tags leave within the booru's tag limit"""
+    section = config.Section()
+    section.rating = ["s"]
+    section.min_score = 5
+    section.min_faves = 10
+    section.days = 1
+    now = datetime(2021, 6, 29, 13, 0, tzinfo=timezone.utc).timestamp()
+    package = Downloader.section_package(section, "danbooru", tags, now, limit)
+    sent = package["tags"].split(" ")
+    assert sent[: len(tags)] == tags
+    assert sorted(sent[len(tags) + 2 :]) == sorted(filters)
+
+
+def test_section_package_strict():
+    """Score and rating take places of a strict limit, rating first"""
+    section = config.Section()
+    section.rating = ["s"]
+    section.min_score = 5
+    section.min_faves = 10
+    section.days = 1
+
+    def tags(*args):
+        return Downloader.section_package(section, "danbooru", *args)["tags"]
+
+    assert tags(["cat", "dog"], time.time(), 2, True) == "cat dog"
+    assert tags(["cat"], time.time(), 2, True) == "cat rating:s"
+    assert tags(["cat"], None, 3, True) == "cat score:>=5 rating:s"
+    assert tags(["cat"], time.time(), 4, True).endswith(" rating:s favcount:>=10")
+    # Gelbooru counts them against its 2 tags, and searches ratings by name
+    package = Downloader.section_package(section, "gelbooru", ["cat"])
+    assert package["tags"] == "cat rating:s"
+
+
+def test_section_query_sub_queries():
+    """Sub-queries are joined by | in the watermark key"""
+    section = config.Section()
+    section.queries = [["cat"], ["kitten"], ["feline", "-dog"]]
+    section.tags = section.queries[0]
+    section.rating = ["s"]
+    section.min_score = 5
+    assert Downloader.section_query(section) == (
+        "cat | kitten | feline -dog score:>=5 rating:s"
+    )
+
+
+def make_response(status_code: int, body: bytes = b"", **headers) -> requests.Response:
+    """Creates an offline response with a body and headers"""
+    response = requests.Response()
+    response.status_code = status_code
+    response.raw = io.BytesIO(body)
+    response.headers.update(headers)
+    return response
+
+
+class FakeHost:
+    """Offline file host answering with queued responses (Or the file itself), recording every request"""
+
+    def __init__(self, files: dict = None, *responses: requests.Response):
+        self.files = files or {}
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, dict(headers or {})))
+        if self.responses:
+            return self.responses.pop(0)
+        body = self.files[url]
+        return make_response(200, body, **{"Content-Length": str(len(body))})
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    """Downloader in an empty folder, searching the offline URIs of ``CONFIG``"""
+    monkeypatch.chdir(tmp_path)
+    # Sections are collected into a dict shared by every Config, left filled by other tests
+    monkeypatch.setattr(config.Config, "posts", {})
+    (tmp_path / "config.ini").write_text(CONFIG)
+    result = Downloader("config.ini")
+    yield result
+    result.executor.shutdown()
+    result.index.close()
+
+
+def make_post(post_id: int, md5: str = "abcdef", data: bytes = b"data") -> posts.Post:
+    return posts.Post(
+        post_id,
+        md5,
+        "png",
+        f"https://one.example/data/{md5}.png",
+        "cat",
+        10,
+        0,
+        "s",
+        time.time(),
+        len(data),
+    )
+
+
+def test_fetch_post_same_md5(downloader, monkeypatch):
+    """A second post of an already stored file is hardlinked instead of downloaded again"""
+    host = FakeHost({"https://one.example/data/abcdef.png": b"data"})
+    monkeypatch.setattr(downloader.backends["one"], "get", host.get)
+    assert downloader.fetch_post("Cats", "one", make_post(1)) == "1.png"
+    assert downloader.fetch_post("Dogs", "one", make_post(2)) == "2.png"
+
+    assert len(host.requests) == 1
+    first = downloader.filepath.joinpath("Cats", "one", "1.png")
+    second = downloader.filepath.joinpath("Dogs", "one", "2.png")
+    assert os.path.samefile(first, second)
+    assert os.path.samefile(second, downloader.blobs.path("abcdef", "png"))
+    assert downloader.index.contains("one", 2, "Dogs")
+
+
+def test_fetch_post_existing_target(downloader, monkeypatch):
+    """A dangling symlink at the target is replaced, a target that cannot be written fails the post only"""
+    host = FakeHost({"https://one.example/data/abcdef.png": b"data"})
+    monkeypatch.setattr(downloader.backends["one"], "get", host.get)
+    target = downloader.filepath.joinpath("Cats", "one", "1.png")
+    os.makedirs(target.parent)
+    os.symlink(os.path.abspath("removed.png"), target)
+
+    assert downloader.fetch_post("Cats", "one", make_post(1)) == "1.png"
+    with open(target, "rb") as file:
+        assert file.read() == b"data"
+
+    def fail(source, target):
+        raise PermissionError(13, "Permission denied", target)
+
+    monkeypatch.setattr(downloader.blobs, "link", fail)
+    assert downloader.fetch_post("Cats", "one", make_post(2)) == -1
+    assert not downloader.index.contains("one", 2, "Cats")
+
+
+URL = "https://one.example/data/abcdef.png"
+
+
+def save(downloader, monkeypatch, host: FakeHost, size=4) -> bool:
+    monkeypatch.setattr(downloader.backends["one"], "get", host.get)
+    return downloader.save_file(None, URL, "file.png", size, "one")
+
+
+def test_save_file_resumes(downloader, monkeypatch):
+    """206 appends to the existing .part"""
+    with open("file.png.part", "wb") as file:
+        file.write(b"da")
+    host = FakeHost({}, make_response(206, b"ta", **{"Content-Range": "bytes 2-3/4"}))
+    assert save(downloader, monkeypatch, host)
+    assert host.requests[0][1] == {"Range": "bytes=2-"}
+    with open("file.png", "rb") as file:
+        assert file.read() == b"data"
+    assert not os.path.exists("file.png.part")
+
+
+def test_save_file_restarts(downloader, monkeypatch):
+    """200 (Range ignored by the server) restarts the file from zero"""
+    with open("file.png.part", "wb") as file:
+        file.write(b"xx")
+    assert save(downloader, monkeypatch, FakeHost({}, make_response(200, b"data")))
+    with open("file.png", "rb") as file:
+        assert file.read() == b"data"
+
+
+def test_save_file_complete_part(downloader, monkeypatch):
+    """416 for a .part of the expected size means it is already complete"""
+    with open("file.png.part", "wb") as file:
+        file.write(b"data")
+    host = FakeHost({}, make_response(416))
+    assert save(downloader, monkeypatch, host)
+    assert len(host.requests) == 1
+    with open("file.png", "rb") as file:
+        assert file.read() == b"data"
+
+
+def test_save_file_invalid_part(downloader, monkeypatch):
+    """416 for a .part of another size removes it and downloads the file again"""
+    with open("file.png.part", "wb") as file:
+        file.write(b"dat!!")
+    host = FakeHost({}, make_response(416), make_response(200, b"data"))
+    assert save(downloader, monkeypatch, host)
+    assert [headers for _, headers in host.requests] == [{"Range": "bytes=5-"}, {}]
+    with open("file.png", "rb") as file:
+        assert file.read() == b"data"
+
+
+@pytest.mark.parametrize(
+    "body, size, headers, part",
+    [
+        (b"da", 4, {}, True),  # Short - kept to resume
+        (b"data!!", 4, {}, False),  # Oversized - removed
+        (b"da", None, {"Content-Length": "4"}, True),  # Short of Content-Length
+    ],
+)
+def test_save_file_rejects_body(downloader, monkeypatch, body, size, headers, part):
+    """Bodies of another size than the API or Content-Length reported are never renamed into place"""
+    host = FakeHost({}, make_response(200, body, **headers))
+    assert not save(downloader, monkeypatch, host, size)
+    assert not os.path.exists("file.png")
+    assert os.path.exists("file.png.part") == part
+
+
+def test_get_data_lanes(downloader, monkeypatch):
+    """Each host runs its jobs in its own lane, a failing lane does not stop the other"""
+    cats = downloader.config.posts["Cats"]
+    cats.api_endpoint = ["one", "two"]
+    dogs = copy.copy(cats)
+    dogs.name = "Dogs"
+    downloader.config.posts["Dogs"] = dogs
+    ran = []
+
+    def get_posts(section, api, booru_type):
+        ran.append((section.name, api, threading.current_thread().name))
+        if api == "two" and section.name == "Cats":
+            raise RuntimeError("Broken search")
+        if api == "one":
+            time.sleep(0.05)  # Still running when the other lane fails
+        with downloader.progress_lock:
+            downloader.progress["downloaded"] += 2
+            downloader.progress["skipped"] += 1
+        return 1 if api == "two" else 0
+
+    monkeypatch.setattr(downloader, "get_posts", get_posts)
+    assert downloader.get_data() == 1
+
+    assert sorted((name, api) for name, api, _ in ran) == [
+        ("Cats", "one"),
+        ("Cats", "two"),
+        ("Dogs", "one"),
+        ("Dogs", "two"),
+    ]
+    lanes = {
+        api: {thread for _, job_api, thread in ran if job_api == api}
+        for api in ("one", "two")
+    }
+    assert len(lanes["one"]) == len(lanes["two"]) == 1
+    assert lanes["one"] != lanes["two"]
+    assert downloader.progress == dict(jobs=4, total_jobs=4, downloaded=6, skipped=3)
+
+    # Every job succeeding
+    monkeypatch.setattr(downloader, "get_posts", lambda section, api, booru_type: 0)
+    assert downloader.get_data() == 0
+    assert downloader.progress == dict(jobs=4, total_jobs=4, downloaded=0, skipped=0)
+
+
+def danbooru_post(
+    post_id: int,
+    tags: str = "cat",
+    score: int = 10,
+    age: float = 0.0,
+    rating: str = "s",
+) -> dict:
+    """Creates a raw Danbooru post of the offline URI one, created ``age`` days ago"""
+    created = time.gmtime(time.time() - age * 86400)
+    return {
+        "id": post_id,
+        "md5": f"md5{post_id}",
+        "file_url": f"https://one.example/data/md5{post_id}.png",
+        "tag_string": tags,
+        "score": score,
+        "rating": rating,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S+00:00", created),
+    }
+
+
+def test_get_posts_tags_rejected(downloader, monkeypatch):
+    """A search rejected for its tags is planned again with less tags, the others are checked locally"""
+    section = downloader.config.posts["Cats"]
+    section.tags = ["cat", "cute", "solo", "outside", "-dog"]
+    section.queries = [section.tags]
+    page = json.dumps(
+        [
+            danbooru_post(3, "cat cute solo outside"),
+            danbooru_post(2, "cat cute solo"),  # Missing outside
+            danbooru_post(1, "cat cute solo outside dog"),  # Excluded dog
+        ]
+    ).encode()
+    responses = [make_response(422), make_response(422)]  # Shard probe and search
+    searched = []
+
+    def get(url, params=None, **kwargs):
+        searched.append(params["tags"].split(" "))
+        return responses.pop(0) if responses else make_response(200, page)
+
+    fetched = []
+    downloader.limiter.configure("https://one.example", 1000, 1000)
+    monkeypatch.setattr(downloader.backends["one"].session, "get", get)
+    monkeypatch.setattr(downloader, "tag_count", lambda url, tag: None)
+    monkeypatch.setattr(
+        downloader, "fetch_post", lambda name, url, post: fetched.append(post.id)
+    )
+    assert downloader.get_posts(section, "one", "danbooru") == 0
+
+    assert searched[1][:4] == ["cat", "cute", "solo", "outside"]
+    assert searched[-1] == ["cat", "cute"]  # Score, rating and days checked locally
+    assert len(searched[-1]) <= planner.MIN_TAG_LIMIT
+    assert fetched == [3]
+    assert downloader.tag_limits == {"one": 2}
+
+    # Rejected again with the lowest limit - the search fails instead of leaving out tags
+    responses += [
+        make_response(422),
+        make_response(422),
+    ]  # New posts leave no watermark
+    assert downloader.get_posts(section, "one", "danbooru") == 1
+    assert not responses
+
+
+def test_get_posts_watermark_settles(downloader, monkeypatch):
+    """The watermark only moves past posts older than watermark_settle_days, newer posts are searched again"""
+    section = downloader.config.posts["Cats"]
+    section.min_score = 5
+    scores = {3: 0, 2: 10, 1: 10}  # Post 3 is a few hours old, below min_score for now
+
+    def get(url, params=None, **kwargs):
+        page = [
+            danbooru_post(post_id, score=scores[post_id], age=age)
+            for post_id, age in ((3, 0.1), (2, 1), (1, 5))
+        ]
+        return make_response(200, json.dumps(page).encode())
+
+    fetched = []
+    downloader.limiter.configure("https://one.example", 1000, 1000)
+    monkeypatch.setattr(downloader.backends["one"].session, "get", get)
+    monkeypatch.setattr(
+        downloader, "fetch_post", lambda name, url, post: fetched.append(post.id)
+    )
+    query = downloader.section_query(section)
+    assert downloader.get_posts(section, "one", "danbooru") == 0
+    assert fetched == [2, 1]
+    assert downloader.index.watermark("Cats", "one", query, section.days) == 1
+
+    # Post 3 reached min_score since, and is still searched
+    scores[3] = 10
+    fetched.clear()
+    assert downloader.get_posts(section, "one", "danbooru") == 0
+    assert fetched == [3, 2]
+
+
+def test_get_posts_ratings(downloader, monkeypatch):
+    """Ratings one search cannot cover are searched once each and merged, or at once where the booru allows it"""
+    section = downloader.config.posts["Cats"]
+    section.rating = ["s", "q"]
+    ratings = {6: "s", 5: "q", 4: "e", 3: "s", 2: "q", 1: "e"}
+    searched = []
+
+    def get(url, params=None, **kwargs):
+        tags = params["tags"].split(" ")
+        searched.append(tags)
+        wanted = [tag[7:].split(",") for tag in tags if tag.startswith("rating:")]
+        page = [
+            danbooru_post(post_id, rating=rating)
+            for post_id, rating in ratings.items()
+            if not wanted or rating in wanted[0]
+        ]
+        return make_response(200, json.dumps(page).encode())
+
+    fetched = []
+    downloader.limiter.configure("https://one.example", 1000, 1000)
+    monkeypatch.setattr(downloader.backends["one"].session, "get", get)
+    monkeypatch.setattr(
+        downloader, "fetch_post", lambda name, url, post: fetched.append(post.id)
+    )
+    # Danbooru and e621 share a booru type, only Danbooru accepts several ratings in one tag
+    assert downloader.get_posts(section, "one", "danbooru") == 0
+    assert sorted(tags[2] for tags in searched) == ["rating:q", "rating:s"]
+    assert fetched == [6, 5, 3, 2]
+
+    searched.clear()
+    fetched.clear()
+    assert downloader.adapters["one"].name == "danbooru"
+    assert downloader.get_posts(section, "one", "danbooru") == 0
+    assert searched and all(tags[2] == "rating:s,q" for tags in searched)
+    assert fetched == [6, 5, 3, 2]